@@ -10,10 +10,13 @@
 #     The parameters of the model (VanillaRNNLM) (emb_dim=64, hidden_dim=128) are large compared to the data size.
 #     With insufficient data, the model may not learn sufficiently, or the loss may stop decreasing after overfitting.
 #
+import os
 import torch, torch.nn as nn, torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
 
 torch.manual_seed(7)
+device = 'cuda' if torch.cuda.is_available() else 'cpu'  # GPU에서는 nn.RNN이 cuDNN fused kernel로 실행됨
+USE_AMP = device == 'cuda'  # mixed precision(autocast): 학습은 bf16, 생성은 fp16. optimizer/가중치는 fp32 유지
+USE_COMPILE = hasattr(torch, 'compile') and os.getenv('RNN_COMPILE', '1') != '0'  # torch.compile(2.x) 사용 여부. RNN_COMPILE=0이면 eager 실행
 
 # 1) 학습 문장 준비(*주: 실용적으로 사용하기 위해서는 훨씬 많은 데이터가 필요) 
 sentences = [
@@ -56,28 +59,25 @@ inputs = [seq[:-1] for seq in encoded]
 targets = [seq[1:]  for seq in encoded]
 max_len = max(len(x) for x in inputs)
 
-def pad_to_max(ids, max_len, pad=pad_id):
-    return ids + [pad]*(max_len - len(ids))
+# PAD로 채운 (N, max_len) 텐서를 한 번에 할당하고 각 문장의 토큰 id를 앞쪽에 복사
+X = torch.full((len(inputs), max_len), pad_id, dtype=torch.long)
+Y = torch.full_like(X, pad_id)
+for i, (xs, ys) in enumerate(zip(inputs, targets)):
+    X[i, :len(xs)] = torch.as_tensor(xs)
+    Y[i, :len(ys)] = torch.as_tensor(ys)
 
-X = [pad_to_max(x, max_len) for x in inputs]
-Y = [pad_to_max(y, max_len) for y in targets]
-
-# 4) 데이터셋/로더  
-class LMDataset(Dataset):
-    def __init__(self, X, Y):
-        self.X = torch.tensor(X, dtype=torch.long)
-        self.Y = torch.tensor(Y, dtype=torch.long)
-    def __len__(self): return len(self.X)
-    def __getitem__(self, i): return self.X[i], self.Y[i]
-
-ds = LMDataset(X, Y)
-dl = DataLoader(ds, batch_size=4, shuffle=True)
+# 4) 데이터 전체(11문장)를 한 번에 device로 올려 full-batch로 학습(DataLoader/collate 오버헤드 제거)
+X, Y = X.to(device), Y.to(device)
 
 # 5) 바닐라 RNN 언어모델  
 class VanillaRNNLM(nn.Module):
     def __init__(self, vocab_size, emb_dim=64, hidden_dim=128):
         super().__init__()
-        self.emb = nn.Embedding(vocab_size, emb_dim, padding_idx=pad_id)
+        # padding_idx를 쓰면 매 forward/backward마다 (idx == pad) 비교 + fill 커널이 추가로 실행됨.
+        # PAD 위치는 CrossEntropyLoss(ignore_index)로 이미 제외되므로 PAD 행만 0으로 초기화해 둔다
+        self.emb = nn.Embedding(vocab_size, emb_dim)
+        with torch.no_grad():
+            self.emb.weight[pad_id].zero_()
         self.rnn = nn.RNN(emb_dim, hidden_dim, batch_first=True, nonlinearity='tanh')
         self.fc  = nn.Linear(hidden_dim, vocab_size)
 
@@ -87,50 +87,82 @@ class VanillaRNNLM(nn.Module):
         logits = self.fc(out)         # (B,T,V)
         return logits, h
 
-model = VanillaRNNLM(vocab_size)
+model = VanillaRNNLM(vocab_size).to(device)
+# embed -> rnn -> fc 를 하나의 그래프로 컴파일. T는 max_len으로 고정되어 있어 shape가 정적임
+compiled = torch.compile(model, mode="reduce-overhead") if USE_COMPILE else model
+
+# torch.compile은 첫 호출 시점에 컴파일하므로, Triton/C++ 컴파일러가 없는 환경(예: Windows CPU)에서는 그때 실패한다.
+# 컴파일이 실패하면 경고를 출력하고 이후로는 eager model을 사용
+def fwd(*args):
+    global compiled
+    if compiled is model:
+        return model(*args)
+    try:
+        return compiled(*args)
+    except Exception as e:
+        print(f"[warning] torch.compile failed, falling back to eager mode: {type(e).__name__}: {e}")
+        compiled = model
+        return model(*args)
+
 criterion = nn.CrossEntropyLoss(ignore_index=pad_id)  # PAD는 무시
 optimizer = optim.Adam(model.parameters(), lr=2e-3)
 
 # 6) 학습 루프  
-epochs = 50
+epochs = 150  # full-batch는 epoch당 1 step이므로 기존(50 epoch x 3 batch)과 같은 step 수
 for ep in range(1, epochs+1):
     model.train()
-    total = 0.0
-    for x, y in dl:
-        optimizer.zero_grad()
-        logits, _ = model(x)  # (B,T,V)
-        loss = criterion(logits.view(-1, vocab_size), y.view(-1))
-        loss.backward()
-        optimizer.step()
-        total += loss.item()
-    if ep % 5 == 0:
-        print(f"[epoch {ep:02d}] loss={total/len(dl):.4f}")
+    optimizer.zero_grad(set_to_none=True)
+    with torch.autocast(device_type=device, dtype=torch.bfloat16, enabled=USE_AMP):
+        logits, _ = fwd(X)  # (N,T,V)
+        loss = criterion(logits.reshape(-1, vocab_size), Y.reshape(-1))
+    loss.backward()
+    optimizer.step()
+    with torch.no_grad():
+        model.emb.weight[pad_id].zero_()  # 갱신된 PAD 임베딩을 다시 0으로
+    if ep % 15 == 0:
+        print(f"[epoch {ep:03d}] loss={loss.item():.4f}")
 
 # 7) 문장 생성 함수  
-@torch.no_grad()
+# prefill: seed(프롬프트) 전체를 한 번만 RNN에 통과시켜 은닉 상태 h를 만든다(KV-cache와 같은 역할)
+def prefill(seed_ids):
+    cur = torch.tensor([seed_ids], dtype=torch.long, device=device)
+    logits, h = model(cur, None)
+    return logits[:, -1, :], h  # 마지막 위치 분포만 사용
+
+# decode_step: 직전 토큰 1개와 h만으로 다음 분포를 계산(prefix 재계산 없음)
+# 입력 shape가 항상 (1,1)이므로 컴파일된 fwd를 사용. prefill은 seed 길이가 달라 eager model 사용
+def decode_step(last_id, h):
+    cur = last_id.view(1, 1)  # (1,1). device에 있는 id 텐서를 그대로 사용(새 텐서 할당 없음)
+    logits, h = fwd(cur, h)
+    return logits[:, -1, :], h
+
+@torch.inference_mode()  # no_grad + view/version counter 추적도 생략
+@torch.autocast(device_type=device, dtype=torch.float16, enabled=USE_AMP)
 def generate(max_steps=30, greedy=True, seed=None):
     model.eval()
     if seed is None:
-        cur = torch.tensor([[stoi[BOS]]], dtype=torch.long)
+        seed_ids = [stoi[BOS]]
     else:
         # seed 문장을 토큰화해 BOS와 함께 시작
         toks = [BOS] + tokenize(seed)
-        cur = torch.tensor([[stoi.get(t, stoi[PAD]) for t in toks]], dtype=torch.long)
-    h = None
-    out = []
+        seed_ids = [stoi.get(t, stoi[PAD]) for t in toks]
+    last, h = prefill(seed_ids)
+    ids = []
+    # 루프 안에서는 .item()(GPU->CPU 동기화)을 하지 않고 max_steps만큼 생성한 뒤 EOS/PAD 위치에서 잘라냄
     for _ in range(max_steps):
-        logits, h = model(cur, h)
-        last = logits[:, -1, :]  # 마지막 위치 분포
         if greedy:
             next_id = last.argmax(dim=-1)
         else:
             probs = last.softmax(dim=-1)
             next_id = torch.multinomial(probs, num_samples=1).squeeze(1)
-        token = itos[next_id.item()]
+        ids.append(next_id)
+        last, h = decode_step(next_id, h)
+    out = []
+    for i in torch.cat(ids).tolist():  # 한 번만 host로 복사
+        token = itos[i]
         if token == EOS or token == PAD:
             break
         out.append(token)
-        cur = torch.tensor([[next_id.item()]], dtype=torch.long)
     return " ".join(out)
 
 # 8) 테스트: 생성  
@@ -1,4 +1,5 @@
 import json
+from functools import reduce
 from langchain_core.runnables import RunnableLambda
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
@@ -17,10 +18,11 @@ def add_five(x):
 def multiply_by_two(x):
     return x * 2
 
-# wrap the functions with RunnableLambda
-add_five = RunnableLambda(add_five)
-multiply_by_two = RunnableLambda(multiply_by_two)
+# 여러 함수를 하나의 RunnableLambda로 묶음(fusion). Runnable마다 발생하는 callback/config 처리 오버헤드를 1회로 줄임
+def fuse_lambdas(*fns):
+    return RunnableLambda(lambda x, _fns=fns: reduce(lambda v, f: f(v), _fns, x))
 
-chain = add_five | multiply_by_two
+# add_five | multiply_by_two 와 같은 결과: (x + 5) * 2
+chain = fuse_lambdas(add_five, multiply_by_two)
 output = chain.invoke(3)
 print(output) 
\ No newline at end of file
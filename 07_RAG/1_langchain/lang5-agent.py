@@ -16,10 +16,10 @@ agent = initialize_agent(tools , llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTIO
 agent.invoke("요즘 여행가기 좋은 날은 몇월이야?")
 
 # Conversational ReAct
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
 
 tools = load_tools(["llm-math"],  llm=llm)                      # llm-math 도구만 사용
-memory = ConversationBufferMemory(memory_key="chat_history")    # 대화 기록 메모리 키 이름 설정
+memory = ConversationBufferWindowMemory(memory_key="chat_history", k=5)  # 최근 5턴만 프롬프트에 포함(대화가 길어져도 토큰 수 제한). 긴 문맥이 필요하면 ConversationSummaryBufferMemory(llm=llm, max_token_limit=1000) 사용
 conversational_agent = initialize_agent(
     agent='conversational-react-description',
     tools=tools,
@@ -33,12 +33,12 @@ basictopic = (
     ChatPromptTemplate.from_template("{topic} 에 대해 설명합니다")
     | llm
     | StrOutputParser()
-    | {"base": RunnablePassthrough()}
 )
 
+# positive/negative는 basictopic 결과가 아닌 입력 topic만 사용 -> basictopic을 기다리지 않고 동시에 실행 가능
 positive = (
     ChatPromptTemplate.from_template(
-        "{base} 의 장점은?"
+        "{topic} 의 장점은?"
     )
     | llm
     | StrOutputParser()
@@ -46,7 +46,7 @@ positive = (
 
 negative = (
     ChatPromptTemplate.from_template(
-        "{base} 의 단점은?"
+        "{topic} 의 단점은?"
     )
     | llm
     | StrOutputParser()
@@ -64,13 +64,12 @@ final = (
     | StrOutputParser()
 )
 
-# positive, negative, final을 RunnableParallel로 병렬처리
+# basictopic, positive, negative 세 LLM 호출을 RunnableParallel로 동시에 처리
 chain = (
-    basictopic
-    | RunnableParallel(
+    RunnableParallel(
         results_1 = positive,
         results_2 = negative,
-        original_response = itemgetter("base"),
+        original_response = basictopic,
     )
     | RunnableMap(
         {
@@ -81,7 +80,9 @@ chain = (
     )
 )
 
-result = chain.invoke({"topic": "민주주의"})
+# RunnableParallel은 invoke에서도 세 요청을 스레드로 동시에 보냄. 전체 시간 ~ max(basic, positive, negative)
+# (Colab/Jupyter는 이미 event loop가 실행 중이라 asyncio.run을 쓸 수 없음. 비동기로는 await chain.ainvoke(...))
+result = chain.invoke({"topic": "민주주의"}, config={"max_concurrency": 4})
 
 positive_result = result['positive_result']
 negative_result = result['negative_result']
@@ -3,14 +3,15 @@ import torch
 from langchain.document_loaders import PyMuPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.retrievers.multi_query import MultiQueryRetriever
-from langchain.llms import HuggingFacePipeline
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+from transformers import AutoModelForCausalLM, AutoTokenizer, StaticCache, BitsAndBytesConfig
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
 from typing import List
 from langchain_core.output_parsers import BaseOutputParser
-import os
+import os, importlib.util
 
 # load pdf file and split into chunks
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,28 +23,29 @@ text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=20
 texts = text_splitter.split_documents(documents)
 text_contents = [doc.page_content for doc in texts]
 
-# embedding model 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# embedding model (정규화된 벡터 -> 내적(IP) = cosine 유사도)
+device = "cuda" if torch.cuda.is_available() else "cpu"
+embeddings = HuggingFaceEmbeddings(
+    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    model_kwargs={"device": device},
+    encode_kwargs={"normalize_embeddings": True},
+)
 
-# vedtorstore 생성
-vectorstore = FAISS.from_texts(text_contents, embeddings)
+# vedtorstore 생성. 내부 SentenceTransformer(embeddings.client)로 전체 청크를 한 번에 배치 인코딩
+vectors = embeddings.client.encode(text_contents, batch_size=64, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
+vectorstore = FAISS.from_embeddings(list(zip(text_contents, vectors)), embeddings, distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT)
 
 # LLM 
 model_name = "Qwen/Qwen2.5-1.5B-Instruct"
 tokenizer = AutoTokenizer.from_pretrained(model_name) # 토크나이저
-model = AutoModelForCausalLM.from_pretrained(model_name).to("cuda" if torch.cuda.is_available() else "cpu")
-llm = HuggingFacePipeline(
-    pipeline=pipeline(
-        "text-generation", # 텍스트 생성
-        model=model,
-        tokenizer=tokenizer,
-        max_new_tokens=256, # 성할 텍스트의 최대 토큰 수
-        do_sample=True, # 확률 기반 샘플링 생성
-        temperature=0.7,
-        top_p=0.95, # 확률 분포에서 상위 95%의 누적 확률에 해당하는 토큰만 고려하여 텍스트를 생성
-        device=0 if torch.cuda.is_available() else -1
-    )
-)
+# fused attention 커널 사용. flash-attn 패키지가 있으면 FlashAttention2, 없으면 PyTorch SDPA
+attn_implementation = "flash_attention_2" if device == "cuda" and importlib.util.find_spec("flash_attn") else "sdpa"
+if device == "cuda":
+    # 4bit(nf4) 양자화 로딩. decode는 메모리 대역폭에 의해 제한되므로 가중치 크기를 줄이면 속도도 향상 (pip install bitsandbytes)
+    bnb_config = BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_compute_dtype=torch.bfloat16, bnb_4bit_quant_type="nf4")
+    model = AutoModelForCausalLM.from_pretrained(model_name, quantization_config=bnb_config, torch_dtype=torch.bfloat16, device_map="auto", attn_implementation=attn_implementation)
+else:
+    model = AutoModelForCausalLM.from_pretrained(model_name, attn_implementation=attn_implementation).to(device) # bitsandbytes 양자화는 GPU 필요
 
 # template 정의
 custom_prompt = PromptTemplate(
@@ -51,6 +53,69 @@ custom_prompt = PromptTemplate(
     template="""당신은 AI 언어 모델 어시스턴트입니다. 사용자가 제공한 질문에 대해 벡터 데이터베이스에서 관련 문서를 검색할 수 있도록 질문을 3가지 다른 버전으로 생성하는 것이 당신의 임무입니다. 사용자의 질문을 다양한 관점에서 재구성하여 거리 기반 유사도 검색의 한계를 극복할 수 있도록 돕는 것이 목표입니다. 각 버전의 질문은 줄바꿈으로 구분하여 작성하세요. 한국어로 작성하세요. 원본 질문: {question}"""
 )
 
+# 모든 질의에서 같은 template 앞부분(prefix)은 한 번만 토큰화/prefill 하여 KV cache를 재사용
+# 고정 크기(StaticCache) KV cache를 사용해 shape가 바뀌지 않으므로 decode 단계를 torch.compile 할 수 있음
+MAX_CACHE_LEN = 1024 # prefix + 질문 + 생성 토큰(256)의 최대 길이
+prefix_text = custom_prompt.template.split("{question}")[0]
+prefix_ids = tokenizer(prefix_text, return_tensors="pt").input_ids.to(device)
+prefix_len = prefix_ids.shape[1]
+kv_cache = StaticCache(config=model.config, max_batch_size=1, max_cache_len=MAX_CACHE_LEN, device=device, dtype=model.dtype) # 한 번만 할당하여 모든 질의에서 재사용
+with torch.no_grad():
+    model(prefix_ids, past_key_values=kv_cache, cache_position=torch.arange(prefix_len, device=device), use_cache=True)
+
+def cache_layers(cache): # transformers 버전에 따라 StaticCache의 layer별 K/V 텐서 위치가 다름
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+prefix_kv = [(k[:, :, :prefix_len].clone(), v[:, :, :prefix_len].clone()) for k, v in cache_layers(kv_cache)] # prefill된 prefix K/V 보관
+
+def load_prefix_cache():
+    # cache를 새로 만들거나 복사(deepcopy)하지 않고, 같은 cache를 비운 뒤 prefix K/V만 제자리(in-place)에 다시 씀.
+    # 텐서 주소가 바뀌지 않으므로 컴파일된 decode 단계(CUDA graph)를 그대로 재사용
+    kv_cache.reset()
+    for (k, v), (prefix_k, prefix_v) in zip(cache_layers(kv_cache), prefix_kv):
+        k[:, :, :prefix_len].copy_(prefix_k)
+        v[:, :, :prefix_len].copy_(prefix_v)
+
+# 질문 길이는 질의마다 달라 prefill까지 컴파일하면 매번 재컴파일되므로, 토큰 1개씩 처리하는 decode 단계만 컴파일.
+# torch.compile은 첫 호출 시점에 컴파일하므로 실패하면(Triton/C++ 컴파일러가 없는 환경 등) 경고 후 eager forward 사용
+eager_forward = model.forward
+compiled_forward = torch.compile(eager_forward, mode="reduce-overhead")
+
+def forward(*args, **kwargs):
+    global compiled_forward
+    input_ids = kwargs.get("input_ids", args[0] if args else None)
+    if compiled_forward is eager_forward or input_ids is None or input_ids.shape[1] != 1:
+        return eager_forward(*args, **kwargs)
+    try:
+        return compiled_forward(*args, **kwargs)
+    except Exception as e:
+        print(f"[warning] torch.compile failed, falling back to eager mode: {type(e).__name__}: {e}")
+        compiled_forward = eager_forward
+        return eager_forward(*args, **kwargs)
+
+model.forward = forward
+
+def generate_with_prefix_cache(prompt_value):
+    text = prompt_value.to_string()
+    question_ids = tokenizer(text[len(prefix_text):], return_tensors="pt", add_special_tokens=False).input_ids.to(device)
+    input_ids = torch.cat([prefix_ids, question_ids], dim=-1)
+    load_prefix_cache() # 이전 질의가 쓴 위치를 지우고 prefix만 남김. prefix 위치는 다시 계산하지 않음
+    output_ids = model.generate(
+        input_ids=input_ids,
+        attention_mask=torch.ones_like(input_ids),
+        past_key_values=kv_cache,
+        use_cache=True,
+        max_new_tokens=256, # 성할 텍스트의 최대 토큰 수
+        do_sample=True, # 확률 기반 샘플링 생성
+        temperature=0.7,
+        top_p=0.95, # 확률 분포에서 상위 95%의 누적 확률에 해당하는 토큰만 고려하여 텍스트를 생성
+    )
+    return tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True) # 생성된 부분만 반환
+
+llm = RunnableLambda(generate_with_prefix_cache)
+
 # OUtputParser 정의
 class LineListOutputParser(BaseOutputParser):
     def parse(self, text: str) -> List[str]:
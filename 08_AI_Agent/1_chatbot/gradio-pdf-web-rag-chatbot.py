@@ -8,8 +8,9 @@ TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 # coding QA Expert Chatbot using langchain and gradio as web UI. use PDF RAG with faiss vector DB to save, retrieve the chunk documents from the PDF. if run this chatbot, read the PDF files from ./files folder, splite them into chunks, save them to faiss as vector database. after that, create LLM using openai and create langchain prompt template, tools with web search using Tavily. create agents with them including the previous dialog memory. this UI using gradio is simliar to ChatBot.
 import os, re
 import glob
+import hashlib
+from collections import OrderedDict
 import gradio as gr
-from gradio import ChatMessage
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
@@ -19,6 +20,7 @@ from langchain_core.tools import Tool
 from langchain_openai import OpenAI
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import HumanMessage, AIMessage
+from concurrent.futures import ProcessPoolExecutor
 
 # 1. 설정
 from pathlib import Path
@@ -28,26 +30,47 @@ VECTOR_DB_PATH = str(SCRIPT_DIR / 'faiss_index')
 FILES_DIRECTORY = str(SCRIPT_DIR / 'files')
 CHUNK_SIZE = 2000
 CHUNK_OVERLAP = 300
+DEBUG = False  # True이면 분할된 청크 미리보기를 출력
 
 # OpenAI 설정 - ChatOpenAI 사용
 llm_model = ChatOpenAI(temperature=0, model="gpt-4o-mini", openai_api_key=OPENAI_API_KEY)
 
+# 웹 검색 도구는 한 번만 생성하여 재사용(HTTP 연결 keep-alive)
+search_tool = TavilySearchResults(max_results=5, tavily_api_key=TAVILY_API_KEY)
+
 # 2. PDF 파일 로드 및 벡터화
+def load_pdf(file):
+	return PyPDFLoader(file).load()
+
 def load_and_split_pdfs(files_directory):
 	pdf_files = glob.glob(os.path.join(files_directory, '*.pdf'))
-	documents = []
-	for file in pdf_files:
-		loader = PyPDFLoader(file)
-		documents.extend(loader.load())
+	# PDF 파싱은 CPU 작업(pure python)이므로 파일별로 별도 프로세스에서 병렬 로드
+	with ProcessPoolExecutor() as executor:
+		documents = [doc for docs in executor.map(load_pdf, pdf_files) for doc in docs]
 	splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
 	split_documents = splitter.split_documents(documents)
-	for i, doc in enumerate(split_documents):
-		print(f"Document {i}: {doc.page_content[:100]}...")  # Print the first 100 characters of each split document
-	return splitter.split_documents(documents)
+	if DEBUG:
+		for i, doc in enumerate(split_documents):
+			print(f"Document {i}: {doc.page_content[:100]}...")  # Print the first 100 characters of each split document
+	return split_documents
 
 # 3. FAISS 벡터DB 저장
+def to_ivf_index(flat_index):
+	# 기본 IndexFlatL2(전수 비교)를 IVF(inverted file) 인덱스로 교체. 검색 시 nprobe개의 클러스터만 비교
+	import faiss
+	n, d = flat_index.ntotal, flat_index.d
+	vecs = flat_index.reconstruct_n(0, n)
+	nlist = max(1, int(n ** 0.5))  # 클러스터 수. 학습 데이터(n)가 nlist보다 적으면 학습 불가
+	ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, nlist)
+	ivf.train(vecs)
+	ivf.add(vecs)
+	ivf.nprobe = min(nlist, 8)
+	ivf.make_direct_map()  # mmr 검색 시 reconstruct() 사용
+	return ivf
+
 def save_to_faiss(documents):
 	vectordb = FAISS.from_documents(documents, OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY))
+	vectordb.index = to_ivf_index(vectordb.index)
 	vectordb.save_local(VECTOR_DB_PATH)
 	print(f"FAISS vector database saved to {VECTOR_DB_PATH}")
 	return vectordb
@@ -90,28 +113,53 @@ conversational-react-description:
 # 5. Query with tools
 conversation_history = []
 
+# (정규화된 질문, 검색된 context 해시) -> LLM 답변. 같은 질문/문서 조합이면 LLM 호출 생략
+ANSWER_CACHE_SIZE = 512
+answer_cache = OrderedDict()
+
+def answer_with_context(user_input, context):
+	# generator: LLM 응답을 토큰 단위로 stream. 전체 답변은 끝난 뒤 cache에 저장
+	key = (user_input.strip().lower(), hashlib.blake2b(context.encode(), digest_size=16).hexdigest())
+	if key in answer_cache:
+		answer_cache.move_to_end(key)
+		yield answer_cache[key]
+		return
+	prompt = f"Based on the following context, answer the question:\n\nContext: {context}\n\nQuestion: {user_input}\n\nAnswer:"
+	answer = ""
+	for chunk in llm_model.stream([HumanMessage(content=prompt)]):
+		answer += chunk.content
+		yield chunk.content
+	answer_cache[key] = answer
+	if len(answer_cache) > ANSWER_CACHE_SIZE:
+		answer_cache.popitem(last=False)  # 가장 오래 사용하지 않은 항목 제거
+
 def query_with_tools(user_input):
+	# generator: 답변 텍스트 조각(chunk)을 생성되는 대로 반환
 	# Try PDF QA first
+	started = False
 	try:
 		docs = qa_chain.invoke(user_input)
 		context = "\n".join([doc.page_content for doc in docs])
-		prompt = f"Based on the following context, answer the question:\n\nContext: {context}\n\nQuestion: {user_input}\n\nAnswer:"
-		result = llm_model.invoke([HumanMessage(content=prompt)])
-		return result.content
+		for chunk in answer_with_context(user_input, context):
+			started = True
+			yield chunk
+		return
 	except Exception as e:
+		if started:  # 답변 출력 도중 오류이면 다른 방법으로 넘어가지 않음
+			raise
 		print(f"PDF QA error: {e}")
 	
 	# Fallback to web search
 	try:
-		search_tool = TavilySearchResults(max_results=5, tavily_api_key=TAVILY_API_KEY)
 		search_results = search_tool.invoke(user_input)
-		return str(search_results)
+		yield str(search_results)
+		return
 	except Exception as e:
 		print(f"Web search error: {e}")
 	
 	# Direct LLM response
-	result = llm_model.invoke([HumanMessage(content=user_input)])
-	return result.content
+	for chunk in llm_model.stream([HumanMessage(content=user_input)]):
+		yield chunk.content
 
 def extract_action_input(text):
 	# "action_input": "..." 패턴을 정규식으로 추출
@@ -121,41 +169,48 @@ def extract_action_input(text):
 		return match.group(1)
 	return None
 
-# 초기화 과정
-if not os.path.exists(VECTOR_DB_PATH):
-    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
-    docs = load_and_split_pdfs(FILES_DIRECTORY)
-    save_to_faiss(docs)
-
-vectordb = FAISS.load_local(VECTOR_DB_PATH, OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY), allow_dangerous_deserialization=True)
-qa_chain = create_retrieval_qa(vectordb)
-
 def chatbot_interface(user_input, history):
+    # generator: 사용자 메시지를 먼저 화면에 보여준 뒤, 답변 chunk가 올 때마다 갱신(queue 사용)
     if not user_input:
-        return history, history
-    
+        yield history, history
+        return
+
+    history.append({"role": "user", "content": user_input})
+    yield history, history
+
+    history.append({"role": "assistant", "content": ""})
     try:
-        response = query_with_tools(user_input)
+        for chunk in query_with_tools(user_input):
+            history[-1]["content"] += chunk
+            yield history, history
     except Exception as e:
         msg = f"Error: {str(e)}"
         print(msg)
         response = extract_action_input(str(e))
         if response == None:
             response = str(e)
-    
-    history.append(ChatMessage(role="user", content=user_input))
-    history.append(ChatMessage(role="assistant", content=response))
-    return history, history
+        history[-1]["content"] = response
+        yield history, history
+
+if __name__ == "__main__":  # PDF 로딩에 프로세스 풀을 사용하므로 자식 프로세스에서 재실행되지 않도록 보호
+    # 초기화 과정
+    if not os.path.exists(os.path.join(VECTOR_DB_PATH, 'index.faiss')):  # 폴더만 있고 인덱스가 없는 경우도 재생성
+        os.makedirs(VECTOR_DB_PATH, exist_ok=True)
+        docs = load_and_split_pdfs(FILES_DIRECTORY)
+        save_to_faiss(docs)
+
+    vectordb = FAISS.load_local(VECTOR_DB_PATH, OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY), allow_dangerous_deserialization=True)
+    qa_chain = create_retrieval_qa(vectordb)
 
-with gr.Blocks() as demo:
-    gr.Markdown("QA Expert Chatbot (PDF + Web Search)")
-    chatbot = gr.Chatbot()
-    msg = gr.Textbox(placeholder="질문을 입력하세요...")
+    with gr.Blocks() as demo:
+        gr.Markdown("QA Expert Chatbot (PDF + Web Search)")
+        chatbot = gr.Chatbot(type="messages")  # {"role", "content"} dict 메시지를 그대로 사용
+        msg = gr.Textbox(placeholder="질문을 입력하세요...")
 
-    clear = gr.Button("초기화")
+        clear = gr.Button("초기화")
 
-    state = gr.State([])
-    msg.submit(chatbot_interface, [msg, state], [chatbot, state])
-    clear.click(lambda: ([], []), None, [chatbot, state])
+        state = gr.State([])
+        msg.submit(chatbot_interface, [msg, state], [chatbot, state], queue=True)
+        clear.click(lambda: ([], []), None, [chatbot, state])
 
-demo.launch(share=True)
+    demo.launch(share=True)
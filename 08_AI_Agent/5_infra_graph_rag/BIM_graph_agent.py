@@ -14,23 +14,325 @@ Architecture:
 Usage:
 	python BIM_graph_agent.py
 
+Concurrency:
+	LLM calls use the async LangChain interface (ainvoke) so several queries, or several
+	Cypher candidates for one query, can be in flight at once. To let the Ollama server
+	actually run them in parallel, start it with e.g.
+	OLLAMA_NUM_PARALLEL=4 OLLAMA_MAX_LOADED_MODELS=1 ollama serve
+
 Contact: Taewook Kang (laputa99999@gmail.com)
 """
 
-import json, sys, os, time, re
+import json, sys, os, time, re, asyncio, threading, sqlite3
+import numpy as np
+from collections import OrderedDict
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import orjson
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from langchain_ollama import ChatOllama
+from langchain_core.messages import SystemMessage
+from langchain_ollama import ChatOllama, OllamaEmbeddings
 from neo4j import GraphDatabase
+from neo4j.graph import Relationship
 
 # Add project source to path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+# Maximum number of records passed on to the response LLM
+MAX_RESULTS = 200
+
+# Precompiled patterns used by clean_cypher_query
+_RE_CODEBLOCK = re.compile(r'```(?:cypher|sql)?\s*\n?', re.IGNORECASE)
+_RE_PREFIX = re.compile(r'^(?:(?:cypher|sql)(?::\s*|\s+))?(?:query:\s*)?', re.IGNORECASE)
+_RE_WS = re.compile(r'\s+')
+_RE_TRAIL = re.compile(r'[.!?;]+\s*$')
+_CYPHER_KW = r'\b(?:MATCH|WHERE|RETURN|WITH|CREATE|DELETE|SET|REMOVE|MERGE|UNWIND|ORDER\s+BY|LIMIT|SKIP)\b'
+# Cypher block: the first non-empty line, then every following line that is blank, starts with a
+# continuation character or contains a Cypher keyword. Matching stops at the first explanation line.
+_CYPHER_EXTRACT = re.compile(
+	r'\s*[^\n]*(?:\n[ \t\r]*(?:[()\[\]{},.\-:<>=][^\n]*|[^\n]*?' + _CYPHER_KW + r'[^\n]*)?(?=\n|\Z))*',
+	re.IGNORECASE
+)
+
+# Literal values in generated Cypher, replaced by $parameters so Neo4j can reuse the cached query plan.
+# One left-to-right pass: backtick-quoted identifiers (group 1, e.g. n.`Qto_2__Area`) are matched first and
+# kept as they are, then string literals (groups 2/3) and number literals after : = < > (groups 4/5)
+_RE_LITERAL = re.compile(
+	r"(`(?:[^`]|``)*`)"
+	r"|'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\""
+	r"|(?<=[:=<>])(\s*)(-?\d+(?:\.\d+)?)\b"
+)
+_RE_ESCAPE = re.compile(r'\\(.)')
+
+# Query router: plural nouns used in questions -> IFC node labels
+_LABEL_ALIASES = {
+	"walls": "IfcWall", "doors": "IfcDoor", "windows": "IfcWindow",
+	"spaces": "IfcSpace", "rooms": "IfcSpace", "slabs": "IfcSlab",
+	"beams": "IfcBeam", "members": "IfcMember", "stairs": "IfcStair",
+	"railings": "IfcRailing", "roofs": "IfcRoof", "coverings": "IfcCovering",
+	"footings": "IfcFooting", "storeys": "IfcBuildingStorey", "floors": "IfcBuildingStorey",
+	"openings": "IfcOpeningElement", "furnishings": "IfcFurnishingElement",
+}
+# Optional trailing words that do not change the meaning of a routed question
+_ROUTE_FILLER = r'(?:\s+(?:are\s+there|are\s+in\s+the\s+(?:building|project|model)|in\s+the\s+(?:building|project|model)|with\s+their\s+properties))?\s*\??'
+
+# Static system prompts, built once at import time. The text is sent verbatim as the first message
+# of every request, so the Ollama server can reuse the KV cache of this shared prefix
+_CYPHER_SYSTEM = """You are an agent in converting natural language queries to Neo4j Cypher queries for BIM/IFC data.
+
+BIM Graph Database Schema (Based on Actual Database Structure):
+
+Node Labels (Each IFC class has its own label):
+- Element: Generic element properties
+- IFCFile: IFC file metadata
+- IfcBeam, IfcBuilding, IfcBuildingStorey, IfcCovering, IfcDoor, IfcFooting
+- IfcFurnishingElement, IfcMember, IfcOpeningElement, IfcRailing
+- IfcRoof, IfcSite, IfcSlab, IfcSpace, IfcStair, IfcStairFlight
+- IfcWall, IfcWallStandardCase, IfcWindow
+
+Common Node Properties:
+- description, globalId, name, objectType, properties, sourceFileId, tag
+- All properties are stored directly in each node
+
+IFCFile Properties:
+- createdDate, fileId, fileName, filePath, fileSize, importDate, modifiedDate
+
+Relationship Types:
+- AGGREGATES: Element -> Element (aggregation relationships)
+- BELONGS_TO_FILE: Element -> IFCFile (links elements to their source file)
+- CONTAINED_IN: Element -> Element (spatial containment)
+
+CRITICAL Schema Rules:
+1. Use specific IFC labels (IfcSpace, IfcWall, etc.) NOT generic Element label
+2. Properties are stored as nested JSON in the 'properties' field: {"PropertySetName": {"PropertyName": value}}
+3. Do NOT try to access specific property keys - property set names vary by modeling tool
+4. For property-related queries: Always return full properties JSON for LLM analysis
+5. Standard approach: MATCH (s:IfcSpace {name: 'A204'}) RETURN s.name, s.properties
+
+Query Examples:
+- Find space properties: MATCH (s:IfcSpace {name: 'A204'}) RETURN s.properties
+- Count walls: MATCH (w:IfcWall) RETURN count(w)
+- Find all doors: MATCH (d:IfcDoor) RETURN d.name, d.properties LIMIT 10
+- Find file info: MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
+- Get space with properties: MATCH (s:IfcSpace {name: 'A204'}) RETURN s.name, s.properties
+- Find space by room name: MATCH (s:IfcSpace) WHERE s.properties CONTAINS 'A204' RETURN s.name, s.properties
+
+        IMPORTANT: Properties are stored as nested JSON (property set -> property -> value). Some imports also copy each value to a node property named `PropertySetName__PropertyName`, but not all do. For property-related queries (area, volume, etc.):
+        - Return the full properties JSON: RETURN s.name, s.properties
+        - Let the response processor extract specific values from the JSON
+        - Don't try to access specific property keys as they vary by modeling tool
+
+        Rules for Cypher generation:
+        1. Always use proper Cypher syntax
+        2. Use specific IFC labels (IfcSpace, IfcWall, IfcDoor, etc.) as node labels
+        3. Access element properties directly from the node (e.g., s.properties, s.name, s.globalId)
+        4. Do NOT traverse relationships for basic element properties
+        5. Use WHERE clauses for additional filtering by name, etc.
+        6. Use LIMIT to prevent large result sets (default LIMIT 100)
+        7. For counts, use count() function
+        8. For file information, match on IFCFile nodes
+        9. For property searches (area, volume, etc.), return the entire properties JSON and let response processing extract relevant values
+        10. Use simple property access: s.properties (return full JSON for analysis)
+        11. For specific known properties, try common patterns but always include full properties as backup
+
+        CORRECT Examples:
+        - MATCH (s:IfcSpace {name: 'A204'}) RETURN s.name, s.globalId, s.properties
+        - MATCH (w:IfcWall) RETURN count(w)
+        - MATCH (d:IfcDoor) RETURN d.name, d.globalId, d.properties LIMIT 10
+        - MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
+        - For property queries: Always include s.properties in RETURN clause
+
+        WRONG Examples:
+        - MATCH (e:Element {ifcClass: 'IfcSpace'}) (Use direct IfcSpace label)
+        - Trying to access specific property paths like s.properties.PSet_Name.Property (paths vary by tool)
+
+        Generate ONLY the Cypher query without explanation or markdown formatting.
+        If the question asks for several independent things (e.g. compare the number of walls and doors),
+        you may instead return a JSON array of independent Cypher queries, e.g.
+        ["MATCH (w:IfcWall) RETURN count(w)", "MATCH (d:IfcDoor) RETURN count(d)"]
+        """
+
+_RESPONSE_SYSTEM = """You are a helpful BIM agent assistant specialized in analyzing IFC element properties and answering user questions. You receive JSON results from Neo4j database queries about BIM/IFC data.
+
+CRITICAL: When analyzing element properties JSON:
+1. Look for relevant information in the nested properties structure (property set -> property -> value); values may also appear as 'PropertySetName__PropertyName' columns
+2. Common property patterns to search for:
+   - Area: look for keys containing 'Area', 'area', 'GrossFloorArea', '면적' etc.
+   - Volume: look for 'Volume', 'volume', 'GrossVolume', '체적' etc.
+   - Name: look for 'Name', 'name', '이름', 'Number' etc.
+   - Level/Floor: look for 'Level', 'level', '층', 'Floor' etc.
+   - Material: look for 'Material', 'material', '재료' etc.
+3. Different modeling tools (Revit, ArchiCAD, Tekla, etc.) use different property set names
+4. Property sets may have names like: 'PSet_Revit_Dimensions', 'BaseQuantities', 'Pset_SpaceCommon' etc.
+5. Always search through ALL property sets to find relevant information
+
+Your responses should:
+1. Extract and highlight the specific information requested by the user
+2. Provide clear numerical values with appropriate units when available
+3. Explain where the information was found in the properties structure
+4. Be concise but informative for construction professionals
+5. Handle Korean and English property names equally
+
+If no relevant property is found, suggest what to look for or mention that the property might not be available in this model."""
+
+_CYPHER_PROMPT = ChatPromptTemplate.from_messages([
+	SystemMessage(content=_CYPHER_SYSTEM),
+	("user", "Convert this query to Cypher: {query}")
+])
+
+_RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
+	SystemMessage(content=_RESPONSE_SYSTEM),
+	("user", "Original Query: {original_query}\nCypher Query: {cypher_query}\nQuery Results: {query_results}\n\nPlease provide a helpful response based on these results.")
+])
+
+class LRUTTLCache:
+	"""Thread-safe LRU cache whose entries expire after a time-to-live (seconds)"""
+	
+	def __init__(self, maxsize: int = 512, ttl: Optional[float] = 300):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+	
+	def get(self, key):
+		with self._lock:
+			item = self._data.get(key)
+			if item is None:
+				return None
+			value, expires = item
+			if expires is not None and expires < time.monotonic():
+				del self._data[key]
+				return None
+			self._data.move_to_end(key)
+			return value
+	
+	def set(self, key, value):
+		with self._lock:
+			expires = time.monotonic() + self.ttl if self.ttl else None
+			self._data[key] = (value, expires)
+			self._data.move_to_end(key)
+			if len(self._data) > self.maxsize:
+				self._data.popitem(last=False)
+	
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+
+class EventLoopThread:
+	"""
+	One event loop running in a daemon thread, used by the synchronous entry points
+	
+	ChatOllama's async client pools its keep-alive connections on the loop that opened
+	them, so every ainvoke of an agent must run on the same loop. asyncio.run per call
+	would leave the pooled connections on a closed loop ("Event loop is closed").
+	A thread (not asyncio.Runner) lets Streamlit call in from any script thread.
+	"""
+	
+	def __init__(self):
+		self.loop = asyncio.new_event_loop()
+		self._thread = threading.Thread(target=self.loop.run_forever, name="agent-event-loop", daemon=True)
+		self._thread.start()
+	
+	def run(self, coro):
+		"""Run a coroutine on the loop and wait for its result"""
+		return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+	
+	def close(self):
+		if self.loop.is_closed():
+			return
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self._thread.join()
+		self.loop.close()
+
+class CypherStore:
+	"""Persistent SQLite store of generated Cypher queries, looked up by question embedding"""
+	
+	def __init__(self, db_path: str, embedder, threshold: float = 0.95, hash_bits: int = 64):
+		"""
+		Initialize the store
+		
+		Args:
+			db_path: SQLite database file path
+			embedder: LangChain embeddings object (e.g. OllamaEmbeddings with nomic-embed-text)
+			threshold: Minimum cosine similarity for reusing a stored Cypher query
+			hash_bits: Number of random hyperplanes of the locality sensitive hash key
+		"""
+		self.embedder = embedder
+		self.threshold = threshold
+		self.hash_bits = hash_bits
+		self.hyperplanes = None
+		self._lock = threading.Lock()
+		self.conn = sqlite3.connect(db_path, check_same_thread=False)
+		self.conn.execute(
+			"CREATE TABLE IF NOT EXISTS cypher_cache ("
+			"hash INTEGER PRIMARY KEY, question TEXT, embedding BLOB, cypher TEXT, hits INTEGER DEFAULT 0)"
+		)
+		self.conn.commit()
+		
+		# Keep int8 embeddings in memory for the top-1 similarity scan
+		rows = self.conn.execute("SELECT hash, embedding FROM cypher_cache").fetchall()
+		self.hashes = [row[0] for row in rows]
+		self.matrix = np.stack([np.frombuffer(row[1], dtype=np.int8) for row in rows]) if rows else None
+	
+	def embed(self, question: str) -> np.ndarray:
+		"""Embed a question and quantize the unit vector to int8"""
+		vector = np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+		vector /= np.linalg.norm(vector) or 1.0
+		return np.round(vector * 127).astype(np.int8)
+	
+	def hash_key(self, embedding: np.ndarray) -> int:
+		"""64-bit random hyperplane (SimHash) key; near-duplicate questions share the key"""
+		if self.hyperplanes is None:
+			self.hyperplanes = np.random.default_rng(0).standard_normal((self.hash_bits, embedding.shape[0])).astype(np.float32)
+		bits = (self.hyperplanes @ embedding.astype(np.float32)) > 0
+		key = int(np.packbits(bits).view('>u8')[0])
+		return key - (1 << 64) if key >= (1 << 63) else key  # SQLite INTEGER is signed
+	
+	def lookup(self, question: str) -> Tuple[Optional[Tuple[str, ...]], np.ndarray]:
+		"""
+		Find a stored Cypher query for a semantically equivalent question
+		
+		Returns:
+			(cypher queries or None, question embedding for a later add())
+		"""
+		embedding = self.embed(question)
+		with self._lock:
+			if self.matrix is None:
+				return None, embedding
+			scores = self.matrix.astype(np.float32) @ embedding.astype(np.float32) / (127.0 * 127.0)
+			best = int(np.argmax(scores))
+			if scores[best] < self.threshold:
+				return None, embedding
+			key = self.hashes[best]
+			row = self.conn.execute("SELECT cypher FROM cypher_cache WHERE hash = ?", (key,)).fetchone()
+			self.conn.execute("UPDATE cypher_cache SET hits = hits + 1 WHERE hash = ?", (key,))
+			self.conn.commit()
+		return (tuple(json.loads(row[0])) if row else None), embedding
+	
+	def add(self, question: str, embedding: np.ndarray, cypher_queries: Tuple[str, ...]):
+		"""Store the Cypher queries generated for a question"""
+		key = self.hash_key(embedding)
+		with self._lock:
+			self.conn.execute(
+				"INSERT OR REPLACE INTO cypher_cache (hash, question, embedding, cypher, hits) VALUES (?, ?, ?, ?, 0)",
+				(key, question, embedding.tobytes(), json.dumps(list(cypher_queries)))
+			)
+			self.conn.commit()
+			if key in self.hashes:
+				self.matrix[self.hashes.index(key)] = embedding
+			else:
+				self.hashes.append(key)
+				self.matrix = embedding[None, :] if self.matrix is None else np.vstack([self.matrix, embedding])
+	
+	def close(self):
+		"""Close the SQLite connection"""
+		self.conn.close()
+
 class Neo4jQueryTool:
 	"""Tool for executing Cypher queries against Neo4j BIM graph database"""
 	
@@ -49,6 +351,7 @@ class Neo4jQueryTool:
 		self.password = password
 		self.database = database
 		self.driver = None
+		self.result_cache = LRUTTLCache(maxsize=1024, ttl=300)  # cleaned Cypher -> successful result
 		
 	def connect(self, max_retries: int = 3, retry_delay: float = 2.0) -> bool:
 		"""
@@ -67,12 +370,13 @@ class Neo4jQueryTool:
 					self.driver.close()
 				
 				# Create new driver with connection pooling settings
+				# Pool is sized for concurrent queries issued from worker threads (see aprocess_query)
 				self.driver = GraphDatabase.driver(
 					self.uri, 
 					auth=(self.user, self.password),
 					max_connection_lifetime=3600,  # 1 hour
-					max_connection_pool_size=10,
-					connection_acquisition_timeout=30
+					max_connection_pool_size=max(32, (os.cpu_count() or 1) * 4),
+					connection_acquisition_timeout=60
 				)
 				
 				# Test connection
@@ -120,6 +424,57 @@ class Neo4jQueryTool:
 		except Exception:
 			return False
 	
+	@staticmethod
+	def parameterize_query(cypher_query: str) -> Tuple[str, Dict[str, Any]]:
+		"""
+		Replace string and number literals with $p0, $p1, ... parameters.
+		Neo4j caches query plans by query text, so queries that differ only in values share one plan
+		
+		Args:
+			cypher_query: Cypher query string with literal values
+			
+		Returns:
+			(parameterized query, parameters dictionary)
+		"""
+		params = {}
+		
+		def to_param(value):
+			name = f"p{len(params)}"
+			params[name] = value
+			return f"${name}"
+		
+		def replace_literal(match):
+			identifier, single_quoted, double_quoted, space, number = match.groups()
+			if identifier is not None:
+				return identifier
+			if number is not None:
+				return space + to_param(float(number) if '.' in number else int(number))
+			value = single_quoted if single_quoted is not None else double_quoted
+			return to_param(_RE_ESCAPE.sub(r'\1', value))
+		
+		query = _RE_LITERAL.sub(replace_literal, cypher_query)
+		return query, params
+	
+	@staticmethod
+	def _iter_records(result):
+		"""Yield query records as dictionaries while the result is streamed from the server"""
+		relationship_keys = None
+		for record in result:
+			# Record.data() converts nodes to property dicts inside the driver
+			record_dict = record.data()
+			# Relationship columns are detected once from the first record and keep their type
+			if relationship_keys is None:
+				relationship_keys = [key for key, value in record.items() if isinstance(value, Relationship)]
+			for key in relationship_keys:
+				value = record[key]
+				record_dict[key] = {"type": value.type, "properties": dict(value)}
+			yield record_dict
+	
+	@classmethod
+	def _collect_records(cls, result) -> List[Dict[str, Any]]:
+		"""Collect at most MAX_RESULTS + 1 records; the extra one only signals truncation"""
+		return list(islice(cls._iter_records(result), MAX_RESULTS + 1))
+	
 	def execute_query(self, cypher_query: str, max_retries: int = 2) -> Dict[str, Any]:
 		"""
 		Execute Cypher query with retry logic and return JSON result
@@ -134,35 +489,34 @@ class Neo4jQueryTool:
 		if not self.driver:
 			return {"success": False, "error": "Not connected to database", "results": []}
 		
+		cached = self.result_cache.get(cypher_query)
+		if cached is not None:
+			return cached
+		
 		for attempt in range(max_retries):
 			try:
-				with self.driver.session(database=self.database) as session:
-					result = session.run(cypher_query)
-					
-					# Convert result to list of dictionaries
-					records = []
-					for record in result:
-						record_dict = {}
-						for key in record.keys():
-							value = record[key]
-							# Handle Neo4j node/relationship objects
-							if hasattr(value, '_properties'):
-								record_dict[key] = dict(value._properties)
-							elif hasattr(value, 'type'):  # Relationship
-								record_dict[key] = {
-									"type": value.type,
-									"properties": dict(value._properties) if hasattr(value, '_properties') else {}
-								}
-							else:
-								record_dict[key] = value
-						records.append(record_dict)
-					
-					return {
-						"success": True,
-						"query": cypher_query,
-						"results": records,
-						"count": len(records)
-					}
+				# driver.execute_query borrows a pooled connection instead of opening a session per call.
+				# Records are converted while streaming and reading stops after MAX_RESULTS rows
+				parameterized_query, params = self.parameterize_query(cypher_query)
+				records = self.driver.execute_query(
+					parameterized_query,
+					parameters_=params,
+					database_=self.database,
+					result_transformer_=self._collect_records
+				)
+				
+				truncated = len(records) > MAX_RESULTS
+				records = records[:MAX_RESULTS]
+				query_result = {
+					"success": True,
+					"query": cypher_query,
+					"results": records,
+					"count": len(records)
+				}
+				if truncated:
+					query_result["truncated"] = True
+				self.result_cache.set(cypher_query, query_result)
+				return query_result
 					
 			except Exception as e:
 				error_msg = str(e)
@@ -196,34 +550,47 @@ class BIMGraphAgent:
 	def __init__(self):
 		"""Initialize the BIM Graph Agent system"""
 		self.neo4j_tool = None
+		self.llm = None
 		self.cypher_generator = None
 		self.response_generator = None
 		self.cypher_chain = None
 		self.response_chain = None
+		self.cypher_cache = LRUTTLCache(maxsize=512, ttl=None)  # normalized user query -> tuple of cleaned Cypher queries
+		
+		# (pattern, Cypher template, is_count) for trivial questions answered without the Cypher LLM.
+		# Patterns must match the whole question so filters like "on level 2" still go to the LLM
+		self.template_router = [
+			(re.compile(r'how\s+many\s+(\w+)' + _ROUTE_FILLER), 'MATCH (n:{label}) RETURN count(n) AS count', True),
+			(re.compile(r'(?:list|show|find|get)(?:\s+me)?(?:\s+all)?(?:\s+the)?\s+(\w+)' + _ROUTE_FILLER), 'MATCH (n:{label}) RETURN n.name, n.globalId, n.properties LIMIT 100', False),
+			(re.compile(r'(?:what|which)\s+ifc\s+files\s+are\s+loaded\s*\??'), 'MATCH (f:IFCFile) RETURN f.fileName, f.fileSize', False),
+		]
+		self.response_cache = LRUTTLCache(maxsize=512, ttl=300)  # normalized user query -> response
+		self.cypher_store = None  # persistent question embedding -> Cypher store (survives restarts)
+		self.event_loop = EventLoopThread()  # long-lived loop for the sync entry points (process_query)
 
 		self.setup_models()
 		self.setup_chains()
+		self.setup_cypher_store()
 		
 	def setup_models(self):
 		"""Setup and preload Ollama models for Cypher generation and response generation"""
 		try:
 			print("Initializing single LLM model for optimal performance...")
 			
-			# Model 1: Cypher Query Generator (qwen2.5-coder:7b)
+			# Single shared client (qwen2.5-coder:7b). keep_alive keeps the model resident between queries
 			print("Loading qwen2.5-coder:7b model...")
-			self.cypher_generator = ChatOllama(
+			self.llm = ChatOllama(
 				model="qwen2.5-coder:7b",
-				temperature=0.1,  # Low temperature for precise query generation
-				base_url="http://localhost:11434"
+				base_url="http://localhost:11434",
+				keep_alive="30m"
 			)
 			
-			# Model 2: Response Generator (using same model for optimal performance)
+			# Model 1: Cypher Query Generator - low temperature for precise query generation
+			self.cypher_generator = self.llm.bind(options={"temperature": 0.1})
+			
+			# Model 2: Response Generator - same client, slightly higher temperature for natural responses
 			print("Using qwen2.5-coder:7b for response generation too (single model approach)...")
-			self.response_generator = ChatOllama(
-				model="qwen2.5-coder:7b",
-				temperature=0.2,  # Slightly higher temperature for natural responses
-				base_url="http://localhost:11434"
-			)
+			self.response_generator = self.llm.bind(options={"temperature": 0.2})
 			
 			print("Preloading models with test queries...")
 			
@@ -246,6 +613,17 @@ class BIMGraphAgent:
 			print("You can check available models with: ollama list")
 			sys.exit(1)
 	
+	def setup_cypher_store(self, db_path: Optional[str] = None):
+		"""Setup the persistent Cypher store. The agent works without it if the embedding model is unavailable"""
+		try:
+			embedder = OllamaEmbeddings(model="nomic-embed-text", base_url="http://localhost:11434")
+			embedder.embed_query("Test connection")
+			self.cypher_store = CypherStore(db_path or str(current_dir / "cypher_cache.db"), embedder)
+			print("✓ Persistent Cypher store ready")
+		except Exception as e:
+			self.cypher_store = None
+			print(f"Warning: Persistent Cypher store disabled ({e}). Pull the model with: ollama pull nomic-embed-text")
+	
 	def setup_chains(self):
 		"""Setup and cache LangChain chains for faster query processing"""
 		try:
@@ -296,125 +674,11 @@ class BIMGraphAgent:
 	
 	def create_cypher_chain(self):
 		"""Create LangChain chain for converting natural language to Cypher"""
-		
-		# Schema information prompt
-		schema_info = """
-		BIM Graph Database Schema (Based on Actual Database Structure):
-		
-		Node Labels (Each IFC class has its own label):
-		- Element: Generic element properties
-		- IFCFile: IFC file metadata  
-		- IfcBeam, IfcBuilding, IfcBuildingStorey, IfcCovering, IfcDoor, IfcFooting
-		- IfcFurnishingElement, IfcMember, IfcOpeningElement, IfcRailing
-		- IfcRoof, IfcSite, IfcSlab, IfcSpace, IfcStair, IfcStairFlight
-		- IfcWall, IfcWallStandardCase, IfcWindow
-		
-		Common Node Properties:
-		- description, globalId, name, objectType, properties, sourceFileId, tag
-		- All properties are stored directly in each node
-		
-		IFCFile Properties:
-		- createdDate, fileId, fileName, filePath, fileSize, importDate, modifiedDate
-		
-		Relationship Types:
-		- AGGREGATES: Element -> Element (aggregation relationships)
-		- BELONGS_TO_FILE: Element -> IFCFile (links elements to their source file)  
-		- CONTAINED_IN: Element -> Element (spatial containment)
-		
-		CRITICAL Schema Rules:
-		1. Use specific IFC labels (IfcSpace, IfcWall, etc.) NOT generic Element label
-		2. Properties are stored as nested JSON in the 'properties' field
-		3. Do NOT try to access specific nested property paths - they vary by modeling tool
-		4. For property-related queries: Always return full properties JSON for LLM analysis
-		5. Standard approach: MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.name, s.properties
-		
-		Query Examples:
-		- Find space properties: MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.properties
-		- Count walls: MATCH (w:IfcWall) RETURN count(w)
-		- Find all doors: MATCH (d:IfcDoor) RETURN d.name, d.properties LIMIT 10
-		- Find file info: MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
-		- Get space with properties: MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.name, s.properties
-		- Find space by room name: MATCH (s:IfcSpace) WHERE s.properties CONTAINS 'A204' RETURN s.name, s.properties
-		"""
-		
-		cypher_prompt = ChatPromptTemplate.from_messages([
-			("system", """You are an agent in converting natural language queries to Neo4j Cypher queries for BIM/IFC data.
-			
-			""" + schema_info + """
-			
-			IMPORTANT: Properties are stored as nested JSON. For property-related queries (area, volume, etc.):
-			- Return the full properties JSON: RETURN s.name, s.properties
-			- Let the response processor extract specific values from the JSON
-			- Don't try to access specific nested paths as they vary by modeling tool
-			
-			Rules for Cypher generation:
-			1. Always use proper Cypher syntax
-			2. Use specific IFC labels (IfcSpace, IfcWall, IfcDoor, etc.) as node labels
-			3. Access element properties directly from the node (e.g., s.properties, s.name, s.globalId)
-			4. Do NOT traverse relationships for basic element properties  
-			5. Use WHERE clauses for additional filtering by name, etc.
-			6. Use LIMIT to prevent large result sets (default LIMIT 100)
-			7. For counts, use count() function
-			8. For file information, match on IFCFile nodes
-			9. For property searches (area, volume, etc.), return the entire properties JSON and let response processing extract relevant values
-			10. Use simple property access: s.properties (return full JSON for analysis)
-			11. For specific known properties, try common patterns but always include full properties as backup
-			
-			CORRECT Examples:
-			- MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.name, s.globalId, s.properties
-			- MATCH (w:IfcWall) RETURN count(w)
-			- MATCH (d:IfcDoor) RETURN d.name, d.globalId, d.properties LIMIT 10
-			- MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
-			- For property queries: Always include s.properties in RETURN clause
-			
-			WRONG Examples:
-			- MATCH (e:Element {{ifcClass: 'IfcSpace'}}) (Use direct IfcSpace label)
-			- Trying to access specific property paths like s.properties.PSet_Name.Property (paths vary by tool)
-			
-			Generate ONLY the Cypher query without explanation or markdown formatting.
-			"""),
-			("user", "Convert this query to Cypher: {query}")
-		])
-		
-		return cypher_prompt | self.cypher_generator | StrOutputParser()
+		return _CYPHER_PROMPT | self.cypher_generator | StrOutputParser()
 	
 	def create_response_chain(self):
 		"""Create LangChain chain for generating user-friendly responses"""
-		
-		response_prompt = ChatPromptTemplate.from_messages([
-			("system", """You are a helpful BIM agent assistant specialized in analyzing IFC element properties and answering user questions. You receive JSON results from Neo4j database queries about BIM/IFC data.
-			
-			CRITICAL: When analyzing element properties JSON:
-			1. Look for relevant information in the nested properties structure
-			2. Common property patterns to search for:
-			   - Area: look for keys containing 'Area', 'area', 'GrossFloorArea', '면적' etc.
-			   - Volume: look for 'Volume', 'volume', 'GrossVolume', '체적' etc.
-			   - Name: look for 'Name', 'name', '이름', 'Number' etc.
-			   - Level/Floor: look for 'Level', 'level', '층', 'Floor' etc.
-			   - Material: look for 'Material', 'material', '재료' etc.
-			3. Different modeling tools (Revit, ArchiCAD, Tekla, etc.) use different property set names
-			4. Property sets may have names like: 'PSet_Revit_Dimensions', 'BaseQuantities', 'Pset_SpaceCommon' etc.
-			5. Always search through ALL property sets to find relevant information
-			
-			Your responses should:
-			1. Extract and highlight the specific information requested by the user
-			2. Provide clear numerical values with appropriate units when available
-			3. Explain where the information was found in the properties structure
-			4. Be concise but informative for construction professionals
-			5. Handle Korean and English property names equally
-			
-			If no relevant property is found, suggest what to look for or mention that the property might not be available in this model.
-			"""),
-			("user", """
-			Original Query: {original_query}
-			Cypher Query: {cypher_query}
-			Query Results: {query_results}
-			
-			Please provide a helpful response based on these results.
-			""")
-		])
-		
-		return response_prompt | self.response_generator | StrOutputParser()
+		return _RESPONSE_PROMPT | self.response_generator | StrOutputParser()
 	
 	def clean_cypher_query(self, cypher_query: str) -> str:
 		"""
@@ -430,48 +694,18 @@ class BIMGraphAgent:
 			cleaned = cypher_query
 			
 			# Remove markdown code blocks (various formats)
-			cleaned = re.sub(r'```cypher\s*\n?', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'```sql\s*\n?', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'```\s*\n?', '', cleaned)
-			
-			# Remove common prefixes that LLMs might add
-			cleaned = re.sub(r'^(cypher|sql):\s*', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'^(cypher|sql)\s+', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'^query:\s*', '', cleaned, flags=re.IGNORECASE)
-			
-			# Remove explanation text (everything after newlines that don't contain Cypher keywords)
-			cypher_keywords = ['MATCH', 'WHERE', 'RETURN', 'WITH', 'CREATE', 'DELETE', 'SET', 'REMOVE', 'MERGE', 'UNWIND', 'ORDER BY', 'LIMIT', 'SKIP']
-			lines = cleaned.split('\n')
-			cypher_lines = []
-			
-			for line in lines:
-				line = line.strip()
-				if not line:
-					continue
-				
-				# Check if line contains Cypher keywords or continues a query
-				is_cypher_line = any(keyword in line.upper() for keyword in cypher_keywords)
-				is_continuation = line.startswith(('(', ')', '[', ']', '{', '}', ',', '.', '-', ':', '<', '>', '='))
-				
-				if is_cypher_line or is_continuation or not cypher_lines:
-					cypher_lines.append(line)
-				else:
-					# Stop processing when we hit explanatory text
-					break
-			
-			cleaned = ' '.join(cypher_lines)
+			cleaned = _RE_CODEBLOCK.sub('', cleaned)
 			
-			# Normalize whitespace
-			cleaned = re.sub(r'\s+', ' ', cleaned)
+			# Remove common prefixes that LLMs might add (cypher:, sql, query:)
+			cleaned = _RE_PREFIX.sub('', cleaned, count=1)
 			
-			# Remove leading/trailing whitespace
-			cleaned = cleaned.strip()
+			# Remove explanation text (everything from the first line without Cypher keywords),
+			# then join the remaining lines and normalize whitespace
+			cleaned = _CYPHER_EXTRACT.match(cleaned).group(0)
+			cleaned = _RE_WS.sub(' ', cleaned).strip()
 			
-			# Remove trailing punctuation that's not part of Cypher
-			cleaned = re.sub(r'[.!?]+\s*$', '', cleaned)
-			
-			# Remove trailing semicolons
-			cleaned = re.sub(r';\s*$', '', cleaned)
+			# Remove trailing punctuation and semicolons that are not part of Cypher
+			cleaned = _RE_TRAIL.sub('', cleaned)
 			
 			# Remove quotes around the entire query
 			if (cleaned.startswith('"') and cleaned.endswith('"')) or (cleaned.startswith("'") and cleaned.endswith("'")):
@@ -483,11 +717,103 @@ class BIMGraphAgent:
 			print(f"Warning: Error cleaning Cypher query: {e}")
 			# Fallback: basic cleanup
 			fallback = cypher_query.strip()
-			fallback = re.sub(r'```cypher\s*\n?', '', fallback, flags=re.IGNORECASE)
-			fallback = re.sub(r'```\s*\n?', '', fallback)
-			fallback = re.sub(r'\s+', ' ', fallback)
+			fallback = _RE_CODEBLOCK.sub('', fallback)
+			fallback = _RE_WS.sub(' ', fallback)
 			return fallback.strip()
 	
+	def parse_cypher_output(self, raw_output: str) -> Tuple[str, ...]:
+		"""
+		Split LLM output into cleaned Cypher queries. The LLM returns either a single query
+		or a JSON array of independent sub-queries
+		
+		Args:
+			raw_output: Raw Cypher generator output
+			
+		Returns:
+			Tuple of cleaned Cypher queries
+		"""
+		text = _RE_CODEBLOCK.sub('', raw_output).strip()
+		if text.startswith('['):
+			try:
+				queries = json.loads(text)
+				if isinstance(queries, list) and queries and all(isinstance(q, str) for q in queries):
+					return tuple(dict.fromkeys(self.clean_cypher_query(q) for q in queries))
+			except ValueError:
+				pass
+		return (self.clean_cypher_query(raw_output),)
+	
+	async def aexecute_queries(self, cypher_queries: Tuple[str, ...]) -> Dict[str, Any]:
+		"""
+		Execute independent Cypher queries concurrently in worker threads
+		(Neo4j driver calls are blocking)
+		
+		Args:
+			cypher_queries: Cypher queries from parse_cypher_output
+			
+		Returns:
+			Result dictionary of the single query, or a merged dictionary holding each sub-query result
+		"""
+		sub_results = await asyncio.gather(*[
+			asyncio.to_thread(self.neo4j_tool.execute_query, q) for q in cypher_queries
+		])
+		if len(sub_results) == 1:
+			return sub_results[0]
+		return {
+			"success": all(r.get("success") for r in sub_results),
+			"query": list(cypher_queries),
+			"results": sub_results,
+			"count": sum(r.get("count", 0) for r in sub_results)
+		}
+	
+	def route_query(self, user_query: str) -> Optional[Tuple[str, Optional[str]]]:
+		"""
+		Map a trivial question to a templated Cypher query, bypassing the Cypher LLM
+		
+		Args:
+			user_query: Natural language query from user
+			
+		Returns:
+			(cypher_query, count_noun) when a template matches, otherwise None.
+			count_noun is the counted noun for count queries and None for other templates
+		"""
+		text = " ".join(user_query.lower().split())
+		for pattern, template, is_count in self.template_router:
+			match = pattern.fullmatch(text)
+			if not match:
+				continue
+			if not pattern.groups:
+				return template, None
+			noun = match.group(1)
+			label = _LABEL_ALIASES.get(noun)
+			if label is None:
+				continue
+			return template.format(label=label), (noun if is_count else None)
+		return None
+	
+	@staticmethod
+	def format_direct_response(user_query: str, query_results: Dict[str, Any]) -> Optional[str]:
+		"""
+		Format results that need no interpretation (no rows, or a single numeric value)
+		without calling the response LLM
+		
+		Args:
+			user_query: Natural language query from user
+			query_results: Result dictionary from execute_query / aexecute_queries
+			
+		Returns:
+			Response string, or None when the results should be explained by the response LLM
+		"""
+		if not query_results.get("success") or not isinstance(query_results.get("query"), str):
+			return None
+		results = query_results.get("results") or []
+		if not results:
+			return f"{user_query}\n→ No matching elements were found in the BIM model."
+		if len(results) == 1 and len(results[0]) == 1:
+			key, value = next(iter(results[0].items()))
+			if isinstance(value, (int, float)) and not isinstance(value, bool):
+				return f"{user_query}\n→ {key}: {value}"
+		return None
+	
 	def process_query(self, user_query: str) -> str:
 		"""
 		Process user query through the complete chain
@@ -495,36 +821,160 @@ class BIMGraphAgent:
 		Args:
 			user_query: Natural language query from user
 			
+		Returns:
+			Generated response string
+		"""
+		return self.event_loop.run(self.aprocess_query(user_query))
+	
+	async def aprocess_query(self, user_query: str, num_candidates: int = 1) -> str:
+		"""
+		Process user query through the complete chain without blocking the event loop
+		
+		Args:
+			user_query: Natural language query from user
+			num_candidates: Number of Cypher candidates generated concurrently. The first
+				candidate that returns rows is used (voting)
+			
 		Returns:
 			Generated response string
 		"""
 		try:
 			print(f"Processing query: {user_query}")
 			
-			# Step 1: Convert to Cypher using pre-cached chain
-			raw_cypher_query = self.cypher_chain.invoke({"query": user_query})
-			print(f"Raw generated Cypher: {raw_cypher_query}")
+			cache_key = " ".join(user_query.lower().split())
+			cached_response = self.response_cache.get(cache_key)
+			if cached_response is not None:
+				print("Using cached response")
+				return cached_response
 			
-			# Step 1.5: Clean Cypher query
-			cypher_query = self.clean_cypher_query(raw_cypher_query)
-			print(f"Cleaned Cypher: {cypher_query}")
+			# A candidate is a tuple of independent Cypher queries (usually just one)
+			count_noun = None
+			routed = self.route_query(user_query)
+			cached_cypher = self.cypher_cache.get(cache_key)
+			stored_cypher, question_embedding = None, None
+			if routed is None and cached_cypher is None and self.cypher_store:
+				try:
+					stored_cypher, question_embedding = await asyncio.to_thread(self.cypher_store.lookup, user_query)
+				except Exception as e:
+					print(f"Warning: Cypher store lookup failed: {e}")
 			
-			# Step 2: Execute Cypher query
-			query_results = self.neo4j_tool.execute_query(cypher_query)
+			if routed is not None:
+				candidates = [(routed[0],)]
+				count_noun = routed[1]
+				print(f"Routed Cypher: {routed[0]}")
+			elif cached_cypher is not None:
+				candidates = [cached_cypher]
+				print(f"Cached Cypher: {'; '.join(cached_cypher)}")
+			elif stored_cypher is not None:
+				candidates = [stored_cypher]
+				print(f"Stored Cypher: {'; '.join(stored_cypher)}")
+			else:
+				# Step 1: Convert to Cypher using pre-cached chain (candidates are generated concurrently)
+				raw_cypher_queries = await asyncio.gather(*[
+					self.cypher_chain.ainvoke({"query": user_query}) for _ in range(num_candidates)
+				])
+				print(f"Raw generated Cypher: {raw_cypher_queries[0]}")
+				
+				# Step 1.5: Clean Cypher queries and drop duplicate candidates
+				candidates = list(dict.fromkeys(self.parse_cypher_output(q) for q in raw_cypher_queries))
+				print(f"Cleaned Cypher: {'; '.join(candidates[0])}")
+			
+			# Step 2: Execute all candidates (and their sub-queries) concurrently
+			candidate_results = await asyncio.gather(*[self.aexecute_queries(c) for c in candidates])
+			cypher_queries, query_results = next(
+				((c, r) for c, r in zip(candidates, candidate_results) if r.get("success") and r.get("results")),
+				(candidates[0], candidate_results[0])
+			)
+			cypher_query = "; ".join(cypher_queries)
 			print(f"Query executed, found {query_results.get('count', 0)} results")
+			if query_results.get("success") and routed is None:
+				self.cypher_cache.set(cache_key, cypher_queries)
+				if question_embedding is not None and stored_cypher is None:
+					await asyncio.to_thread(self.cypher_store.add, user_query, question_embedding, cypher_queries)
+			
+			# Routed count query: format the scalar directly instead of calling the response LLM
+			if count_noun and query_results.get("success") and query_results.get("count") == 1:
+				return f"There are {query_results['results'][0]['count']} {count_noun}."
+			
+			# Empty or single scalar result: no need to run the response LLM
+			response = self.format_direct_response(user_query, query_results)
+			if response is not None:
+				self.response_cache.set(cache_key, response)
+				return response
 			
 			# Step 3: Generate response using pre-cached chain
-			response = self.response_chain.invoke({
+			response = await self.response_chain.ainvoke({
 				"original_query": user_query,
 				"cypher_query": cypher_query,
-				"query_results": json.dumps(query_results, indent=2)
+				"query_results": orjson.dumps(query_results, default=str, option=orjson.OPT_NON_STR_KEYS).decode()  # compact JSON -> fewer prompt tokens
 			})
 			
+			if query_results.get("success"):
+				self.response_cache.set(cache_key, response)
 			return response
 			
 		except Exception as e:
 			return f"Error processing query: {str(e)}"
 	
+	async def process_batch(self, user_queries: List[str]) -> List[str]:
+		"""
+		Process several user queries concurrently
+		
+		Args:
+			user_queries: Natural language queries
+			
+		Returns:
+			Generated responses in the same order as the queries
+		"""
+		return await asyncio.gather(*[self.aprocess_query(q) for q in user_queries])
+	
+	def process_queries_batch(self, user_queries: List[str]) -> List[str]:
+		"""
+		Process a list of queries (scripted/evaluation mode) with batched LLM calls.
+		Cypher generation and response generation are each sent as one batch so the
+		Ollama server can schedule the prompts together
+		
+		Args:
+			user_queries: Natural language queries
+			
+		Returns:
+			Generated responses in the same order as the queries
+		"""
+		try:
+			# Step 1: Batched Cypher generation
+			raw_cypher_queries = self.cypher_chain.batch([{"query": q} for q in user_queries])
+			candidates = [self.parse_cypher_output(raw) for raw in raw_cypher_queries]
+			
+			# Step 2: Execute all queries concurrently
+			async def execute_all():
+				return await asyncio.gather(*[self.aexecute_queries(c) for c in candidates])
+			all_results = self.event_loop.run(execute_all())
+			
+			# Step 3: Batched response generation, only for results that need the response LLM
+			responses = [self.format_direct_response(q, r) for q, r in zip(user_queries, all_results)]
+			pending = [i for i, response in enumerate(responses) if response is None]
+			generated = self.response_chain.batch([
+				{
+					"original_query": user_queries[i],
+					"cypher_query": "; ".join(candidates[i]),
+					"query_results": orjson.dumps(all_results[i], default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+				}
+				for i in pending
+			]) if pending else []
+			for i, response in zip(pending, generated):
+				responses[i] = response
+			return responses
+			
+		except Exception as e:
+			return [f"Error processing query: {str(e)}"] * len(user_queries)
+	
+	def clear_cache(self):
+		"""Drop cached Cypher queries, query results and responses"""
+		self.cypher_cache.clear()
+		self.response_cache.clear()
+		if self.neo4j_tool:
+			self.neo4j_tool.result_cache.clear()
+	
 	def run_console_interface(self):
 		print("BIM Graph Agent - AI-Powered BIM Data Query System")
 		print("Ask questions about your BIM data in natural language!")
@@ -533,7 +983,7 @@ class BIMGraphAgent:
 		print("- Show me all doors in the project")
 		print("- What IFC files are loaded?")
 		print("- Find elements on the ground floor")
-		print("\nType 'quit' or 'exit' to stop")
+		print("\nType 'refresh' to clear cached answers, 'quit' or 'exit' to stop")
 		
 		while True:
 			try:
@@ -549,6 +999,11 @@ class BIMGraphAgent:
 					print("Please enter a question.")
 					continue
 				
+				if user_query.lower() == 'refresh':
+					self.clear_cache()
+					print("Cache cleared.")
+					continue
+				
 				# Process query
 				print("\nProcessing...")
 				response = self.process_query(user_query)
@@ -633,6 +1088,7 @@ def main():
 			# Cleanup
 			if agent.neo4j_tool:
 				agent.neo4j_tool.close()
+			agent.event_loop.close()
 		
 		return 0
 		
@@ -7,33 +7,314 @@ to return structured JSON responses.
 
 Architecture:
 1. User Input (Natural Language) -> 
-2. LLM (qwen2.5-coder:7b) converts to Cypher -> 
+2. LLM (qwen2.5-coder:1.5b) converts to Cypher -> 
 3. FalkorDB Query Execution -> JSON Result -> 
-4. LLM generates user-friendly response
+4. LLM (qwen2.5-coder:7b, 4-bit) generates user-friendly response
 
 Usage:
 	python BIM_graph_agent_falkordb.py
 
+LLM backend:
+	Ollama is used by default. For many concurrent users (e.g. the Streamlit app) set
+	LLM_BACKEND=vllm in .env to use a vLLM OpenAI-compatible server, which batches the
+	requests of all sessions into shared forward passes (continuous batching) and reuses
+	the KV cache of the common system prompt prefix:
+	python -m vllm.entrypoints.openai.api_server --model Qwen/Qwen2.5-Coder-7B-Instruct-AWQ --quantization awq --max-num-seqs 64 --enable-prefix-caching
+	Optional settings: VLLM_BASE_URL (default http://localhost:8000/v1), VLLM_MODEL
+
+	When GROQ_API_KEY is set, the response stage (the longer output) runs on Groq's hosted
+	API instead (GROQ_RESPONSE_MODEL, default qwen-2.5-coder-32b) while Cypher generation stays
+	local, so the local GPU can work on the next question while a response is being decoded.
+
 Contact: Taewook Kang (laputa99999@gmail.com)
 """
 
-import json
 import sys
 import os
 import time
 import re
+import threading
+import queue
+from concurrent.futures import Future
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from dotenv import load_dotenv
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+import orjson
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_ollama import ChatOllama
-from falkordb import FalkorDB
+from langchain_core.messages import SystemMessage
+# langchain_ollama/langchain_openai and falkordb/redis are imported where they are first used
+# (setup_models, FalkorDBQueryTool.connect), so importing this module from the Streamlit app stays fast
+try:
+	from dotenv import load_dotenv
+except ImportError:  # optional: variables can also be set in the environment
+	load_dotenv = None
 
 # Add project source to path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+# Cypher generation from the fixed schema is a narrow task, so a 1.5B coder model is enough and
+# decodes ~4x faster. The 7B model (4-bit Q4_K_M build: decoding is memory-bandwidth bound, so smaller
+# weights decode faster) is kept for the response, where answer quality matters.
+# Pull with: ollama pull qwen2.5-coder:1.5b && ollama pull qwen2.5-coder:7b-instruct-q4_K_M
+CYPHER_MODEL = "qwen2.5-coder:1.5b"
+RESPONSE_MODEL = "qwen2.5-coder:7b-instruct-q4_K_M"
+
+_RE_LABEL = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def cypher_schema(labels=()) -> Dict[str, Any]:
+	"""
+	Grammar for constrained Cypher decoding. The server turns this JSON schema into a grammar and masks
+	every token that cannot continue a {"cypher": "[OPTIONAL ]MATCH ... RETURN ..."} object, so the output
+	is always parseable
+	
+	Args:
+		labels: Node labels of the connected graph. When given, a label on the first node pattern
+			must be one of them; without labels any MATCH ... RETURN query is allowed
+			
+	Returns:
+		JSON schema dictionary
+	"""
+	labels = [label for label in labels if _RE_LABEL.fullmatch(label)]
+	if labels:
+		first_node = r"\([a-zA-Z0-9_]*(:(" + "|".join(labels) + r"))?[) {]"
+	else:
+		first_node = ""
+	return {
+		"type": "object",
+		"properties": {
+			"cypher": {
+				"type": "string",
+				"pattern": r"^(OPTIONAL )?MATCH " + first_node + r"[^;]* RETURN [^;]+$"
+			}
+		},
+		"required": ["cypher"]
+	}
+
+# Rule-based fast path: frequent questions mapped straight to Cypher, skipping the Cypher LLM.
+# Plural nouns used in questions -> IFC node labels
+_LABEL_ALIASES = {
+	"walls": "IfcWall", "doors": "IfcDoor", "windows": "IfcWindow",
+	"spaces": "IfcSpace", "rooms": "IfcSpace", "slabs": "IfcSlab",
+	"beams": "IfcBeam", "members": "IfcMember", "stairs": "IfcStair",
+	"railings": "IfcRailing", "roofs": "IfcRoof", "coverings": "IfcCovering",
+	"footings": "IfcFooting", "storeys": "IfcBuildingStorey", "floors": "IfcBuildingStorey",
+	"openings": "IfcOpeningElement", "furnishings": "IfcFurnishingElement",
+}
+# Optional trailing words that do not change the meaning of a question
+_FAST_PATH_FILLER = r'(?:\s+(?:are\s+there|are\s+in\s+the\s+(?:building|project|model)|in\s+the\s+(?:building|project|model)|with\s+their\s+properties))?\s*\??'
+# (pattern on the normalized question, match -> Cypher or None when the noun is unknown)
+_FAST_PATHS = [
+	(re.compile(r'(?:how\s+many|count(?:\s+all)?(?:\s+the)?)\s+(\w+)' + _FAST_PATH_FILLER),
+		lambda m: f"MATCH (n:{_LABEL_ALIASES[m.group(1)]}) RETURN count(n) as count" if m.group(1) in _LABEL_ALIASES else None),
+	(re.compile(r'(?:list|show|find|get)(?:\s+me)?(?:\s+all)?(?:\s+the)?\s+(\w+)' + _FAST_PATH_FILLER),
+		lambda m: f"MATCH (n:{_LABEL_ALIASES[m.group(1)]}) RETURN n.name, n.globalId, n.properties LIMIT 100" if m.group(1) in _LABEL_ALIASES else None),
+	(re.compile(r'(?:what|which)\s+ifc\s+files\s+are\s+loaded\s*\??'),
+		lambda m: "MATCH (f:IFCFile) RETURN f.fileName, f.fileSize"),
+]
+
+# Size of the redis connection pool shared by all sessions (one socket per in-flight query)
+MAX_DB_CONNECTIONS = 16
+
+# Maximum number of result rows passed on to the response LLM (prompt size grows linearly with rows)
+MAX_PROMPT_RESULTS = 20
+
+# Number of answered questions kept in the in-memory response cache (LRU)
+RESPONSE_CACHE_SIZE = 512
+_RE_WS = re.compile(r'\s+')
+
+# Precompiled patterns used by clean_cypher_query
+_RE_FENCE_LANG = re.compile(r'```(?:cypher|sql)\s*\n?', re.IGNORECASE)
+_RE_FENCE = re.compile(r'```\s*\n?')
+_RE_PREFIX_COLON = re.compile(r'^(?:cypher|sql):\s*', re.IGNORECASE)
+_RE_PREFIX_SPACE = re.compile(r'^(?:cypher|sql)\s+', re.IGNORECASE)
+_RE_PREFIX_QUERY = re.compile(r'^query:\s*', re.IGNORECASE)
+_RE_TRAIL_PUNCT = re.compile(r'[.!?;]+\s*$')
+_RE_WORD = re.compile(r'[A-Z]+')
+_CYPHER_KW = frozenset(('MATCH', 'WHERE', 'RETURN', 'WITH', 'CREATE', 'DELETE', 'SET', 'REMOVE', 'MERGE', 'UNWIND', 'ORDER', 'LIMIT', 'SKIP'))
+
+# Literal values in generated Cypher, replaced by $parameters so FalkorDB can reuse the cached query plan.
+# Backtick-quoted identifiers (group 1) are matched first so their text is never parameterized;
+# groups 2/3 are string literals, groups 4/5 numbers after : = < >
+_RE_LITERAL = re.compile(
+	r"(`(?:[^`]|``)*`)"
+	r"|'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\""
+	r"|(?<=[:=<>])(\s*)(-?\d+(?:\.\d+)?)\b"
+)
+_RE_ESCAPE = re.compile(r'\\(.)')
+
+
+def _column_name(header, idx: int) -> str:
+	"""Column name from a FalkorDB result header ([column_type, name] pair or object with .name)"""
+	if hasattr(header, 'name'):
+		return header.name
+	if isinstance(header, (list, tuple)) and len(header) > 1:
+		return header[1]
+	return f"col_{idx}"
+
+
+def _pick_decoder(value):
+	"""Choose the converter for a result column from a sample value (FalkorDB node/relationship or scalar)"""
+	if hasattr(value, 'properties'):
+		return lambda v: None if v is None else dict(v.properties)
+	if hasattr(value, 'relation'):  # Relationship
+		return lambda v: None if v is None else {"type": v.relation, "properties": dict(getattr(v, 'properties', {}))}
+	return lambda v: v
+
+# Static system prompts, built once at import time. The schema is inlined and nothing dynamic
+# precedes the user turn, so every request starts with a bit-identical prefix whose KV cache
+# the LLM server can reuse (Ollama keeps it for the loaded model, vLLM with --enable-prefix-caching)
+_CYPHER_SYSTEM = """You are an agent in converting natural language queries to Cypher queries for BIM/IFC data in FalkorDB.
+
+BIM Graph Database Schema (FalkorDB):
+
+Node Labels (Each IFC class has its own label):
+- Element: Generic element properties
+- IFCFile: IFC file metadata
+- IfcBeam, IfcBuilding, IfcBuildingStorey, IfcCovering, IfcDoor, IfcFooting
+- IfcFurnishingElement, IfcMember, IfcOpeningElement, IfcRailing
+- IfcRoof, IfcSite, IfcSlab, IfcSpace, IfcStair, IfcStairFlight
+- IfcWall, IfcWallStandardCase, IfcWindow
+
+Common Node Properties:
+- description, globalId, name, objectType, properties, sourceFileId, tag
+- All properties are stored directly in each node
+
+IFCFile Properties:
+- createdDate, fileId, fileName, filePath, fileSize, importDate, modifiedDate
+
+Relationship Types:
+- AGGREGATES: Element -> Element (aggregation relationships)
+- BELONGS_TO_FILE: Element -> IFCFile (links elements to their source file)
+- CONTAINED_IN: Element -> Element (spatial containment)
+
+CRITICAL Schema Rules:
+1. Use specific IFC labels (IfcSpace, IfcWall, etc.) NOT generic Element label
+2. Properties are stored as nested JSON in the 'properties' field: {"PropertySetName": {"PropertyName": value}}
+3. Do NOT try to access specific property keys - property set names vary by modeling tool
+4. For property-related queries: Always return full properties JSON for LLM analysis
+5. Standard approach: MATCH (s:IfcSpace {name: 'A204'}) RETURN s.name, s.properties
+
+Query Examples:
+- Find space properties: MATCH (s:IfcSpace {name: 'A204'}) RETURN s.properties
+- Count walls: MATCH (w:IfcWall) RETURN count(w)
+- Find all doors: MATCH (d:IfcDoor) RETURN d.name, d.properties LIMIT 10
+- Find file info: MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
+- Get space with properties: MATCH (s:IfcSpace {name: 'A204'}) RETURN s.name, s.properties
+
+IMPORTANT: Properties are stored as nested JSON (property set -> property -> value). Some imports also copy each value to a node property named `PropertySetName__PropertyName`, but not all do. For property-related queries (area, volume, etc.):
+- Return the full properties JSON: RETURN s.name, s.properties
+- Let the response processor extract specific values from the JSON
+- Don't try to access specific property keys as they vary by modeling tool
+
+Rules for Cypher generation:
+1. Always use proper Cypher syntax compatible with FalkorDB
+2. Use specific IFC labels (IfcSpace, IfcWall, IfcDoor, etc.) as node labels
+3. Access element properties directly from the node (e.g., s.properties, s.name, s.globalId)
+4. Do NOT traverse relationships for basic element properties
+5. Use WHERE clauses for additional filtering by name, etc.
+6. Use LIMIT to prevent large result sets (default LIMIT 100)
+7. For counts, use count() function
+8. For file information, match on IFCFile nodes
+9. For property searches, return the entire properties JSON
+10. Use simple property access: s.properties (return full JSON for analysis)
+
+CORRECT Examples:
+- MATCH (s:IfcSpace {name: 'A204'}) RETURN s.name, s.globalId, s.properties
+- MATCH (w:IfcWall) RETURN count(w)
+- MATCH (d:IfcDoor) RETURN d.name, d.globalId, d.properties LIMIT 10
+- MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
+
+WRONG Examples:
+- MATCH (e:Element {ifcClass: 'IfcSpace'}) (Use direct IfcSpace label)
+- Trying to access specific property paths like s.properties.PSet_Name.Property
+
+Return ONLY a JSON object of the form {"cypher": "<Cypher query>"} without explanation or markdown formatting."""
+
+_RESPONSE_SYSTEM = """You are a helpful BIM agent assistant specialized in analyzing IFC element properties and answering user questions. You receive JSON results from FalkorDB database queries about BIM/IFC data.
+
+CRITICAL: When analyzing element properties JSON:
+1. Look for relevant information in the nested properties structure (property set -> property -> value); values may also appear as 'PropertySetName__PropertyName' columns
+2. Common property patterns to search for:
+   - Area: look for keys containing 'Area', 'area', 'GrossFloorArea', '면적' etc.
+   - Volume: look for 'Volume', 'volume', 'GrossVolume', '체적' etc.
+   - Name: look for 'Name', 'name', '이름', 'Number' etc.
+   - Level/Floor: look for 'Level', 'level', '층', 'Floor' etc.
+   - Material: look for 'Material', 'material', '재료' etc.
+3. Different modeling tools (Revit, ArchiCAD, Tekla, etc.) use different property set names
+4. Property sets may have names like: 'PSet_Revit_Dimensions', 'BaseQuantities', 'Pset_SpaceCommon' etc.
+5. Always search through ALL property sets to find relevant information
+
+Your responses should:
+1. Extract and highlight the specific information requested by the user
+2. Provide clear numerical values with appropriate units when available
+3. Explain where the information was found in the properties structure
+4. Be concise but informative for construction professionals
+5. Handle Korean and English property names equally
+
+If no relevant property is found, suggest what to look for or mention that the property might not be available in this model."""
+
+_CYPHER_PROMPT = ChatPromptTemplate.from_messages([
+	SystemMessage(content=_CYPHER_SYSTEM),
+	("user", "Convert this query to Cypher: {query}")
+])
+
+_RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
+	SystemMessage(content=_RESPONSE_SYSTEM),
+	("user", "Original Query: {original_query}\nCypher Query: {cypher_query}\nQuery Results: {query_results}\n\nPlease provide a helpful response based on these results.")
+])
+
+
+class BatchedLLM:
+	"""
+	Coalesce concurrent calls to a LangChain runnable into one batch call.
+	Requests arriving within max_wait seconds (up to max_batch_size) are sent together,
+	so the LLM server can run them in one batched forward pass. A worker thread is used
+	instead of an asyncio task because every Streamlit session runs its own event loop
+	"""
+	
+	def __init__(self, runnable, max_batch_size: int = 8, max_wait: float = 0.01):
+		self.runnable = runnable
+		self.max_batch_size = max_batch_size
+		self.max_wait = max_wait
+		self.requests = queue.Queue()
+		threading.Thread(target=self._worker, daemon=True).start()
+	
+	def submit_future(self, item) -> Future:
+		"""Queue one input and return the future of its output"""
+		future = Future()
+		self.requests.put((item, future))
+		return future
+	
+	def submit(self, item):
+		"""Run one input as part of the next batch and wait for its output"""
+		return self.submit_future(item).result()
+	
+	def _worker(self):
+		while True:
+			batch = [self.requests.get()]
+			deadline = time.monotonic() + self.max_wait
+			while len(batch) < self.max_batch_size:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break
+				try:
+					batch.append(self.requests.get(timeout=remaining))
+				except queue.Empty:
+					break
+			
+			try:
+				outputs = self.runnable.batch([item for item, _ in batch], return_exceptions=True)
+			except Exception as e:
+				outputs = [e] * len(batch)
+			for (_, future), output in zip(batch, outputs):
+				if isinstance(output, Exception):
+					future.set_exception(output)
+				else:
+					future.set_result(output)
+
 
 class FalkorDBQueryTool:
 	"""Tool for executing Cypher queries against FalkorDB BIM graph database"""
@@ -56,6 +337,9 @@ class FalkorDBQueryTool:
 		self.graph_name = graph_name
 		self.client = None
 		self.graph = None
+		self.pool = None
+		# One client is shared by all Streamlit sessions; the lock keeps concurrent reconnects from interleaving
+		self.lock = threading.Lock()
 		
 	def connect(self, max_retries: int = 3, retry_delay: float = 2.0) -> bool:
 		"""
@@ -65,22 +349,32 @@ class FalkorDBQueryTool:
 			max_retries: Maximum number of connection attempts
 			retry_delay: Delay between retry attempts in seconds
 		"""
+		with self.lock:
+			return self._connect(max_retries, retry_delay)
+	
+	def _connect(self, max_retries: int, retry_delay: float) -> bool:
+		import redis
+		from falkordb import FalkorDB
+		
 		for attempt in range(max_retries):
 			try:
 				print(f"Attempting to connect to FalkorDB (attempt {attempt + 1}/{max_retries})...")
 				
-				# Close existing connection if any
-				if self.client:
-					self.client = None
-					self.graph = None
+				# Drop the sockets of a broken connection; the pool itself is reused
+				if self.pool:
+					self.pool.disconnect()
+				else:
+					self.pool = redis.ConnectionPool(
+						host=self.host,
+						port=self.port,
+						username=self.username,
+						password=self.password,
+						max_connections=MAX_DB_CONNECTIONS
+					)
 				
-				# Create new client
-				self.client = FalkorDB(
-					host=self.host,
-					port=self.port,
-					username=self.username,
-					password=self.password
-				)
+				# Client on the pool: concurrent queries each borrow their own connection
+				if not self.client:
+					self.client = FalkorDB(connection_pool=self.pool)
 				
 				# Select graph
 				self.graph = self.client.select_graph(self.graph_name)
@@ -111,6 +405,7 @@ class FalkorDBQueryTool:
 		"""Close database connection"""
 		if self.client:
 			try:
+				self.pool.disconnect()
 				self.client = None
 				self.graph = None
 				print("FalkorDB connection closed")
@@ -128,12 +423,43 @@ class FalkorDBQueryTool:
 		except Exception:
 			return False
 	
-	def execute_query(self, cypher_query: str, max_retries: int = 2) -> Dict[str, Any]:
+	@staticmethod
+	def parameterize_query(cypher_query: str) -> Tuple[str, Dict[str, Any]]:
+		"""
+		Replace string and number literals with $p0, $p1, ... parameters.
+		FalkorDB caches query plans by query text, so queries that differ only in values share one plan
+		
+		Args:
+			cypher_query: Cypher query string with literal values
+			
+		Returns:
+			(parameterized query, parameters dictionary)
+		"""
+		params = {}
+		
+		def to_param(value):
+			name = f"p{len(params)}"
+			params[name] = value
+			return f"${name}"
+		
+		def replace_literal(match):
+			identifier, single_quoted, double_quoted, space, number = match.groups()
+			if identifier is not None:
+				return identifier
+			if number is not None:
+				return space + to_param(float(number) if '.' in number else int(number))
+			value = single_quoted if single_quoted is not None else double_quoted
+			return to_param(_RE_ESCAPE.sub(r'\1', value))
+		
+		return _RE_LITERAL.sub(replace_literal, cypher_query), params
+	
+	def execute_query(self, cypher_query: str, params: Optional[Dict[str, Any]] = None, max_retries: int = 2) -> Dict[str, Any]:
 		"""
 		Execute Cypher query with retry logic and return JSON result
 		
 		Args:
 			cypher_query: Cypher query string
+			params: Query parameters. If None, literals in the query are turned into parameters
 			max_retries: Maximum number of query execution attempts
 			
 		Returns:
@@ -142,34 +468,28 @@ class FalkorDBQueryTool:
 		if not self.client or not self.graph:
 			return {"success": False, "error": "Not connected to database", "results": []}
 		
+		if params is None:
+			parameterized_query, params = self.parameterize_query(cypher_query)
+		else:
+			parameterized_query = cypher_query
+		
 		for attempt in range(max_retries):
 			try:
-				result = self.graph.query(cypher_query)
+				result = self.graph.query(parameterized_query, params or None)
 				
 				# Convert result to list of dictionaries
 				records = []
-				if result.result_set:
+				rows = result.result_set
+				if rows:
 					# Get column headers
 					headers = result.header if hasattr(result, 'header') else []
 					
-					for row in result.result_set:
-						record_dict = {}
-						for idx, value in enumerate(row):
-							# Get column name
-							col_name = headers[idx].name if idx < len(headers) and hasattr(headers[idx], 'name') else f"col_{idx}"
-							
-							# Handle FalkorDB node/relationship objects
-							if hasattr(value, 'properties'):
-								record_dict[col_name] = dict(value.properties)
-							elif hasattr(value, 'relation'):  # Relationship
-								record_dict[col_name] = {
-									"type": value.relation if hasattr(value, 'relation') else "Unknown",
-									"properties": dict(value.properties) if hasattr(value, 'properties') else {}
-								}
-							else:
-								record_dict[col_name] = value
-						
-						records.append(record_dict)
+					# Resolve column names and converters once (converter from the first non-null value)
+					# instead of probing every cell with hasattr
+					col_names = [_column_name(headers[idx] if idx < len(headers) else None, idx) for idx in range(len(rows[0]))]
+					decoders = [_pick_decoder(next((row[idx] for row in rows if row[idx] is not None), None)) for idx in range(len(col_names))]
+					
+					records = [dict(zip(col_names, [fn(value) for fn, value in zip(decoders, row)])) for row in rows]
 				
 				return {
 					"success": True,
@@ -211,47 +531,81 @@ class BIMGraphAgent:
 	def __init__(self):
 		"""Initialize the BIM Graph Agent system"""
 		self.falkordb_tool = None
+		self.llm_backend = None
 		self.cypher_generator = None
 		self.response_generator = None
 		self.cypher_chain = None
+		self.cypher_batcher = None
 		self.response_chain = None
+		# normalized question -> response. Shared by all Streamlit sessions, hence the lock
+		self.response_cache = OrderedDict()
+		self.response_cache_lock = threading.Lock()
 
 		self.setup_models()
 		self.setup_chains()
 		
 	def setup_models(self):
-		"""Setup and preload Ollama models for Cypher generation and response generation"""
+		"""Setup and preload Ollama (or vLLM) models for Cypher generation and response generation"""
 		try:
-			print("Initializing single LLM model for optimal performance...")
-			
-			# Model: Cypher Query Generator & Response Generator (qwen2.5-coder:7b)
-			print("Loading qwen2.5-coder:7b model...")
-			self.cypher_generator = ChatOllama(
-				model="qwen2.5-coder:7b",
-				temperature=0.1,
-				base_url="http://localhost:11434"
-			)
-			
-			# Using same model for response generation
-			print("Using qwen2.5-coder:7b for response generation too (single model approach)...")
-			self.response_generator = ChatOllama(
-				model="qwen2.5-coder:7b",
-				temperature=0.2,
-				base_url="http://localhost:11434"
-			)
+			print("Initializing LLM models...")
+			
+			self.llm_backend = os.getenv("LLM_BACKEND", "ollama").lower()
+			if self.llm_backend == "vllm":
+				# vLLM OpenAI-compatible server: requests from all sessions are continuously batched
+				from langchain_openai import ChatOpenAI
+				model_name = os.getenv("VLLM_MODEL", "Qwen/Qwen2.5-Coder-7B-Instruct-AWQ")
+				base_url = os.getenv("VLLM_BASE_URL", "http://localhost:8000/v1")
+				print(f"Using vLLM server {base_url} with {model_name}...")
+				# guided decoding (vLLM --guided-decoding-backend outlines/xgrammar) with the Cypher grammar
+				self.cypher_generator = ChatOpenAI(model=model_name, base_url=base_url, api_key="EMPTY", temperature=0.1,
+					extra_body={"guided_json": cypher_schema()})
+				self.response_generator = ChatOpenAI(model=model_name, base_url=base_url, api_key="EMPTY", temperature=0.2)
+			else:
+				from langchain_ollama import ChatOllama
+				
+				# Model 1: Cypher Query Generator (small model)
+				print(f"Loading {CYPHER_MODEL} model for Cypher generation...")
+				# Structured output: decoding is constrained to cypher_schema(), so the query comes back
+				# as {"cypher": "..."} and needs no text cleanup. The labels are added by refresh_labels
+				self.cypher_generator = ChatOllama(
+					model=CYPHER_MODEL,
+					temperature=0.1,
+					base_url="http://localhost:11434",
+					format=cypher_schema()
+				)
+				
+				# Model 2: Response Generator (7B model)
+				print(f"Loading {RESPONSE_MODEL} model for response generation...")
+				self.response_generator = ChatOllama(
+					model=RESPONSE_MODEL,
+					temperature=0.2,
+					base_url="http://localhost:11434"
+				)
+			
+			if os.getenv("GROQ_API_KEY"):
+				# Remote response generation: removes GPU contention with the local Cypher stage
+				from langchain_openai import ChatOpenAI
+				response_model = os.getenv("GROQ_RESPONSE_MODEL", "qwen-2.5-coder-32b")
+				print(f"Using Groq API ({response_model}) for response generation...")
+				self.response_generator = ChatOpenAI(
+					model=response_model,
+					base_url="https://api.groq.com/openai/v1",
+					api_key=os.getenv("GROQ_API_KEY"),
+					temperature=0.2
+				)
 			
 			print("Preloading models with test queries...")
 			
-			# Preload model with a simple test query
+			# Preload both models with a simple test query. Ollama keeps both resident if VRAM allows
 			try:
-				test_result = self.cypher_generator.invoke("Test connection")
+				self.cypher_generator.invoke("ok")
 				print("✓ Cypher generator model loaded and ready")
+				self.response_generator.invoke("ok")
+				print("✓ Response generator model loaded and ready")
 			except Exception as e:
 				print(f"Warning: Model preload failed: {e}")
 			
-			print("✓ Single model approach - qwen2.5-coder:7b handles both Cypher generation and responses")
-			print("✓ Eliminates model switching overhead for faster performance")
-			print("Single model initialized and preloaded successfully - ready for fast responses!")
+			print("Models initialized and preloaded successfully - ready for fast responses!")
 			
 		except Exception as e:
 			print(f"Error initializing Ollama models: {e}")
@@ -266,6 +620,8 @@ class BIMGraphAgent:
 			
 			# Pre-create and cache the Cypher chain
 			self.cypher_chain = self.create_cypher_chain()
+			# Cypher requests of concurrent sessions are coalesced into batch calls
+			self.cypher_batcher = BatchedLLM(self.cypher_chain)
 			print("✓ Cypher chain created and cached")
 			
 			# Pre-create and cache the response chain
@@ -283,6 +639,7 @@ class BIMGraphAgent:
 		print(f"Setting up FalkorDB connection to {host}:{port}, graph: {graph_name}")
 		
 		self.falkordb_tool = FalkorDBQueryTool(host, port, username, password, graph_name)
+		self.clear_cache()  # cached answers belong to the previous graph
 		
 		if not self.falkordb_tool.connect():
 			print("\nFalkorDB Connection Failed!")
@@ -304,126 +661,33 @@ class BIMGraphAgent:
 		else:
 			node_count = test_result.get("results", [{}])[0].get("nodeCount", 0)
 			print(f"Connected successfully! Found {node_count} nodes in graph")
+			self.refresh_labels()
 		
 		return True
 	
+	def refresh_labels(self):
+		"""Rebuild the Cypher grammar from the node labels of the connected graph"""
+		result = self.falkordb_tool.execute_query("CALL db.labels()")
+		if not result.get("success", False):
+			print(f"Warning: Could not read graph labels: {result.get('error', 'Unknown error')}")
+			return
+		
+		labels = sorted(str(value) for row in result["results"] for value in row.values() if value)
+		schema = cypher_schema(labels)
+		# The chains hold the generator object itself, so updating it applies to the next batch
+		if self.llm_backend == "vllm":
+			self.cypher_generator.extra_body = {"guided_json": schema}
+		else:
+			self.cypher_generator.format = schema
+		print(f"Cypher grammar built for {len(labels)} graph labels")
+	
 	def create_cypher_chain(self):
 		"""Create LangChain chain for converting natural language to Cypher"""
-		
-		schema_info = """
-		BIM Graph Database Schema (FalkorDB):
-		
-		Node Labels (Each IFC class has its own label):
-		- Element: Generic element properties
-		- IFCFile: IFC file metadata  
-		- IfcBeam, IfcBuilding, IfcBuildingStorey, IfcCovering, IfcDoor, IfcFooting
-		- IfcFurnishingElement, IfcMember, IfcOpeningElement, IfcRailing
-		- IfcRoof, IfcSite, IfcSlab, IfcSpace, IfcStair, IfcStairFlight
-		- IfcWall, IfcWallStandardCase, IfcWindow
-		
-		Common Node Properties:
-		- description, globalId, name, objectType, properties, sourceFileId, tag
-		- All properties are stored directly in each node
-		
-		IFCFile Properties:
-		- createdDate, fileId, fileName, filePath, fileSize, importDate, modifiedDate
-		
-		Relationship Types:
-		- AGGREGATES: Element -> Element (aggregation relationships)
-		- BELONGS_TO_FILE: Element -> IFCFile (links elements to their source file)  
-		- CONTAINED_IN: Element -> Element (spatial containment)
-		
-		CRITICAL Schema Rules:
-		1. Use specific IFC labels (IfcSpace, IfcWall, etc.) NOT generic Element label
-		2. Properties are stored as nested JSON in the 'properties' field
-		3. Do NOT try to access specific nested property paths - they vary by modeling tool
-		4. For property-related queries: Always return full properties JSON for LLM analysis
-		5. Standard approach: MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.name, s.properties
-		
-		Query Examples:
-		- Find space properties: MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.properties
-		- Count walls: MATCH (w:IfcWall) RETURN count(w)
-		- Find all doors: MATCH (d:IfcDoor) RETURN d.name, d.properties LIMIT 10
-		- Find file info: MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
-		- Get space with properties: MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.name, s.properties
-		"""
-		
-		cypher_prompt = ChatPromptTemplate.from_messages([
-			("system", """You are an agent in converting natural language queries to Cypher queries for BIM/IFC data in FalkorDB.
-			
-			""" + schema_info + """
-			
-			IMPORTANT: Properties are stored as nested JSON. For property-related queries (area, volume, etc.):
-			- Return the full properties JSON: RETURN s.name, s.properties
-			- Let the response processor extract specific values from the JSON
-			- Don't try to access specific nested paths as they vary by modeling tool
-			
-			Rules for Cypher generation:
-			1. Always use proper Cypher syntax compatible with FalkorDB
-			2. Use specific IFC labels (IfcSpace, IfcWall, IfcDoor, etc.) as node labels
-			3. Access element properties directly from the node (e.g., s.properties, s.name, s.globalId)
-			4. Do NOT traverse relationships for basic element properties  
-			5. Use WHERE clauses for additional filtering by name, etc.
-			6. Use LIMIT to prevent large result sets (default LIMIT 100)
-			7. For counts, use count() function
-			8. For file information, match on IFCFile nodes
-			9. For property searches, return the entire properties JSON
-			10. Use simple property access: s.properties (return full JSON for analysis)
-			
-			CORRECT Examples:
-			- MATCH (s:IfcSpace {{name: 'A204'}}) RETURN s.name, s.globalId, s.properties
-			- MATCH (w:IfcWall) RETURN count(w)
-			- MATCH (d:IfcDoor) RETURN d.name, d.globalId, d.properties LIMIT 10
-			- MATCH (f:IFCFile) RETURN f.fileName, f.fileSize
-			
-			WRONG Examples:
-			- MATCH (e:Element {{ifcClass: 'IfcSpace'}}) (Use direct IfcSpace label)
-			- Trying to access specific property paths like s.properties.PSet_Name.Property
-			
-			Generate ONLY the Cypher query without explanation or markdown formatting.
-			"""),
-			("user", "Convert this query to Cypher: {query}")
-		])
-		
-		return cypher_prompt | self.cypher_generator | StrOutputParser()
+		return _CYPHER_PROMPT | self.cypher_generator | StrOutputParser()
 	
 	def create_response_chain(self):
 		"""Create LangChain chain for generating user-friendly responses"""
-		
-		response_prompt = ChatPromptTemplate.from_messages([
-			("system", """You are a helpful BIM agent assistant specialized in analyzing IFC element properties and answering user questions. You receive JSON results from FalkorDB database queries about BIM/IFC data.
-			
-			CRITICAL: When analyzing element properties JSON:
-			1. Look for relevant information in the nested properties structure
-			2. Common property patterns to search for:
-			   - Area: look for keys containing 'Area', 'area', 'GrossFloorArea', '면적' etc.
-			   - Volume: look for 'Volume', 'volume', 'GrossVolume', '체적' etc.
-			   - Name: look for 'Name', 'name', '이름', 'Number' etc.
-			   - Level/Floor: look for 'Level', 'level', '층', 'Floor' etc.
-			   - Material: look for 'Material', 'material', '재료' etc.
-			3. Different modeling tools (Revit, ArchiCAD, Tekla, etc.) use different property set names
-			4. Property sets may have names like: 'PSet_Revit_Dimensions', 'BaseQuantities', 'Pset_SpaceCommon' etc.
-			5. Always search through ALL property sets to find relevant information
-			
-			Your responses should:
-			1. Extract and highlight the specific information requested by the user
-			2. Provide clear numerical values with appropriate units when available
-			3. Explain where the information was found in the properties structure
-			4. Be concise but informative for construction professionals
-			5. Handle Korean and English property names equally
-			
-			If no relevant property is found, suggest what to look for or mention that the property might not be available in this model.
-			"""),
-			("user", """
-			Original Query: {original_query}
-			Cypher Query: {cypher_query}
-			Query Results: {query_results}
-			
-			Please provide a helpful response based on these results.
-			""")
-		])
-		
-		return response_prompt | self.response_generator | StrOutputParser()
+		return _RESPONSE_PROMPT | self.response_generator | StrOutputParser()
 	
 	def clean_cypher_query(self, cypher_query: str) -> str:
 		"""
@@ -439,17 +703,15 @@ class BIMGraphAgent:
 			cleaned = cypher_query
 			
 			# Remove markdown code blocks
-			cleaned = re.sub(r'```cypher\s*\n?', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'```sql\s*\n?', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'```\s*\n?', '', cleaned)
+			cleaned = _RE_FENCE_LANG.sub('', cleaned)
+			cleaned = _RE_FENCE.sub('', cleaned)
 			
 			# Remove common prefixes
-			cleaned = re.sub(r'^(cypher|sql):\s*', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'^(cypher|sql)\s+', '', cleaned, flags=re.IGNORECASE)
-			cleaned = re.sub(r'^query:\s*', '', cleaned, flags=re.IGNORECASE)
+			cleaned = _RE_PREFIX_COLON.sub('', cleaned)
+			cleaned = _RE_PREFIX_SPACE.sub('', cleaned)
+			cleaned = _RE_PREFIX_QUERY.sub('', cleaned)
 			
 			# Remove explanation text
-			cypher_keywords = ['MATCH', 'WHERE', 'RETURN', 'WITH', 'CREATE', 'DELETE', 'SET', 'REMOVE', 'MERGE', 'UNWIND', 'ORDER BY', 'LIMIT', 'SKIP']
 			lines = cleaned.split('\n')
 			cypher_lines = []
 			
@@ -458,7 +720,7 @@ class BIMGraphAgent:
 				if not line:
 					continue
 				
-				is_cypher_line = any(keyword in line.upper() for keyword in cypher_keywords)
+				is_cypher_line = not _CYPHER_KW.isdisjoint(_RE_WORD.findall(line.upper()))
 				is_continuation = line.startswith(('(', ')', '[', ']', '{', '}', ',', '.', '-', ':', '<', '>', '='))
 				
 				if is_cypher_line or is_continuation or not cypher_lines:
@@ -469,12 +731,11 @@ class BIMGraphAgent:
 			cleaned = ' '.join(cypher_lines)
 			
 			# Normalize whitespace
-			cleaned = re.sub(r'\s+', ' ', cleaned)
+			cleaned = _RE_WS.sub(' ', cleaned)
 			cleaned = cleaned.strip()
 			
 			# Remove trailing punctuation
-			cleaned = re.sub(r'[.!?]+\s*$', '', cleaned)
-			cleaned = re.sub(r';\s*$', '', cleaned)
+			cleaned = _RE_TRAIL_PUNCT.sub('', cleaned)
 			
 			# Remove quotes around the entire query
 			if (cleaned.startswith('"') and cleaned.endswith('"')) or (cleaned.startswith("'") and cleaned.endswith("'")):
@@ -485,11 +746,67 @@ class BIMGraphAgent:
 		except Exception as e:
 			print(f"Warning: Error cleaning Cypher query: {e}")
 			fallback = cypher_query.strip()
-			fallback = re.sub(r'```cypher\s*\n?', '', fallback, flags=re.IGNORECASE)
-			fallback = re.sub(r'```\s*\n?', '', fallback)
-			fallback = re.sub(r'\s+', ' ', fallback)
+			fallback = _RE_FENCE_LANG.sub('', fallback)
+			fallback = _RE_FENCE.sub('', fallback)
+			fallback = _RE_WS.sub(' ', fallback)
 			return fallback.strip()
 	
+	def parse_cypher_output(self, raw_output: str) -> str:
+		"""
+		Extract the Cypher query from the JSON output of the Cypher generator
+		
+		Args:
+			raw_output: Raw LLM output, expected to be {"cypher": "..."}
+			
+		Returns:
+			Cypher query string. Falls back to clean_cypher_query for non-JSON output
+		"""
+		try:
+			cypher_query = orjson.loads(raw_output)["cypher"]
+			if isinstance(cypher_query, str) and cypher_query.strip():
+				return cypher_query.strip()
+		except (ValueError, KeyError, TypeError):
+			pass
+		return self.clean_cypher_query(raw_output)
+	
+	@staticmethod
+	def route_query(normalized_query: str) -> Optional[str]:
+		"""
+		Map a frequent question to templated Cypher without calling the Cypher LLM
+		
+		Args:
+			normalized_query: Lower-cased question with normalized whitespace
+			
+		Returns:
+			Cypher query string, or None when no fast path matches
+		"""
+		for pattern, to_cypher in _FAST_PATHS:
+			match = pattern.fullmatch(normalized_query)
+			if match:
+				cypher_query = to_cypher(match)
+				if cypher_query is not None:
+					print(f"Fast path Cypher: {cypher_query}")
+					return cypher_query
+		return None
+	
+	@staticmethod
+	def serialize_results(query_results: Dict[str, Any]) -> str:
+		"""
+		Serialize query results for the response prompt as compact JSON.
+		Only the first MAX_PROMPT_RESULTS rows are kept; "truncated" tells the LLM to ask the user to refine
+		
+		Args:
+			query_results: Result dictionary from execute_query
+			
+		Returns:
+			JSON string
+		"""
+		results = query_results.get("results", [])
+		if len(results) > MAX_PROMPT_RESULTS:
+			query_results = {**query_results, "results": results[:MAX_PROMPT_RESULTS], "truncated": True}
+		# orjson writes compact UTF-8 JSON directly and is several times faster than json.dumps
+		return orjson.dumps(query_results, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+	
 	def process_query(self, user_query: str) -> str:
 		"""
 		Process user query through the complete chain
@@ -500,32 +817,76 @@ class BIMGraphAgent:
 		Returns:
 			Generated response string
 		"""
+		# One pipeline for console and web: the streamed response chunks joined into one string
+		return "".join(self.process_query_stream(user_query))
+	
+	def process_query_stream(self, user_query: str) -> Iterator[str]:
+		"""
+		Process user query through the complete chain and yield the response text
+		chunk by chunk while the response LLM is decoding
+		
+		Args:
+			user_query: Natural language query from user
+			
+		Yields:
+			Response text chunks
+		"""
 		try:
 			print(f"Processing query: {user_query}")
 			
-			# Step 1: Convert to Cypher using pre-cached chain
-			raw_cypher_query = self.cypher_chain.invoke({"query": user_query})
-			print(f"Raw generated Cypher: {raw_cypher_query}")
+			cache_key = _RE_WS.sub(' ', user_query.strip().lower())
+			cached_response = self.get_cached_response(cache_key)
+			if cached_response is not None:
+				print("Using cached response")
+				yield cached_response
+				return
 			
-			# Step 1.5: Clean Cypher query
-			cypher_query = self.clean_cypher_query(raw_cypher_query)
-			print(f"Cleaned Cypher: {cypher_query}")
+			cypher_query = self.route_query(cache_key)
+			if cypher_query is None:
+				# Step 1: Convert to Cypher using pre-cached chain
+				raw_cypher_query = self.cypher_batcher.submit({"query": user_query})
+				cypher_query = self.parse_cypher_output(raw_cypher_query)
+				print(f"Cleaned Cypher: {cypher_query}")
 			
 			# Step 2: Execute Cypher query
 			query_results = self.falkordb_tool.execute_query(cypher_query)
 			print(f"Query executed, found {query_results.get('count', 0)} results")
 			
-			# Step 3: Generate response using pre-cached chain
-			response = self.response_chain.invoke({
+			# Step 3: Stream response tokens as they are generated
+			chunks = []
+			for chunk in self.response_chain.stream({
 				"original_query": user_query,
 				"cypher_query": cypher_query,
-				"query_results": json.dumps(query_results, indent=2)
-			})
+				"query_results": self.serialize_results(query_results)
+			}):
+				chunks.append(chunk)
+				yield chunk
 			
-			return response
+			if query_results.get("success"):
+				self.cache_response(cache_key, "".join(chunks))
 			
 		except Exception as e:
-			return f"Error processing query: {str(e)}"
+			yield f"Error processing query: {str(e)}"
+	
+	def get_cached_response(self, cache_key: str) -> Optional[str]:
+		"""Return the cached response for a normalized question, or None"""
+		with self.response_cache_lock:
+			cached_response = self.response_cache.get(cache_key)
+			if cached_response is not None:
+				self.response_cache.move_to_end(cache_key)
+			return cached_response
+	
+	def cache_response(self, cache_key: str, response: str):
+		"""Store a response, evicting the least recently used one when the cache is full"""
+		with self.response_cache_lock:
+			self.response_cache[cache_key] = response
+			if len(self.response_cache) > RESPONSE_CACHE_SIZE:
+				self.response_cache.popitem(last=False)
+	
+	def clear_cache(self):
+		"""Drop cached responses"""
+		with self.response_cache_lock:
+			self.response_cache.clear()
 	
 	def run_console_interface(self):
 		"""Run interactive console interface"""
@@ -536,7 +897,7 @@ class BIMGraphAgent:
 		print("- Show me all doors in the project")
 		print("- What IFC files are loaded?")
 		print("- Find elements on the ground floor")
-		print("\nType 'quit' or 'exit' to stop")
+		print("\nType 'refresh' to clear cached answers and reload graph labels, 'quit' or 'exit' to stop")
 		
 		while True:
 			try:
@@ -552,6 +913,12 @@ class BIMGraphAgent:
 					print("Please enter a question.")
 					continue
 				
+				if user_query.lower() == 'refresh':
+					self.clear_cache()
+					self.refresh_labels()
+					print("Cache cleared.")
+					continue
+				
 				# Process query
 				print("\nProcessing...")
 				response = self.process_query(user_query)
@@ -572,7 +939,7 @@ class BIMGraphAgent:
 def load_environment():
 	"""Load environment variables from .env file"""
 	env_path = Path(__file__).parent / '.env'
-	if env_path.exists():
+	if env_path.exists() and load_dotenv:
 		load_dotenv(env_path)
 	
 	required_vars = ['FALKORDB_HOST', 'FALKORDB_PORT', 'FALKORDB_GRAPH']
@@ -154,10 +154,10 @@ if st.session_state.initialized and st.session_state.agent:
         # Mark this query as processed to prevent re-processing
         st.session_state.last_processed = user_input
         
-        # Process query
-        with st.spinner("Processing..."):
+        # Process query, showing the response tokens as they are generated
+        with st.chat_message("assistant"):
             try:
-                response = st.session_state.agent.process_query(user_input)
+                response = st.write_stream(st.session_state.agent.process_query_stream(user_input))
                 # Store response with markdown formatting support
                 st.session_state.messages.append({
                     "role": "assistant", 
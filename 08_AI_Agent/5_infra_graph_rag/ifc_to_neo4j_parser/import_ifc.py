@@ -13,6 +13,7 @@ Options:
     --no-log-file       Disable file logging
     --validate          Run validation after conversion
     --stats             Output statistics after conversion completion
+    --workers N         Number of processes parsing IFC files in parallel (default: CPU count - 1)
 
 Examples:
     # Basic conversion
@@ -28,7 +29,10 @@ Examples:
 import argparse
 import sys
 import os
+import heapq
+from operator import itemgetter
 from pathlib import Path
+from typing import List
 from dotenv import load_dotenv
 import json
 
@@ -95,6 +99,13 @@ def parse_arguments():
         help='Output statistics after conversion completion'
     )
     
+    parser.add_argument(
+        '--workers', 
+        type=int, 
+        default=max(1, (os.cpu_count() or 2) - 1),
+        help='Number of processes parsing IFC files in parallel (default: CPU count - 1)'
+    )
+    
     return parser.parse_args()
 
 
@@ -106,22 +117,14 @@ def load_environment():
         load_dotenv(env_path)
     
     # Check required environment variables
-    required_vars = ['NEO4J_URI', 'NEO4J_USER', 'NEO4J_PASSWORD', 'NEO4J_DATABASE']
-    missing_vars = []
-    
-    for var in required_vars:
-        if not os.getenv(var):
-            missing_vars.append(var)
+    required_vars = ('NEO4J_URI', 'NEO4J_USER', 'NEO4J_PASSWORD', 'NEO4J_DATABASE')
+    env = os.environ
+    missing_vars = [var for var in required_vars if not env.get(var)]
     
     if missing_vars:
         raise EnvironmentError(f"Required environment variables not set: {', '.join(missing_vars)}")
     
-    return {
-        'uri': os.getenv('NEO4J_URI'),
-        'user': os.getenv('NEO4J_USER'),
-        'password': os.getenv('NEO4J_PASSWORD'),
-        'database': os.getenv('NEO4J_DATABASE')
-    }
+    return {key: env[var] for key, var in zip(('uri', 'user', 'password', 'database'), required_vars)}
 
 
 def print_banner():
@@ -147,9 +150,8 @@ def print_summary(results: dict, stats: dict = None):
     # List of failed files
     failed_files = [file_path for file_path, success in results.items() if not success]
     if failed_files:
-        print("\nFailed files:")
-        for file_path in failed_files:
-            print(f"  {Path(file_path).name}")
+        # One print for the whole list instead of one print per file
+        print("\nFailed files:\n" + "\n".join(f"  {Path(file_path).name}" for file_path in failed_files))
     
     # Output statistics information
     if stats and 'database_stats' in stats:
@@ -160,22 +162,19 @@ def print_summary(results: dict, stats: dict = None):
         
         if 'element_types' in stats and stats['element_types']:
             print(f"\nElement Type Distribution (Top 5):")
-            sorted_types = sorted(stats['element_types'].items(), key=lambda x: x[1], reverse=True)
-            for i, (element_type, count) in enumerate(sorted_types[:5]):
-                print(f"  {i+1}. {element_type}: {count:,}")
+            top_types = heapq.nlargest(5, stats['element_types'].items(), key=itemgetter(1))
+            print("\n".join(f"  {i+1}. {element_type}: {count:,}" for i, (element_type, count) in enumerate(top_types)))
         
         if 'relationship_types' in stats and stats['relationship_types']:
             print(f"\nRelationship Type Distribution:")
-            for rel_type, count in stats['relationship_types'].items():
-                print(f"  {rel_type}: {count:,}")
+            print("\n".join(f"  {rel_type}: {count:,}" for rel_type, count in stats['relationship_types'].items()))
 
 
-def validate_conversion(converter: IFCToGraphConverter, input_dir: Path):
+def validate_conversion(converter: IFCToGraphConverter, ifc_files: List[Path]):
     """Validate conversion results"""
     print("\nValidating conversion results...")
     
     # Run validation only for the first IFC file
-    ifc_files = list(input_dir.glob("*.ifc"))
     if ifc_files:
         validation_result = converter.validate_conversion(ifc_files[0])
         
@@ -296,7 +295,7 @@ def main():
         converter = IFCToGraphConverter(db)
         
         # Execute conversion
-        results = converter.convert_directory(input_dir)
+        results = converter.convert_directory(input_dir, workers=args.workers, ifc_files=ifc_files)
         
         # Collect statistics (optional)
         stats = None
@@ -306,7 +305,7 @@ def main():
         
         # Run validation (optional)
         if args.validate and results:
-            validate_conversion(converter, input_dir)
+            validate_conversion(converter, ifc_files)
         
         # Print result summary
         print_summary(results, stats)
@@ -2,10 +2,37 @@
 IFC to Neo4j graph conversion logic implementation
 """
 import logging
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Iterable
 from pathlib import Path
-from .ifc_parser import IFCParser
+from .ifc_parser import IFCParser, ElementRecord, precheck_ifc
 from .neo4j_database import Neo4jDatabase
+from .utils import worker_logging
+
+
+def _parse_one(ifc_file_path: Path) -> Tuple[Path, Optional[List[ElementRecord]], Optional[Dict[str, List[Dict[str, Any]]]]]:
+    """
+    Parse one IFC file in a worker process
+    
+    Args:
+        ifc_file_path: IFC file path
+        
+    Returns:
+        (file path, elements, relationships). Only picklable records/dicts are returned,
+        elements/relationships are None if parsing failed
+    """
+    parser = IFCParser()
+    try:
+        ifc_file = parser.parse_file(ifc_file_path)
+        if not ifc_file:
+            return ifc_file_path, None, None
+        # Results cross the process boundary, so the element stream is materialized here (parse_all)
+        return (ifc_file_path, *parser.parse_all(ifc_file))
+    except Exception as e:
+        # Errors are logged here with the file name, the parent only marks the file failed
+        parser.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
+        return ifc_file_path, None, None
 
 
 class IFCToGraphConverter:
@@ -35,58 +62,82 @@ class IFCToGraphConverter:
         try:
             self.logger.info(f"Starting IFC file conversion: {ifc_file_path}")
             
-            # 1. Create file metadata node first
-            file_id = self.db.create_file_node(ifc_file_path)
-            if not file_id:
-                self.logger.error(f"File metadata creation failed: {ifc_file_path}")
-                return False
-            
-            # 2. Parse IFC file
+            # 1. Parse IFC file
             ifc_file = self.parser.parse_file(ifc_file_path)
             if not ifc_file:
                 self.logger.error(f"IFC file parsing failed: {ifc_file_path}")
                 return False
             
-            # 3. Extract and convert elements
-            elements = self.parser.extract_elements(ifc_file)
-            if not elements:
-                self.logger.warning(f"No elements extracted: {ifc_file_path}")
-                return False
+            # 2. Extract elements (streamed to Neo4j while writing) and relationships
+            elements = self.parser.iter_elements(ifc_file)
+            relationships = self.parser.extract_relationships(ifc_file)
             
-            # 4. Convert elements to Neo4j nodes with file reference
-            element_success_count = 0
-            for element in elements:
-                if self.db.create_element_node(element, file_id):
-                    element_success_count += 1
-                    
-            self.logger.info(f"Element nodes creation completed: {element_success_count}/{len(elements)}")
+            return self.write_parsed_file(ifc_file_path, elements, relationships)
             
-            # 5. Extract and convert relationships
-            relationships = self.parser.extract_relationships(ifc_file)
-            if relationships:
-                relationship_success_count = 0
-                for relationship in relationships:
-                    if self.db.create_relationship(relationship):
-                        relationship_success_count += 1
-                        
-                self.logger.info(f"Relationships creation completed: {relationship_success_count}/{len(relationships)}")
-            else:
-                self.logger.info("No relationships extracted.")
+        except Exception as e:
+            self.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
+            return False
+    
+    def write_parsed_file(self, ifc_file_path: Path, elements: Iterable[ElementRecord], relationships: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """
+        Write extracted elements and relationships of one IFC file to Neo4j
+        
+        Args:
+            ifc_file_path: IFC file path
+            elements: Element records, a list or a stream from IFCParser.iter_elements
+            relationships: Relationship data grouped by type, from IFCParser.extract_relationships
             
-            self.logger.info(f"IFC file conversion completed: {ifc_file_path}")
-            return True
+        Returns:
+            Conversion success status
+        """
+        try:
+            elements = iter(elements)
+            first_element = next(elements, None)
+            if first_element is None:
+                self.logger.warning(f"No elements extracted: {ifc_file_path}")
+                return False
+            
+            # One session for all writes of this file
+            with self.db:
+                return self._write_file(ifc_file_path, first_element, elements, relationships)
             
         except Exception as e:
             self.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
             return False
     
-    def convert_directory(self, input_directory: Path, file_pattern: str = "*.ifc") -> Dict[str, bool]:
+    def _write_file(self, ifc_file_path: Path, first_element: ElementRecord, elements: Iterator[ElementRecord],
+                    relationships: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Write one file's metadata, elements and relationships (steps 3-5 of write_parsed_file)"""
+        # 3. Create file metadata node
+        file_id = self.db.create_file_node(ifc_file_path)
+        if not file_id:
+            self.logger.error(f"File metadata creation failed: {ifc_file_path}")
+            return False
+        
+        # 4-5. Element nodes with file reference first, then relationships grouped by type
+        # (concurrent chunked writes with the async driver if write_concurrency > 1)
+        ingest = self.db.bulk_ingest if self.db.write_concurrency > 1 else self.db.ingest
+        element_success_count, element_count, relationship_count = ingest(chain((first_element,), elements), relationships, file_id)
+        self.logger.info(f"Element nodes creation completed: {element_success_count} new nodes from {element_count} elements")
+        if relationships:
+            self.logger.info(f"Relationships creation completed: {relationship_count} new links")
+        else:
+            self.logger.info("No relationships extracted.")
+        
+        self.logger.info(f"IFC file conversion completed: {ifc_file_path}")
+        return True
+    
+    def convert_directory(self, input_directory: Path, file_pattern: str = "*.ifc", workers: int = 1,
+                          ifc_files: Optional[List[Path]] = None) -> Dict[str, bool]:
         """
         Convert all IFC files in directory
         
         Args:
             input_directory: Input directory path
             file_pattern: File pattern (default: "*.ifc")
+            workers: Number of processes parsing IFC files in parallel. Neo4j writes always
+                stay in this process, one file at a time
+            ifc_files: Already listed IFC files of the directory (skips the directory scan)
             
         Returns:
             Dictionary of conversion results by file
@@ -95,7 +146,8 @@ class IFCToGraphConverter:
         
         try:
             # Search for IFC files
-            ifc_files = list(input_directory.glob(file_pattern))
+            if ifc_files is None:
+                ifc_files = list(input_directory.glob(file_pattern))
             
             if not ifc_files:
                 self.logger.warning(f"No IFC files found: {input_directory}")
@@ -103,21 +155,13 @@ class IFCToGraphConverter:
             
             self.logger.info(f"Found {len(ifc_files)} IFC files in total.")
             
-            # Process each file sequentially
-            for ifc_file in ifc_files:
-                try:
-                    result = self.convert_file(ifc_file)
-                    results[str(ifc_file)] = result
-                    
-                    if result:
-                        self.logger.info(f"Conversion successful: {ifc_file.name}")
-                    else:
-                        self.logger.error(f"Conversion failed: {ifc_file.name}")
-                        
-                except Exception as e:
-                    self.logger.error(f"Error processing file: {ifc_file.name}, error: {e}")
-                    results[str(ifc_file)] = False
-                    continue
+            for ifc_file, result in self._convert_files(ifc_files, workers):
+                results[str(ifc_file)] = result
+                
+                if result:
+                    self.logger.info(f"Conversion successful: {ifc_file.name}")
+                else:
+                    self.logger.error(f"Conversion failed: {ifc_file.name}")
             
             # Conversion result summary
             success_count = sum(1 for success in results.values() if success)
@@ -131,6 +175,49 @@ class IFCToGraphConverter:
             self.logger.error(f"Error during directory conversion: {input_directory}, error: {e}")
             return results
     
+    def _convert_files(self, ifc_files: List[Path], workers: int) -> Iterator[Tuple[Path, bool]]:
+        """Convert files and yield (file path, success) as each file is finished"""
+        # Fail unreadable files up front instead of spawning a worker for them
+        checked_files = []
+        for ifc_file in ifc_files:
+            if precheck_ifc(ifc_file):
+                checked_files.append(ifc_file)
+            else:
+                self.logger.error(f"Not a valid IFC file (missing ISO-10303-21 header): {ifc_file}")
+                yield ifc_file, False
+        ifc_files = checked_files
+        
+        if workers > 1 and len(ifc_files) > 1:
+            # Parsing is CPU-bound and independent per file: parse in a process pool
+            # and write each parsed file as soon as it is ready
+            # Workers log to the console and append to the log file with their own handler
+            initializer, initargs = worker_logging()
+            with ProcessPoolExecutor(min(workers, len(ifc_files)), initializer=initializer, initargs=initargs) as executor:
+                futures = {executor.submit(_parse_one, ifc_file): ifc_file for ifc_file in ifc_files}
+                for future in as_completed(futures):
+                    ifc_file = futures[future]
+                    try:
+                        _, elements, relationships = future.result()
+                    except Exception as e:
+                        # Worker died (e.g. BrokenProcessPool after an out-of-memory kill): only this file fails
+                        self.logger.error(f"IFC file parsing failed: {ifc_file}, error: {e}")
+                        yield ifc_file, False
+                        continue
+                    if elements is None:
+                        self.logger.error(f"IFC file parsing failed: {ifc_file}")
+                        yield ifc_file, False
+                    else:
+                        yield ifc_file, self.write_parsed_file(ifc_file, elements, relationships)
+            return
+        
+        # Process each file sequentially
+        for ifc_file in ifc_files:
+            try:
+                yield ifc_file, self.convert_file(ifc_file)
+            except Exception as e:
+                self.logger.error(f"Error processing file: {ifc_file.name}, error: {e}")
+                yield ifc_file, False
+    
     def get_conversion_statistics(self) -> Dict[str, Any]:
         """
         Return conversion result statistics
@@ -222,8 +309,7 @@ class IFCToGraphConverter:
             if not ifc_file:
                 return {'error': 'IFC file parsing failed'}
             
-            original_elements = self.parser.extract_elements(ifc_file)
-            original_relationships = self.parser.extract_relationships(ifc_file)
+            original_elements, original_relationships = self.parser.parse_all(ifc_file)
             
             # Check data from the same file in Neo4j
             # (Using overall statistics as file-specific distinction is difficult)
@@ -231,7 +317,7 @@ class IFCToGraphConverter:
             
             validation_result = {
                 'original_elements_count': len(original_elements),
-                'original_relationships_count': len(original_relationships),
+                'original_relationships_count': sum(len(group) for group in original_relationships.values()),
                 'db_nodes_count': db_stats['total_nodes'],
                 'db_relationships_count': db_stats['total_relationships'],
                 'element_types': self._get_element_type_distribution(),
@@ -3,15 +3,78 @@ Module for IFC file parsing
 """
 import ifcopenshell
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import sys
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, List, Any, Optional, Tuple, Iterator
 from pathlib import Path
 
 
+# Extracted relationship types
+_REL_TYPES = (
+    'IfcRelAggregates',                     # Aggregation relationship
+    'IfcRelConnectsElements',               # Connection relationship
+    'IfcRelDefinesByProperties',            # Property definition relationship
+    'IfcRelContainedInSpatialStructure',    # Spatial containment relationship
+    'IfcRelAssignsToGroup',                 # Group assignment relationship
+)
+_REL_TYPE_SET = frozenset(_REL_TYPES)
+
+# IfcRelDefinesByProperties and its IFC2x3 subtype
+_PROPERTY_REL_TYPES = frozenset(('IfcRelDefinesByProperties', 'IfcRelOverridesProperties'))
+
+
+@dataclass
+class ElementRecord:
+    """Extracted IFC element (slotted: no per-instance __dict__)"""
+    __slots__ = ('globalId', 'ifcClass', 'name', 'description', 'objectType', 'tag', 'properties')
+    
+    globalId: str
+    ifcClass: str
+    name: str
+    description: str
+    objectType: str
+    tag: str
+    properties: Dict[str, Any]
+
+
+def _global_ids(objects) -> List[str]:
+    """GlobalIds of related objects, skipping entities without one"""
+    try:
+        # Fast path: every related object is an IfcRoot in conforming files
+        return [obj.GlobalId for obj in objects]
+    except AttributeError:
+        return [obj.GlobalId for obj in objects if hasattr(obj, 'GlobalId')]
+
+
+def precheck_ifc(file_path: Path) -> bool:
+    """
+    Quick check that a file looks like an IFC (STEP) file, without parsing it
+    
+    Args:
+        file_path: IFC file path
+        
+    Returns:
+        True if the ISO-10303-21 header is found in the first 8KB (or the file is not STEP based)
+    """
+    if file_path.suffix.lower() != '.ifc':
+        # ifcXML / ifcZIP have no STEP header, leave them to ifcopenshell
+        return True
+    try:
+        with open(file_path, 'rb') as f:
+            return b'ISO-10303-21' in f.read(8192)
+    except OSError:
+        return False
+
+
 class IFCParser:
     """Class for parsing IFC files and extracting elements and relationships"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        # Flat properties of each property definition by entity id. The same IfcPropertySet
+        # instance is usually shared by many elements, so it is only walked once per file
+        self._pset_cache: Dict[int, Dict[str, Any]] = {}
         
     def parse_file(self, file_path: Path) -> Optional[ifcopenshell.file]:
         """
@@ -28,11 +91,41 @@ class IFCParser:
             ifc_file = ifcopenshell.open(str(file_path))
             self.logger.info(f"IFC file parsing completed: {file_path}")
             return ifc_file
-        except Exception as e:
+        except (OSError, RuntimeError, ifcopenshell.Error) as e:
             self.logger.error(f"IFC file parsing failed: {file_path}, error: {e}")
             return None
     
-    def extract_elements(self, ifc_file: ifcopenshell.file) -> List[Dict[str, Any]]:
+    def parse_all(self, ifc_file: ifcopenshell.file) -> Tuple[List[ElementRecord], Dict[str, List[Dict[str, Any]]]]:
+        """
+        Extract elements and relationships of an IFC file in one call
+        
+        Both passes go through ifcopenshell's per-type instance index (by_type), so only
+        IfcProduct and the extracted relationship instances are visited, never the
+        geometry/representation entities that make up most of the file.
+        
+        Args:
+            ifc_file: ifcopenshell file object
+            
+        Returns:
+            (element records, relationships grouped by type)
+        """
+        return list(self.iter_elements(ifc_file)), self.extract_relationships(ifc_file)
+    
+    def iter_elements(self, ifc_file: ifcopenshell.file) -> Iterator[ElementRecord]:
+        """
+        Extract elements from IFC file one at a time, without materializing the full list
+        
+        Args:
+            ifc_file: ifcopenshell file object
+            
+        Returns:
+            Iterator of element records (failed elements are logged and skipped)
+        """
+        # Entity ids are only unique within one file
+        self._pset_cache.clear()
+        return filter(None, map(self._extract_element_data_safe, ifc_file.by_type('IfcProduct')))
+    
+    def extract_elements(self, ifc_file: ifcopenshell.file) -> Dict[str, List[ElementRecord]]:
         """
         Extract all elements from IFC file
         
@@ -40,24 +133,31 @@ class IFCParser:
             ifc_file: ifcopenshell file object
             
         Returns:
-            List of dictionaries containing element information
+            Element records grouped by IFC class (ifcClass -> list),
+            so each group can be written with a single UNWIND query
         """
-        elements = []
+        elements = {}
         
         # Get all IFC element types
-        for element in ifc_file.by_type('IfcProduct'):
-            try:
-                element_data = self._extract_element_data(element)
-                if element_data:
-                    elements.append(element_data)
-            except Exception as e:
-                self.logger.warning(f"Element extraction failed: {element}, error: {e}")
-                continue
+        for element_data in self.iter_elements(ifc_file):
+            group = elements.get(element_data.ifcClass)
+            if group is None:
+                group = elements[element_data.ifcClass] = []
+            group.append(element_data)
                 
-        self.logger.info(f"Extracted {len(elements)} elements in total.")
+        self.logger.info(f"Extracted {sum(len(group) for group in elements.values())} elements in total.")
         return elements
     
-    def _extract_element_data(self, element) -> Dict[str, Any]:
+    def _extract_element_data_safe(self, element) -> Optional[ElementRecord]:
+        """Extract data from individual element, or None (logged) on failure"""
+        try:
+            return self._extract_element_data(element)
+        except Exception as e:
+            # %-style arguments: the entity repr (which walks all attributes) is only built if the record is emitted
+            self.logger.warning("Element extraction failed: %s, error: %s", element, e)
+            return None
+    
+    def _extract_element_data(self, element) -> ElementRecord:
         """
         Extract data from individual element
         
@@ -65,19 +165,20 @@ class IFCParser:
             element: IFC element object
             
         Returns:
-            Element data dictionary
+            Element record
         """
-        data = {
-            'globalId': element.GlobalId,
-            'ifcClass': element.is_a(),
-            'name': getattr(element, 'Name', None) or '',
-            'description': getattr(element, 'Description', None) or '',
-            'objectType': getattr(element, 'ObjectType', None) or '',
-            'tag': getattr(element, 'Tag', None) or '',
-            'properties': self._extract_properties(element)
-        }
+        ifc_class = element.is_a()
+        name = element.Name or ''
+        description = element.Description or ''
+        object_type = element.ObjectType or ''
+        try:
+            tag = element.Tag or ''
+        except AttributeError:
+            # Tag is defined on IfcElement only (not on spatial elements, ports, etc.)
+            tag = ''
         
-        return data
+        return ElementRecord(element.GlobalId, ifc_class, name, description, object_type, tag,
+                             self._extract_properties(element))
     
     def _extract_properties(self, element) -> Dict[str, Any]:
         """
@@ -87,31 +188,53 @@ class IFCParser:
             element: IFC element object
             
         Returns:
-            Property information dictionary
+            Flat property dictionary keyed by "<pset name>__<property name>"
         """
         properties = {}
+        pset_cache = self._pset_cache
         
         try:
-            # Find property sets through IfcRelDefinesByProperties relationship
-            for rel in getattr(element, 'IsDefinedBy', []):
-                if rel.is_a('IfcRelDefinesByProperties'):
+            # Find property sets through IfcRelDefinesByProperties relationship.
+            # is_a() without argument is called once per entity and compared as a plain string
+            for rel in getattr(element, 'IsDefinedBy', ()):
+                if rel.is_a() in _PROPERTY_REL_TYPES:
                     prop_def = rel.RelatingPropertyDefinition
-                    if prop_def.is_a('IfcPropertySet'):
-                        pset_name = prop_def.Name
-                        properties[pset_name] = {}
-                        
-                        for prop in prop_def.HasProperties:
-                            if hasattr(prop, 'Name') and hasattr(prop, 'NominalValue'):
-                                prop_name = prop.Name
-                                prop_value = getattr(prop.NominalValue, 'wrappedValue', str(prop.NominalValue))
-                                properties[pset_name][prop_name] = prop_value
+                    pset_id = prop_def.id()
+                    pset = pset_cache.get(pset_id)
+                    if pset is None:
+                        pset = pset_cache[pset_id] = self._extract_property_set(prop_def)
+                    properties.update(pset)
                                 
         except Exception as e:
-            self.logger.warning(f"Property extraction failed: {element}, error: {e}")
+            self.logger.warning("Property extraction failed: %s, error: %s", element, e)
             
         return properties
     
-    def extract_relationships(self, ifc_file: ifcopenshell.file) -> List[Dict[str, Any]]:
+    def _extract_property_set(self, prop_def) -> Dict[str, Any]:
+        """
+        Extract flat properties of one property definition
+        
+        Args:
+            prop_def: IFC property definition object
+            
+        Returns:
+            Flat property dictionary (empty if prop_def is not an IfcPropertySet)
+        """
+        pset = {}
+        if prop_def.is_a() == 'IfcPropertySet':
+            intern = sys.intern
+            # Name is optional in IFC
+            prefix = (prop_def.Name or '') + '__'
+            
+            for prop in prop_def.HasProperties:
+                if hasattr(prop, 'Name') and hasattr(prop, 'NominalValue'):
+                    nominal = prop.NominalValue
+                    prop_value = getattr(nominal, 'wrappedValue', None)
+                    # Keys repeat across elements, interning shares one string per key
+                    pset[intern(prefix + prop.Name)] = prop_value if prop_value is not None else str(nominal)
+        return pset
+    
+    def extract_relationships(self, ifc_file: ifcopenshell.file) -> Dict[str, List[Dict[str, Any]]]:
         """
         Extract all relationships from IFC file
         
@@ -119,57 +242,48 @@ class IFCParser:
             ifc_file: ifcopenshell file object
             
         Returns:
-            List of dictionaries containing relationship information
-        """
-        relationships = []
-        
-        # Extract all relationship types
-        rel_types = [
-            'IfcRelAggregates',       # Aggregation relationship
-            'IfcRelConnectsElements', # Connection relationship
-            'IfcRelDefinesByProperties', # Property definition relationship
-            'IfcRelContainedInSpatialStructure', # Spatial containment relationship
-            'IfcRelAssignsToGroup',   # Group assignment relationship
-        ]
-        
-        for rel_type in rel_types:
-            for rel in ifc_file.by_type(rel_type):
-                try:
-                    rel_data = self._extract_relationship_data(rel)
-                    if rel_data:
-                        relationships.append(rel_data)
-                except Exception as e:
-                    self.logger.warning(f"Relationship extraction failed: {rel}, error: {e}")
-                    continue
+            Relationship information dictionaries grouped by relationship type (type -> list)
+        """
+        relationships = {}
+        by_type = ifc_file.by_type
+        extract = self._extract_relationship_data_safe
+        
+        # Extract all relationship types. Each type is queried without subtypes,
+        # so the extractor is known from the query and no is_a() check is needed per relationship.
+        # Every extractor produces a single relationship type, so each query yields one group
+        for rel_type in _REL_TYPES:
+            handler = _REL_DISPATCH[rel_type]
+            rels = list(filter(None, map(extract, repeat(handler), by_type(rel_type, include_subtypes=False))))
+            if rels:
+                relationships.setdefault(rels[0]['type'], []).extend(rels)
                     
-        self.logger.info(f"Extracted {len(relationships)} relationships in total.")
+        self.logger.info(f"Extracted {sum(len(group) for group in relationships.values())} relationships in total.")
         return relationships
     
-    def _extract_relationship_data(self, rel) -> Optional[Dict[str, Any]]:
+    def _extract_relationship_data_safe(self, handler, rel) -> Optional[Dict[str, Any]]:
+        """Run a relationship extractor, or return None (logged) on failure"""
+        try:
+            return handler(self, rel)
+        except Exception as e:
+            self.logger.warning("Relationship extraction failed: %s, error: %s", rel, e)
+            return None
+    
+    def _extract_relationship_data(self, rel, rel_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Extract data from individual relationship
         
         Args:
             rel: IFC relationship object
+            rel_type: IFC relationship type if already known (skips rel.is_a())
             
         Returns:
             Relationship data dictionary or None
         """
-        rel_type = rel.is_a()
-        
         # Different processing by relationship type
-        if rel_type == 'IfcRelAggregates':
-            return self._extract_aggregates_relationship(rel)
-        elif rel_type == 'IfcRelConnectsElements':
-            return self._extract_connects_relationship(rel)
-        elif rel_type == 'IfcRelDefinesByProperties':
-            return self._extract_properties_relationship(rel)
-        elif rel_type == 'IfcRelContainedInSpatialStructure':
-            return self._extract_spatial_relationship(rel)
-        elif rel_type == 'IfcRelAssignsToGroup':
-            return self._extract_group_relationship(rel)
-        
-        return None
+        rel_type = rel_type or rel.is_a()
+        if rel_type not in _REL_TYPE_SET:
+            return None
+        return _REL_DISPATCH[rel_type](self, rel)
     
     def _extract_aggregates_relationship(self, rel) -> Dict[str, Any]:
         """Extract aggregation relationship"""
@@ -177,7 +291,7 @@ class IFCParser:
             'type': 'AGGREGATES',
             'globalId': rel.GlobalId,
             'from_element': rel.RelatingObject.GlobalId if rel.RelatingObject else None,
-            'to_elements': [obj.GlobalId for obj in rel.RelatedObjects if hasattr(obj, 'GlobalId')]
+            'to_elements': _global_ids(rel.RelatedObjects)
         }
         return data
     
@@ -196,7 +310,7 @@ class IFCParser:
         data = {
             'type': 'HAS_PROPERTY',
             'globalId': rel.GlobalId,
-            'from_elements': [obj.GlobalId for obj in rel.RelatedObjects if hasattr(obj, 'GlobalId')],
+            'from_elements': _global_ids(rel.RelatedObjects),
             'to_property': rel.RelatingPropertyDefinition.GlobalId if hasattr(rel.RelatingPropertyDefinition, 'GlobalId') else None
         }
         return data
@@ -206,7 +320,7 @@ class IFCParser:
         data = {
             'type': 'CONTAINED_IN',
             'globalId': rel.GlobalId,
-            'from_elements': [obj.GlobalId for obj in rel.RelatedElements if hasattr(obj, 'GlobalId')],
+            'from_elements': _global_ids(rel.RelatedElements),
             'to_structure': rel.RelatingStructure.GlobalId if rel.RelatingStructure else None
         }
         return data
@@ -216,7 +330,17 @@ class IFCParser:
         data = {
             'type': 'ASSIGNED_TO',
             'globalId': rel.GlobalId,
-            'from_elements': [obj.GlobalId for obj in rel.RelatedObjects if hasattr(obj, 'GlobalId')],
+            'from_elements': _global_ids(rel.RelatedObjects),
             'to_group': rel.RelatingGroup.GlobalId if rel.RelatingGroup else None
         }
-        return data
\ No newline at end of file
+        return data
+
+
+# Relationship type -> extractor (same order as _REL_TYPES)
+_REL_DISPATCH = dict(zip(_REL_TYPES, (
+    IFCParser._extract_aggregates_relationship,
+    IFCParser._extract_connects_relationship,
+    IFCParser._extract_properties_relationship,
+    IFCParser._extract_spatial_relationship,
+    IFCParser._extract_group_relationship,
+)))
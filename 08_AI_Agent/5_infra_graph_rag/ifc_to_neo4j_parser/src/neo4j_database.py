@@ -1,19 +1,210 @@
 """
 Neo4j database connection and data processing module
 """
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from itertools import islice
 import json
 from pathlib import Path
 import os
 from datetime import datetime
 
 
+# PropertySet values Neo4j can store directly as node properties
+_NEO4J_SCALARS = (str, int, float, bool)
+
+
+def _flat_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    PropertySet values as scalar node properties keyed by "<pset>__<property>"
+    
+    Flat parser output is passed through; nested {pset: {property: value}} dicts are
+    flattened. Values Neo4j can't store as properties (lists of mixed types, entities)
+    are stored as their string form.
+    """
+    flat = {}
+    for key, value in properties.items():
+        if isinstance(value, dict):
+            for prop_name, prop_value in value.items():
+                flat[f"{key}__{prop_name}"] = prop_value if isinstance(prop_value, _NEO4J_SCALARS) else str(prop_value)
+        else:
+            flat[key] = value if isinstance(value, _NEO4J_SCALARS) else str(value)
+    return flat
+
+
+def _nested_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    PropertySet values as {pset: {property: value}}, the JSON shape of 'properties' written by all importers
+    
+    Nested dicts are passed through; flat "<pset>__<property>" keys are split at the first "__".
+    """
+    nested = {}
+    for key, value in properties.items():
+        if isinstance(value, dict):
+            nested.setdefault(key, {}).update(value)
+        else:
+            pset_name, _, prop_name = key.partition('__')
+            nested.setdefault(pset_name, {})[prop_name] = value
+    return nested
+
+
+# Relationship type -> (source id key, target id key) of the relationship data.
+# A key ending in 's' holds a list of ids
+_PAIR_KEYS = {
+    'AGGREGATES': ('from_element', 'to_elements'),
+    'CONNECTS_TO': ('from_element', 'to_element'),
+    'CONTAINED_IN': ('from_elements', 'to_structure'),
+    'ASSIGNED_TO': ('from_elements', 'to_group'),
+}
+
+
+# Rows per write transaction in the concurrent (async) ingest. Smaller than batch_size so
+# that one file is split into enough transactions to keep several sessions busy
+_ASYNC_CHUNK_SIZE = 1000
+
+
+# Fixed Cypher texts are module constants so every call sends identical query text
+# (the server's plan cache is keyed by it) without rebuilding the string
+_Q_MERGE_FILE = """
+MERGE (f:IFCFile {fileId: $fileId})
+SET f += $fileData
+"""
+
+# All counts in one round-trip; each count subquery is answered from the count store, no scan
+_Q_STATS = """
+CALL { MATCH (n) RETURN count(n) AS nodes }
+CALL { MATCH ()-[r]->() RETURN count(r) AS relationships }
+CALL { MATCH (n:Element) RETURN count(n) AS elements }
+CALL { MATCH (n:IFCFile) RETURN count(n) AS files }
+RETURN nodes, relationships, elements, files
+"""
+
+_Q_MERGE_REL_CONNECTS = """
+MATCH (from:Element {globalId: $from_id})
+MATCH (to:Element {globalId: $to_id})
+MERGE (from)-[r:CONNECTS_TO]->(to)
+SET r.globalId = $rel_id
+"""
+
+
+def _label(name: str) -> str:
+    """Backtick-quoted label/relationship type, safe to interpolate into Cypher text"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+@lru_cache(maxsize=None)
+def _element_merge_query(ifc_class: str, with_file: bool) -> str:
+    """Single element MERGE query for one IFC class (label), optionally linking the file node"""
+    query = f"""
+    MERGE (e:Element {{globalId: $globalId}})
+    SET e:{_label(ifc_class)}
+    SET e += $properties
+    """
+    if with_file:
+        query += """
+        WITH e
+        MATCH (f:IFCFile {fileId: $fileId})
+        MERGE (e)-[:BELONGS_TO_FILE]->(f)
+        """
+    return query
+
+
+# The file node is matched once before UNWIND, so each batch does one IFCFile lookup
+# instead of one per row (no rows are written if the file node does not exist)
+_FILE_MATCH = "MATCH (f:IFCFile {fileId: $fileId})"
+_FILE_LINK = "MERGE (e)-[:BELONGS_TO_FILE]->(f)"
+
+
+@lru_cache(maxsize=None)
+def _element_query(ifc_class: str, with_file: bool = False) -> str:
+    """UNWIND query merging element nodes of one IFC class from $rows node properties, optionally linked to $fileId"""
+    # Labels cannot be parameterized, so the IFC class is part of the query text.
+    # MERGE uses only the Element label so the single Element(globalId) index covers all classes
+    return f"""
+    {_FILE_MATCH if with_file else ''}
+    UNWIND $rows AS row
+    MERGE (e:Element {{globalId: row.globalId}})
+    SET e:{_label(ifc_class)}
+    SET e += row
+    {_FILE_LINK if with_file else ''}
+    """
+
+
+@lru_cache(maxsize=None)
+def _apoc_element_query(with_file: bool = False) -> str:
+    """
+    Same as _element_query, with the IFC class label taken from row.ifcClass by APOC,
+    so one query text (and one cached plan) serves every class
+    """
+    return f"""
+    {_FILE_MATCH if with_file else ''}
+    UNWIND $rows AS row
+    MERGE (e:Element {{globalId: row.globalId}})
+    SET e += row
+    {_FILE_LINK if with_file else ''}
+    WITH e, row
+    CALL apoc.create.addLabels(e, [row.ifcClass]) YIELD node
+    RETURN count(node)
+    """
+
+
+def _relationship_pairs(rel_type: str, rel_data: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """
+    Expand one relationship into (from, to, rel_id) rows, one per Neo4j relationship
+    
+    Rows are positional (sent as Bolt lists, read as p[0], p[1], p[2] in Cypher),
+    so the key strings are not encoded again for every row as with maps.
+    """
+    from_key, to_key = _PAIR_KEYS[rel_type]
+    from_ids = rel_data[from_key]
+    to_ids = rel_data[to_key]
+    if not from_ids or not to_ids:
+        return []
+    if not from_key.endswith('s'):
+        from_ids = (from_ids,)
+    if not to_key.endswith('s'):
+        to_ids = (to_ids,)
+    rel_id = rel_data['globalId']
+    return [(from_id, to_id, rel_id) for from_id in from_ids for to_id in to_ids]
+
+
+@lru_cache(maxsize=None)
+def _relationship_query(rel_type: str) -> str:
+    """UNWIND query creating relationships of one type from $rows (from, to, rel_id) rows"""
+    return f"""
+    UNWIND $rows AS p
+    MATCH (from:Element {{globalId: p[0]}})
+    MATCH (to:Element {{globalId: p[1]}})
+    MERGE (from)-[r:{_label(rel_type)}]->(to)
+    SET r.globalId = p[2]
+    """
+
+
+def _created_count(summary) -> int:
+    """Nodes + relationships created by a write, from the result summary counters"""
+    counters = summary.counters
+    return counters.nodes_created + counters.relationships_created
+
+
+def _nodes_created(summary) -> int:
+    """Nodes created by a write (element writes also create their file links)"""
+    return summary.counters.nodes_created
+
+
 class Neo4jDatabase:
     """Neo4j database connection and data management class"""
     
-    def __init__(self, uri: str, user: str, password: str, database: str = "elements"):
+    def __init__(self, uri: str, user: str, password: str, database: str = "elements", batch_size: Optional[int] = None,
+                 write_concurrency: Optional[int] = None, pool_size: int = 50, acq_timeout: float = 60.0,
+                 connection_lifetime: float = 3600.0, properties_json: Optional[bool] = None,
+                 use_apoc: Optional[bool] = None):
         """
         Initialize Neo4j database connection
         
@@ -22,13 +213,33 @@ class Neo4jDatabase:
             user: Username
             password: Password
             database: Database name
+            batch_size: Rows per UNWIND write transaction (default: NEO4J_BATCH_SIZE or 20000)
+            write_concurrency: Write transactions in flight at once during bulk_ingest
+                (default: NEO4J_WRITE_CONCURRENCY or 1, i.e. sequential writes)
+            pool_size: Maximum connections in the driver pool. Keep it at or above
+                write_concurrency; lower it when the Neo4j server itself is the bottleneck
+            acq_timeout: Seconds to wait for a free pool connection before failing
+            connection_lifetime: Seconds after which pooled connections are recycled
+            properties_json: Also store PropertySets as a JSON string in 'properties'
+                (default: NEO4J_PROPERTIES_JSON, on unless set to 0)
+            use_apoc: Pass the IFC class label as a parameter through apoc.create.addLabels
+                in bulk writes (default: NEO4J_USE_APOC, off; requires the APOC plugin)
         """
         self.logger = logging.getLogger(__name__)
         self.uri = uri
         self.user = user
         self.password = password
         self.database = database
+        self.batch_size = batch_size or int(os.getenv('NEO4J_BATCH_SIZE', 20000))
+        self.write_concurrency = write_concurrency or int(os.getenv('NEO4J_WRITE_CONCURRENCY', 1))
+        self.pool_size = pool_size
+        self.acq_timeout = acq_timeout
+        self.connection_lifetime = connection_lifetime
+        self.properties_json = properties_json if properties_json is not None else os.getenv('NEO4J_PROPERTIES_JSON', '1') != '0'
+        self.use_apoc = use_apoc if use_apoc is not None else os.getenv('NEO4J_USE_APOC', '0') == '1'
         self.driver = None
+        self._session = None
+        self._ingest_queue = None
         
     def connect(self) -> bool:
         """
@@ -38,67 +249,128 @@ class Neo4jDatabase:
             Connection success status
         """
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password), **self._driver_config())
             # Connection test
             with self.driver.session(database=self.database) as session:
                 session.run("RETURN 1")
             self.logger.info(f"Neo4j database connection successful: {self.uri}")
+            self.ensure_indexes()
             return True
         except Exception as e:
             self.logger.error(f"Neo4j database connection failed: {e}")
             return False
     
+    def _driver_config(self) -> Dict[str, Any]:
+        """Connection pool settings shared by the sync and async drivers"""
+        return {
+            'max_connection_pool_size': self.pool_size,
+            'connection_acquisition_timeout': self.acq_timeout,
+            'max_connection_lifetime': self.connection_lifetime,
+            'keep_alive': True,
+        }
+    
+    def ensure_indexes(self):
+        """
+        Create the indexes used by MERGE/MATCH lookups during import (no-op if they exist)
+        
+        Without them every MERGE on globalId/fileId is a full label scan.
+        The uniqueness constraints on the MERGE keys also provide their indexes and keep
+        MERGE idempotent under concurrent writers.
+        """
+        statements = [
+            "CREATE CONSTRAINT elem_gid IF NOT EXISTS FOR (n:Element) REQUIRE n.globalId IS UNIQUE",
+            "CREATE CONSTRAINT file_fid IF NOT EXISTS FOR (n:IFCFile) REQUIRE n.fileId IS UNIQUE",
+        ]
+        with self.driver.session(database=self.database) as session:
+            for statement in statements:
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    # e.g. existing duplicate globalIds prevent the constraint
+                    self.logger.warning(f"Index creation failed: {statement}, error: {e}")
+    
+    def __enter__(self):
+        """Open one session shared by all batch writes until __exit__ (e.g. for one IFC file)"""
+        self._session = self.driver.session(database=self.database)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._session.close()
+        self._session = None
+    
+    @contextmanager
+    def _session_scope(self, session=None):
+        """Yield the given session, the shared ingest session, or a temporary session"""
+        session = session or self._session
+        if session is not None:
+            yield session
+        else:
+            with self.driver.session(database=self.database) as session:
+                yield session
+    
+    def start_workers(self, workers: int = 4) -> 'IngestQueue':
+        """
+        Start background writer threads for callers that produce elements one at a time
+        
+        Args:
+            workers: Number of writer threads, each with its own session
+            
+        Returns:
+            IngestQueue to put elements/relationships into (flushed by close())
+        """
+        if self._ingest_queue is None:
+            self._ingest_queue = IngestQueue(self, workers)
+        return self._ingest_queue
+    
     def close(self):
         """Close database connection"""
+        if self._ingest_queue is not None:
+            self._ingest_queue.close()
+            self._ingest_queue = None
         if self.driver:
             self.driver.close()
             self.logger.info("Neo4j database connection closed")
     
-    def create_file_node(self, file_path: Path) -> Optional[str]:
+    def create_file_node(self, file_path: Path, import_date: str = None) -> Optional[str]:
         """
         Create IFC file metadata node in Neo4j
         
         Args:
             file_path: Path to the IFC file
+            import_date: ISO import timestamp, shared when importing many files (default: now)
             
         Returns:
             File ID if successful, None otherwise
         """
         try:
-            with self.driver.session(database=self.database) as session:
-                result = session.execute_write(self._create_file_tx, file_path)
-                return result
-        except Exception as e:
-            self.logger.error(f"File node creation failed: {file_path}, error: {e}")
-            return None
-    
-    def _create_file_tx(self, tx, file_path: Path) -> Optional[str]:
-        """File node creation transaction"""
-        try:
-            # Get file information
+            # Metadata is built once here, not inside the transaction function that execute_write may retry
             stat = file_path.stat()
             file_id = f"FILE_{file_path.stem}_{int(stat.st_mtime)}"
-            
+            created_date, modified_date = (datetime.fromtimestamp(t).isoformat() for t in (stat.st_ctime, stat.st_mtime))
             file_data = {
                 'fileId': file_id,
                 'fileName': file_path.name,
                 'filePath': str(file_path.absolute()),
                 'fileSize': stat.st_size,
-                'createdDate': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                'modifiedDate': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                'importDate': datetime.now().isoformat()
+                'createdDate': created_date,
+                'modifiedDate': modified_date,
+                'importDate': import_date or datetime.now().isoformat()
             }
             
-            query = """
-            MERGE (f:IFCFile {fileId: $fileId})
-            SET f += $fileData
-            RETURN f.fileId as fileId
-            """
-            
-            result = tx.run(query, fileId=file_id, fileData=file_data)
-            record = result.single()
+            with self._session_scope() as session:
+                result = session.execute_write(self._create_file_tx, file_id, file_data)
+                return result
+        except Exception as e:
+            self.logger.error(f"File node creation failed: {file_path}, error: {e}")
+            return None
+    
+    def _create_file_tx(self, tx, file_id: str, file_data: Dict[str, Any]) -> Optional[str]:
+        """File node creation transaction"""
+        try:
+            # Success is read from the summary counters, no result record is streamed back
+            summary = tx.run(_Q_MERGE_FILE, fileId=file_id, fileData=file_data).consume()
             
-            if record:
+            if summary.counters.contains_updates:
                 self.logger.debug(f"File node created/updated: {file_id}")
                 return file_id
             else:
@@ -125,7 +397,7 @@ class Neo4jDatabase:
                 result = session.execute_write(self._create_element_tx, element_data, file_id)
                 return result
         except Exception as e:
-            self.logger.error(f"Node creation failed: {element_data.get('globalId', 'Unknown')}, error: {e}")
+            self.logger.error("Node creation failed: %s, error: %s", element_data.get('globalId'), e)
             return False
     
     def _create_element_tx(self, tx, element_data: Dict[str, Any], file_id: str = None) -> bool:
@@ -148,42 +420,263 @@ class Neo4jDatabase:
             if file_id:
                 properties['sourceFileId'] = file_id
             
-            # Store PropertySet as JSON string
+            # PropertySet values as scalar node properties (JSON copy only if enabled)
             if element_data.get('properties'):
-                properties['properties'] = json.dumps(element_data['properties'])
-            
-            # Dynamic label creation (Element and IFC class name)
-            labels = f":Element:{ifc_class}"
-            
-            query = f"""
-            MERGE (e{labels} {{globalId: $globalId}})
-            SET e += $properties
-            """
-            
-            # Create relationship to file if file_id is provided
-            if file_id:
-                query += """
-                WITH e
-                MATCH (f:IFCFile {fileId: $fileId})
-                MERGE (e)-[:BELONGS_TO_FILE]->(f)
-                """
+                properties.update(_flat_properties(element_data['properties']))
+                if self.properties_json:
+                    properties['properties'] = json.dumps(_nested_properties(element_data['properties']))
             
-            query += "RETURN e.globalId as globalId"
+            # Merge on the indexed Element label only, then add the IFC class label
+            # (and create the relationship to the file if file_id is provided)
+            query = _element_merge_query(ifc_class, bool(file_id))
+            summary = tx.run(query, globalId=global_id, properties=properties, fileId=file_id).consume()
             
-            result = tx.run(query, globalId=global_id, properties=properties, fileId=file_id)
-            record = result.single()
-            
-            if record:
-                self.logger.debug(f"Node created/updated: {global_id}")
+            if summary.counters.contains_updates:
+                # Called once per element, skip building the message when DEBUG is off
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("Node created/updated: %s", global_id)
                 return True
             else:
-                self.logger.warning(f"Node creation returned no result: {global_id}")
+                self.logger.warning("Node creation returned no result: %s", global_id)
                 return False
                 
         except Exception as e:
             self.logger.error(f"Node creation transaction failed: {e}")
             return False
     
+    def bulk_create_elements(self, ifc_class: str, elements: List[Dict[str, Any]], file_id: str = None, session=None) -> int:
+        """
+        Create IFC elements of one class as Neo4j nodes with UNWIND (using MERGE)
+        
+        Args:
+            ifc_class: IFC class name shared by all elements (used as label)
+            elements: Element records (IFCParser ElementRecord)
+            file_id: Associated file ID
+            session: Session to write with (default: shared ingest session or a temporary one)
+            
+        Returns:
+            Number of created nodes (existing nodes are updated but not counted)
+        """
+        # Node properties are built up front, one dict per row
+        rows = [self._element_properties(element, ifc_class, file_id) for element in elements]
+        
+        # File links are created by the same statement (see _element_query)
+        return self._run_batches(rows, self._bulk_element_query(ifc_class, bool(file_id)), session=session,
+                                 count=_nodes_created, fileId=file_id)
+    
+    def _bulk_element_query(self, ifc_class: str, with_file: bool) -> str:
+        """UNWIND element query for one IFC class, class-independent when APOC is used"""
+        return _apoc_element_query(with_file) if self.use_apoc else _element_query(ifc_class, with_file)
+    
+    def _element_properties(self, element: Any, ifc_class: str, file_id: str = None) -> Dict[str, Any]:
+        """Neo4j node properties of an element record"""
+        properties = {
+            'globalId': element.globalId,
+            'name': element.name,
+            'ifcClass': ifc_class,
+            'description': element.description,
+            'objectType': element.objectType,
+            'tag': element.tag
+        }
+        if file_id:
+            properties['sourceFileId'] = file_id
+        if element.properties:
+            # Flat "<pset>__<property>" keys are set directly as node properties (sent as
+            # native Bolt values). The JSON copy keeps 'properties' queryable as a single field
+            # for the graph agents' prompts and can be disabled with NEO4J_PROPERTIES_JSON=0
+            properties.update(_flat_properties(element.properties))
+            if self.properties_json:
+                properties['properties'] = json.dumps(_nested_properties(element.properties))
+        return properties
+    
+    def stream_elements(self, elements: Iterable[Any], file_id: str = None, session=None) -> Tuple[int, int]:
+        """
+        Create IFC element nodes from an element stream, batch_size elements at a time
+        
+        Only one batch is held in memory. Each batch is grouped by IFC class
+        and written with bulk_create_elements.
+        
+        Args:
+            elements: Iterable of element records (e.g. IFCParser.iter_elements)
+            file_id: Associated file ID
+            session: Session to write with (default: shared ingest session or a temporary one)
+            
+        Returns:
+            (number of created/updated nodes, number of elements read)
+        """
+        written = read = 0
+        elements = iter(elements)
+        with self._session_scope(session) as session:
+            while True:
+                batch = list(islice(elements, self.batch_size))
+                if not batch:
+                    break
+                read += len(batch)
+                
+                groups = {}
+                for element in batch:
+                    groups.setdefault(element.ifcClass, []).append(element)
+                for ifc_class, class_elements in groups.items():
+                    written += self.bulk_create_elements(ifc_class, class_elements, file_id, session)
+        
+        return written, read
+    
+    def bulk_create_relationships(self, rel_type: str, relationships: List[Dict[str, Any]], session=None) -> int:
+        """
+        Create IFC relationships of one type as Neo4j relationships with UNWIND
+        
+        Args:
+            rel_type: Relationship type shared by all relationships
+            relationships: Relationship data dictionaries
+            session: Session to write with (default: shared ingest session or a temporary one)
+            
+        Returns:
+            Number of created Neo4j relationships (existing ones are updated but not counted)
+        """
+        if rel_type == 'HAS_PROPERTY':
+            # PropertySet is already stored as element node attributes, no separate relationship needed
+            return 0
+        
+        if rel_type not in _PAIR_KEYS:
+            self.logger.warning(f"Unknown relationship type: {rel_type}")
+            return 0
+        
+        pairs = [pair for rel_data in relationships for pair in _relationship_pairs(rel_type, rel_data)]
+        return self._run_batches(pairs, _relationship_query(rel_type), session=session)
+    
+    def _run_batches(self, rows: List[Dict[str, Any]], query: str, session=None, count=_created_count, **params) -> int:
+        """
+        Run an UNWIND $rows query in batch_size chunks, one write transaction per chunk
+        
+        Args:
+            rows: Rows passed as $rows
+            query: UNWIND query
+            session: Session to write with (default: shared ingest session or a temporary one)
+            count: Function reading the created count from the result summary
+            params: Additional query parameters
+            
+        Returns:
+            Number of nodes and relationships created (as read by count)
+        """
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        
+        def write_batch(tx, batch):
+            summary = tx.run(query, rows=batch, **params).consume()
+            if debug:
+                self.logger.debug("Batch of %d rows written in %s ms", len(batch), summary.result_consumed_after)
+            return count(summary)
+        
+        total = 0
+        try:
+            with self._session_scope(session) as session:
+                for start in range(0, len(rows), self.batch_size):
+                    total += session.execute_write(write_batch, rows[start:start + self.batch_size])
+        except Exception as e:
+            self.logger.error(f"Batch write failed after {total} rows, error: {e}")
+        return total
+    
+    def ingest(self, elements: Iterable[Any], relationships: Dict[str, List[Dict[str, Any]]],
+               file_id: str = None, session=None) -> Tuple[int, int, int]:
+        """
+        Write elements and relationships of one file in two sequential phases
+        
+        All element nodes are written first (grouped by IFC class), so every relationship
+        query finds both endpoints. Relationships are then written grouped by type, one
+        UNWIND query text per type.
+        
+        Args:
+            elements: Element records (e.g. IFCParser.iter_elements)
+            relationships: Relationship data grouped by type
+            file_id: Associated file ID
+            session: Session to write with (default: shared ingest session or a temporary one)
+            
+        Returns:
+            (number of created nodes, number of elements read, number of created relationships)
+        """
+        written, read = self.stream_elements(elements, file_id, session)
+        
+        rel_written = 0
+        for rel_type, rels in relationships.items():
+            created = self.bulk_create_relationships(rel_type, rels, session)
+            self.logger.debug("%s: %d new links from %d relationships", rel_type, created, len(rels))
+            rel_written += created
+        return written, read, rel_written
+    
+    def bulk_ingest(self, elements: Iterable[Any], relationships: Dict[str, List[Dict[str, Any]]],
+                    file_id: str = None) -> Tuple[int, int, int]:
+        """
+        Write elements and relationships of one file with up to write_concurrency
+        concurrent write transactions (see bulk_ingest_async)
+        
+        Returns:
+            (number of created nodes, number of elements read, number of created relationships)
+        """
+        return asyncio.run(self.bulk_ingest_async(elements, relationships, file_id))
+    
+    async def bulk_ingest_async(self, elements: Iterable[Any], relationships: Dict[str, List[Dict[str, Any]]],
+                                file_id: str = None) -> Tuple[int, int, int]:
+        """
+        Write elements and relationships of one file with the async driver
+        
+        Rows are split into chunks of 1000, one write transaction each, and the chunks
+        are awaited with asyncio.gather. A semaphore keeps at most write_concurrency
+        transactions in flight. Relationship chunks start after all element chunks
+        finished, because they MATCH the element nodes.
+        
+        Args:
+            elements: Element records (e.g. IFCParser.iter_elements)
+            relationships: Relationship data grouped by type
+            file_id: Associated file ID
+            
+        Returns:
+            (number of created nodes, number of elements read, number of created relationships)
+        """
+        # The async driver is bound to the running event loop, so it lives for this call only
+        driver = AsyncGraphDatabase.driver(self.uri, auth=(self.user, self.password), **self._driver_config())
+        semaphore = asyncio.Semaphore(self.write_concurrency)
+        try:
+            groups = {}
+            for element in elements:
+                groups.setdefault(element.ifcClass, []).append(self._element_properties(element, element.ifcClass, file_id))
+            read = sum(len(rows) for rows in groups.values())
+            
+            written = await self._gather_writes(driver, semaphore, [
+                (rows, self._bulk_element_query(ifc_class, bool(file_id)), _nodes_created) for ifc_class, rows in groups.items()
+            ], fileId=file_id)
+            
+            rel_written = await self._gather_writes(driver, semaphore, [
+                ([pair for rel_data in rels for pair in _relationship_pairs(rel_type, rel_data)], _relationship_query(rel_type), _created_count)
+                for rel_type, rels in relationships.items() if rel_type in _PAIR_KEYS
+            ])
+            return written, read, rel_written
+        finally:
+            await driver.close()
+    
+    async def _gather_writes(self, driver, semaphore: asyncio.Semaphore, jobs: List[Tuple[List[Dict[str, Any]], str, Any]], **params) -> int:
+        """Run (rows, query, count function) jobs as concurrent chunked write transactions"""
+        async def write_chunk(chunk, query, count):
+            async def write_batch(tx):
+                result = await tx.run(query, rows=chunk, **params)
+                return count(await result.consume())
+            
+            async with semaphore:
+                async with driver.session(database=self.database) as session:
+                    return await session.execute_write(write_batch)
+        
+        results = await asyncio.gather(*(
+            write_chunk(rows[start:start + _ASYNC_CHUNK_SIZE], query, count)
+            for rows, query, count in jobs
+            for start in range(0, len(rows), _ASYNC_CHUNK_SIZE)
+        ), return_exceptions=True)
+        
+        total = 0
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error(f"Batch write failed, error: {result}")
+            else:
+                total += result
+        return total
+    
     def create_relationship(self, rel_data: Dict[str, Any]) -> bool:
         """
         Create IFC relationship as Neo4j relationship
@@ -227,31 +720,12 @@ class Neo4jDatabase:
     
     def _create_aggregates_relationship(self, tx, rel_data: Dict[str, Any]) -> bool:
         """Create aggregation relationship"""
-        from_id = rel_data['from_element']
-        to_ids = rel_data['to_elements']
-        
-        if not from_id or not to_ids:
+        pairs = _relationship_pairs('AGGREGATES', rel_data)
+        if not pairs:
             return False
         
-        success_count = 0
-        for to_id in to_ids:
-            query = """
-            MATCH (from:Element {globalId: $from_id})
-            MATCH (to:Element {globalId: $to_id})
-            MERGE (from)-[r:AGGREGATES]->(to)
-            SET r.globalId = $rel_id
-            RETURN r
-            """
-            
-            result = tx.run(query, 
-                          from_id=from_id, 
-                          to_id=to_id, 
-                          rel_id=rel_data['globalId'])
-            
-            if result.single():
-                success_count += 1
-        
-        return success_count > 0
+        # One UNWIND query for all related objects instead of one query per pair
+        return tx.run(_relationship_query('AGGREGATES'), rows=pairs).consume().counters.contains_updates
     
     def _create_connects_relationship(self, tx, rel_data: Dict[str, Any]) -> bool:
         """Create connection relationship"""
@@ -261,20 +735,12 @@ class Neo4jDatabase:
         if not from_id or not to_id:
             return False
         
-        query = """
-        MATCH (from:Element {globalId: $from_id})
-        MATCH (to:Element {globalId: $to_id})
-        MERGE (from)-[r:CONNECTS_TO]->(to)
-        SET r.globalId = $rel_id
-        RETURN r
-        """
-        
-        result = tx.run(query, 
+        summary = tx.run(_Q_MERGE_REL_CONNECTS, 
                       from_id=from_id, 
                       to_id=to_id, 
-                      rel_id=rel_data['globalId'])
+                      rel_id=rel_data['globalId']).consume()
         
-        return result.single() is not None
+        return summary.counters.contains_updates
     
     def _create_property_relationship(self, tx, rel_data: Dict[str, Any]) -> bool:
         """Create property relationship (PropertySet is handled as node attributes)"""
@@ -283,59 +749,21 @@ class Neo4jDatabase:
     
     def _create_spatial_relationship(self, tx, rel_data: Dict[str, Any]) -> bool:
         """Create spatial containment relationship"""
-        from_ids = rel_data['from_elements']
-        to_id = rel_data['to_structure']
-        
-        if not from_ids or not to_id:
+        pairs = _relationship_pairs('CONTAINED_IN', rel_data)
+        if not pairs:
             return False
         
-        success_count = 0
-        for from_id in from_ids:
-            query = """
-            MATCH (from:Element {globalId: $from_id})
-            MATCH (to:Element {globalId: $to_id})
-            MERGE (from)-[r:CONTAINED_IN]->(to)
-            SET r.globalId = $rel_id
-            RETURN r
-            """
-            
-            result = tx.run(query, 
-                          from_id=from_id, 
-                          to_id=to_id, 
-                          rel_id=rel_data['globalId'])
-            
-            if result.single():
-                success_count += 1
-        
-        return success_count > 0
+        # One UNWIND query for all related objects instead of one query per pair
+        return tx.run(_relationship_query('CONTAINED_IN'), rows=pairs).consume().counters.contains_updates
     
     def _create_group_relationship(self, tx, rel_data: Dict[str, Any]) -> bool:
         """Create group assignment relationship"""
-        from_ids = rel_data['from_elements']
-        to_id = rel_data['to_group']
-        
-        if not from_ids or not to_id:
+        pairs = _relationship_pairs('ASSIGNED_TO', rel_data)
+        if not pairs:
             return False
         
-        success_count = 0
-        for from_id in from_ids:
-            query = """
-            MATCH (from:Element {globalId: $from_id})
-            MATCH (to:Element {globalId: $to_id})
-            MERGE (from)-[r:ASSIGNED_TO]->(to)
-            SET r.globalId = $rel_id
-            RETURN r
-            """
-            
-            result = tx.run(query, 
-                          from_id=from_id, 
-                          to_id=to_id, 
-                          rel_id=rel_data['globalId'])
-            
-            if result.single():
-                success_count += 1
-        
-        return success_count > 0
+        # One UNWIND query for all related objects instead of one query per pair
+        return tx.run(_relationship_query('ASSIGNED_TO'), rows=pairs).consume().counters.contains_updates
     
     def clear_database(self) -> bool:
         """
@@ -345,8 +773,11 @@ class Neo4jDatabase:
             Deletion success status
         """
         try:
+            # Deleted in batches of 10000 nodes, each in its own transaction, so large graphs don't
+            # build one huge transaction. CALL ... IN TRANSACTIONS needs an auto-commit
+            # transaction, i.e. session.run rather than execute_write
             with self.driver.session(database=self.database) as session:
-                session.run("MATCH (n) DETACH DELETE n")
+                session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
             self.logger.info("Database initialization completed")
             return True
         except Exception as e:
@@ -362,34 +793,18 @@ class Neo4jDatabase:
         """
         try:
             with self.driver.session(database=self.database) as session:
-                # Node count
-                node_result = session.run("MATCH (n) RETURN count(n) as count")
-                node_count = node_result.single()['count']
-                
-                # Relationship count
-                rel_result = session.run("MATCH ()-[r]->() RETURN count(r) as count")
-                rel_count = rel_result.single()['count']
+                record = session.run(_Q_STATS).single()
                 
-                # Node count by label (using basic Cypher only)
+                # Node count by label (main labels only)
                 label_counts = {}
-                try:
-                    # Count Element nodes (main label)
-                    element_result = session.run("MATCH (n:Element) RETURN count(n) as count")
-                    element_count = element_result.single()['count']
-                    if element_count > 0:
-                        label_counts['Element'] = element_count
-                        
-                    # Count IFCFile nodes
-                    file_result = session.run("MATCH (n:IFCFile) RETURN count(n) as count")
-                    file_count = file_result.single()['count']
-                    if file_count > 0:
-                        label_counts['IFCFile'] = file_count
-                except:
-                    pass
+                if record['elements'] > 0:
+                    label_counts['Element'] = record['elements']
+                if record['files'] > 0:
+                    label_counts['IFCFile'] = record['files']
                 
                 return {
-                    'total_nodes': node_count,
-                    'total_relationships': rel_count,
+                    'total_nodes': record['nodes'],
+                    'total_relationships': record['relationships'],
                     'label_counts': label_counts
                 }
                 
@@ -399,4 +814,98 @@ class Neo4jDatabase:
                 'total_nodes': 0,
                 'total_relationships': 0,
                 'label_counts': {}
-            }
\ No newline at end of file
+            }
+
+
+class IngestQueue:
+    """
+    Bounded producer/consumer queue writing single elements/relationships in UNWIND batches
+    
+    Worker threads take up to batch_size items (or whatever arrived within max_wait seconds)
+    and write them with bulk_create_elements / bulk_create_relationships on their own session.
+    Relationships MATCH their element nodes, so call join() after the last element
+    before putting relationships.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, db: Neo4jDatabase, workers: int = 4, batch_size: int = 1000, max_wait: float = 0.1):
+        self.logger = logging.getLogger(__name__)
+        self.db = db
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        # Bounded so a fast producer blocks instead of buffering the whole file
+        self._queue = queue.Queue(maxsize=batch_size * workers * 2)
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+    
+    def put(self, element: Any, file_id: str = None):
+        """Queue one element record"""
+        self._queue.put(('element', element, file_id))
+    
+    def put_rel(self, rel_data: Dict[str, Any]):
+        """Queue one relationship"""
+        self._queue.put(('rel', rel_data, None))
+    
+    def join(self):
+        """Wait until every queued item has been written"""
+        self._queue.join()
+    
+    def close(self):
+        """Flush queued items and stop the worker threads"""
+        self.join()
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+    
+    def _worker(self):
+        with self.db.driver.session(database=self.db.database) as session:
+            while True:
+                item = self._queue.get()
+                if item is self._STOP:
+                    self._queue.task_done()
+                    return
+                
+                # Drain up to batch_size items or until max_wait has passed
+                batch = [item]
+                stop = False
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                
+                try:
+                    self._write(batch, session)
+                except Exception as e:
+                    self.logger.error(f"Queued batch write failed: {len(batch)} items, error: {e}")
+                finally:
+                    for _ in range(len(batch) + stop):
+                        self._queue.task_done()
+                if stop:
+                    return
+    
+    def _write(self, batch: List[Tuple[str, Any, Optional[str]]], session):
+        """Group a drained batch by IFC class/file and relationship type, then bulk write each group"""
+        element_groups = {}
+        rel_groups = {}
+        for kind, payload, file_id in batch:
+            if kind == 'element':
+                element_groups.setdefault((payload.ifcClass, file_id), []).append(payload)
+            else:
+                rel_groups.setdefault(payload['type'], []).append(payload)
+        
+        for (ifc_class, file_id), elements in element_groups.items():
+            self.db.bulk_create_elements(ifc_class, elements, file_id, session)
+        for rel_type, rels in rel_groups.items():
+            self.db.bulk_create_relationships(rel_type, rels, session)
@@ -1,32 +1,48 @@
 """
 Logging configuration utility
 """
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Optional, Tuple
 
+# Background listener writing queued records to the log file (one per process)
+_file_listener = None
 
-def setup_logging(log_level: str = "INFO", log_file: Path = None) -> logging.Logger:
-    """
-    Initialize logging configuration
-    
-    Args:
-        log_level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-        log_file: Log file path (disable file logging if None)
-        
-    Returns:
-        Configured logger instance
-    """
-    
-    # Set log level
-    level = getattr(logging, log_level.upper(), logging.INFO)
-    
+# Log file of the current configuration, also opened by pool workers (see worker_logging)
+_log_file = None
+
+_atexit_registered = False
+
+_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _stop_file_listener():
+    """Write the queued records to the log file and stop the listener thread"""
+    global _file_listener
+    if _file_listener is not None:
+        _file_listener.stop()
+        for handler in _file_listener.handlers:
+            handler.close()
+        _file_listener = None
+
+
+def _file_handler(log_file: Path) -> logging.FileHandler:
+    """Handler appending formatted records to log_file"""
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(_LOG_FORMAT, datefmt=_DATE_FORMAT))
+    return file_handler
+
+
+def _configure_root_logger(level: int, file_handler: logging.Handler = None) -> logging.Logger:
+    """Replace the root logger's handlers with a console handler and file_handler (if given)"""
     # Set log format
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    formatter = logging.Formatter(_LOG_FORMAT, datefmt=_DATE_FORMAT)
     
     # Configure root logger
     root_logger = logging.getLogger()
@@ -42,17 +58,70 @@ def setup_logging(log_level: str = "INFO", log_file: Path = None) -> logging.Log
     console_handler.setFormatter(formatter)
     root_logger.addHandler(console_handler)
     
-    # Setup file handler (if needed)
-    if log_file:
-        log_file.parent.mkdir(parents=True, exist_ok=True)
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    if file_handler is not None:
         file_handler.setLevel(level)
-        file_handler.setFormatter(formatter)
         root_logger.addHandler(file_handler)
     
     return root_logger
 
 
+def setup_logging(log_level: str = "INFO", log_file: Path = None) -> logging.Logger:
+    """
+    Initialize logging configuration
+    
+    Args:
+        log_level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        log_file: Log file path (disable file logging if None)
+        
+    Returns:
+        Configured logger instance
+    """
+    global _file_listener, _log_file, _atexit_registered
+    
+    # Set log level
+    level = getattr(logging, log_level.upper(), logging.INFO)
+    
+    _stop_file_listener()
+    _log_file = log_file
+    
+    # Setup file handler (if needed)
+    queue_handler = None
+    if log_file:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        # Logging calls only put records on the queue; a listener thread writes each one to the file
+        log_queue = queue.Queue(-1)
+        queue_handler = QueueHandler(log_queue)
+        _file_listener = QueueListener(log_queue, _file_handler(log_file))
+        _file_listener.start()
+        if not _atexit_registered:
+            atexit.register(_stop_file_listener)
+            _atexit_registered = True
+    
+    return _configure_root_logger(level, queue_handler)
+
+
+def worker_logging() -> Tuple[Optional[Callable], tuple]:
+    """
+    Initializer for process pool workers, so their records reach the console and the log file
+    
+    Without it, forked workers inherit the queue handler but not the listener thread, and
+    spawned workers have no logging configuration at all. Workers append to the log file
+    directly, so nothing is lost when the pool terminates them.
+    
+    Returns:
+        (initializer, initargs) for multiprocessing.Pool / ProcessPoolExecutor
+    """
+    return _init_worker_logging, (logging.getLogger().level, _log_file)
+
+
+def _init_worker_logging(level: int, log_file: Optional[Path]):
+    """Configure logging in a worker process"""
+    global _file_listener
+    # A forked copy of the parent's listener, whose thread doesn't run here
+    _file_listener = None
+    _configure_root_logger(level, _file_handler(log_file) if log_file else None)
+
+
 def get_log_file_path(base_dir: Path) -> Path:
     """
     Generate log file path
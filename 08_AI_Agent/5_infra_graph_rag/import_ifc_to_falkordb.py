@@ -12,6 +12,8 @@ Options:
 	--log-level LEVEL   Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
 	--no-log-file       Disable file logging
 	--stats             Output statistics after conversion completion
+	--workers N         Number of IFC parser processes (default: CPU count)
+	--async-writes      Send write batches concurrently over an asyncio connection pool
 
 Examples:
 	# Basic conversion
@@ -27,6 +29,7 @@ Contact: Taewook Kang (laputa99999@gmail.com)
 """
 
 import argparse
+import asyncio
 import sys
 import os
 from pathlib import Path
@@ -38,6 +41,7 @@ sys.path.insert(0, str(current_dir))
 sys.path.insert(0, str(src_dir))
 
 from src.falkordb_database import FalkorDBDatabase
+from src.falkordb_database_async import AsyncFalkorDBDatabase
 from src.falkordb_graph_converter import IFCToFalkorDBConverter
 from src.utils import setup_logging, get_log_file_path
 
@@ -60,6 +64,10 @@ def parse_arguments():
 					  help='Disable file logging')
 	parser.add_argument('--stats', action='store_true',
 					  help='Output statistics after conversion completion')
+	parser.add_argument('--workers', type=int, default=None,
+					  help='Number of IFC parser processes (default: CPU count)')
+	parser.add_argument('--async-writes', action='store_true',
+					  help='Send write batches concurrently (FALKORDB_WRITE_CONCURRENCY, default: 8)')
 	
 	return parser.parse_args()
 
@@ -98,9 +106,10 @@ BIM Graph Data Importer v1.0.0
 	print(banner)
 
 
-def print_summary(results: dict, stats: dict = None):
-	"""Print conversion result summary"""
-	success_count = sum(1 for success in results.values() if success)
+def print_summary(results: dict, stats: dict = None, success_count: int = None, failed_files: list = None):
+	"""Print conversion result summary (success_count/failed_files are computed if not given)"""
+	if success_count is None:
+		success_count = sum(1 for success in results.values() if success)
 	total_count = len(results)
 	
 	print("\nConversion Result Summary")
@@ -110,7 +119,8 @@ def print_summary(results: dict, stats: dict = None):
 	print(f"Success rate: {(success_count/total_count*100):.1f}%" if total_count > 0 else "0%")
 	
 	# List of failed files
-	failed_files = [file_path for file_path, success in results.items() if not success]
+	if failed_files is None:
+		failed_files = [file_path for file_path, success in results.items() if not success]
 	if failed_files:
 		print("\nFailed files:")
 		for file_path in failed_files:
@@ -190,7 +200,8 @@ def main():
 		
 		# Connect to FalkorDB database
 		print(f"\nConnecting to FalkorDB database at {env_config['host']}:{env_config['port']}...")
-		db = FalkorDBDatabase(
+		db_class = AsyncFalkorDBDatabase if args.async_writes else FalkorDBDatabase
+		db = db_class(
 			host=env_config['host'],
 			port=env_config['port'],
 			username=env_config['username'],
@@ -247,7 +258,12 @@ def main():
 		converter = IFCToFalkorDBConverter(db)
 		
 		# Execute conversion
-		results = converter.convert_directory(input_dir)
+		if args.async_writes:
+			results = asyncio.run(converter.convert_directory_async(input_dir, workers=args.workers, files=ifc_files))
+		else:
+			results = converter.convert_directory(input_dir, workers=args.workers, files=ifc_files)
+		failed_files = [file_path for file_path, success in results.items() if not success]
+		success_count = len(results) - len(failed_files)
 		
 		# Collect statistics (optional)
 		stats = None
@@ -256,13 +272,12 @@ def main():
 			stats = converter.get_conversion_statistics()
 		
 		# Print result summary
-		print_summary(results, stats)
+		print_summary(results, stats, success_count, failed_files)
 		
 		# Close database connection
 		db.close()
 		
 		# Determine exit code
-		success_count = sum(1 for success in results.values() if success)
 		if success_count == len(results) and len(results) > 0:
 			logger.info("All files converted successfully")
 			print("\nAll files have been successfully converted!")
@@ -13,6 +13,7 @@ Options:
 	--no-log-file       Disable file logging
 	--validate          Run validation after conversion
 	--stats             Output statistics after conversion completion
+	--workers N         Number of IFC parser processes (default: NEO4J_IMPORT_WORKERS or min(8, CPU count))
 
 Examples:
 	# Basic conversion
@@ -49,6 +50,7 @@ def parse_arguments():
 	parser.add_argument('--no-log-file', action='store_true', help='Disable file logging')
 	parser.add_argument('--validate', action='store_true', help='Run validation after conversion')
 	parser.add_argument('--stats', action='store_true', help='Output statistics after conversion completion')
+	parser.add_argument('--workers', type=int, default=None, help='Number of IFC parser processes (default: NEO4J_IMPORT_WORKERS or min(8, CPU count))')
 	
 	return parser.parse_args()
 
@@ -247,7 +249,7 @@ def main():
 		converter = IFCToGraphConverter(db)
 		
 		# Execute conversion
-		results = converter.convert_directory(input_dir)
+		results = converter.convert_directory(input_dir, workers=args.workers)
 		
 		# Collect statistics (optional)
 		stats = None
@@ -4,17 +4,140 @@ FalkorDB database connection and data processing module
 Contact: Taewook Kang (laputa99999@gmail.com)
 """
 import logging
-import json
-from typing import Dict, List, Any, Optional
+import os
+import re
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Set, Tuple
 from pathlib import Path
 from datetime import datetime
+import orjson
 from falkordb import FalkorDB
 
+# Rows per UNWIND query in bulk writes
+BATCH_SIZE = 5000
+
+# Queries queued per Redis pipeline in batch mode
+PIPELINE_DEPTH = 16
+
+# Labels are written into the query text (FalkorDB labels can't be parameters), so only identifiers are allowed
+_LABEL_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# (from key, to key) of each relationship type; keys ending in 's' hold lists of globalIds.
+# Also the allow-list of relationship types written into query text
+_PAIR_KEYS = {
+	'AGGREGATES': ('from_element', 'to_elements'),
+	'CONNECTS_TO': ('from_element', 'to_element'),
+	'HAS_PROPERTY': ('from_elements', 'to_property'),
+	'CONTAINED_IN': ('from_elements', 'to_structure'),
+	'ASSIGNED_TO': ('from_elements', 'to_group'),
+}
+
+
+# Optional attribute values left out of node properties; reading a missing property gives null
+_EMPTY_VALUES = (None, '', {}, [])
+
+# PropertySet values FalkorDB stores directly as node properties (maps can't be property values)
+_SCALARS = (str, int, float, bool)
+
+
+def _flat_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Flatten {pset: {property: value}} into scalar node properties keyed "<pset>__<property>"
+	
+	Non-scalar values are stored as their string form. Backticks are removed from keys
+	because the client's CYPHER parameter header can't escape them.
+	"""
+	flat = {}
+	for pset_name, pset in properties.items():
+		for prop_name, value in pset.items():
+			key = f"{pset_name}__{prop_name}".replace('`', '')
+			flat[key] = value if isinstance(value, _SCALARS) else str(value)
+	return flat
+
+
+def _chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+	"""Yield lists of up to size items from iterable"""
+	iterator = iter(iterable)
+	while True:
+		chunk = list(islice(iterator, size))
+		if not chunk:
+			return
+		yield chunk
+
+
+# Query texts. The label/type templates are formatted once per class/type (see the
+# lru_cached builders below), so repeated batches send identical query strings
+_Q_MERGE_FILE = """
+MERGE (f:IFCFile {fileId: $fileId})
+SET f.fileName = $fileName,
+	f.filePath = $filePath,
+	f.fileSize = $fileSize,
+	f.createdDate = $createdDate,
+	f.modifiedDate = $modifiedDate,
+	f.importDate = $importDate
+RETURN f.fileId
+"""
+
+# One query per IFC class: FalkorDB can't take labels from parameters (SET e:$label),
+# and the graph agent matches elements by their class label (MATCH (w:IfcWall))
+_ELEM_UPSERT_TMPL = """
+UNWIND $rows AS r
+MERGE (e:Element:{cls} {{globalId: r.globalId}})
+SET e += r.props
+"""
+
+# Links all elements of a file at once after they are written (by their sourceFileId)
+_Q_LINK_FILE = """
+MATCH (f:IFCFile {fileId: $fileId})
+MATCH (e:Element {sourceFileId: $fileId})
+MERGE (e)-[:BELONGS_TO_FILE]->(f)
+"""
+
+_REL_UPSERT_TMPL = """
+UNWIND $pairs AS p
+MATCH (a:Element {{globalId: p.f}})
+MATCH (b:Element {{globalId: p.t}})
+MERGE (a)-[r:{rtype}]->(b)
+SET r.globalId = p.rid
+"""
+
+# Statistics: node counts by IFC class (IFCFile nodes are counted under a null class) and
+# relationship counts by type; the totals are the sums of these distributions
+_Q_CLASS_COUNTS = """
+MATCH (n)
+RETURN n.ifcClass AS type, count(n) AS count
+ORDER BY count DESC
+"""
+
+_Q_REL_TYPE_COUNTS = """
+MATCH ()-[r]->()
+RETURN type(r) AS type, count(r) AS count
+"""
+
+
+@lru_cache(maxsize=None)
+def _element_query(ifc_class: str) -> str:
+	"""UNWIND query merging element nodes of one IFC class"""
+	return _ELEM_UPSERT_TMPL.format(cls=ifc_class)
+
+
+@lru_cache(maxsize=None)
+def _relationship_query(rel_type: str) -> str:
+	"""UNWIND query creating relationships of one type from $pairs"""
+	return _REL_UPSERT_TMPL.format(rtype=rel_type)
+
+
+def _iso_timestamp(timestamp: float) -> str:
+	"""File timestamp as ISO text (second precision)"""
+	return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+
 
 class FalkorDBDatabase:
 	"""FalkorDB database connection and data management class"""
 	
-	def __init__(self, host: str, port: int, username: str = None, password: str = None, graph_name: str = "bim"):
+	def __init__(self, host: str, port: int, username: str = None, password: str = None, graph_name: str = "bim",
+				 properties_json: bool = None, file_transactions: bool = None):
 		"""
 		Initialize FalkorDB database connection
 		
@@ -24,6 +147,10 @@ class FalkorDBDatabase:
 			username: Username (optional)
 			password: Password (optional)
 			graph_name: Graph name
+			properties_json: Also store PropertySets as a JSON string in 'properties', as read by
+				the graph agent (default: FALKORDB_PROPERTIES_JSON, on unless set to 0)
+			file_transactions: Send the batch of each file as one MULTI/EXEC transaction
+				(default: FALKORDB_FILE_TRANSACTIONS, off unless set to 1)
 		"""
 		self.logger = logging.getLogger(__name__)
 		self.host = host
@@ -31,8 +158,17 @@ class FalkorDBDatabase:
 		self.username = username
 		self.password = password
 		self.graph_name = graph_name
+		if properties_json is None:
+			properties_json = os.getenv('FALKORDB_PROPERTIES_JSON', '1') != '0'
+		self.properties_json = properties_json
+		if file_transactions is None:
+			file_transactions = os.getenv('FALKORDB_FILE_TRANSACTIONS', '0') == '1'
+		self.file_transactions = file_transactions
 		self.client = None
 		self.graph = None
+		# Queued (query, params) while batch mode is on (see batch_begin)
+		self._batch = None
+		self._batch_failed = 0
 		
 	def connect(self) -> bool:
 		"""
@@ -53,11 +189,32 @@ class FalkorDBDatabase:
 			# Connection test
 			self.graph.query("RETURN 1")
 			self.logger.info(f"FalkorDB connection successful: {self.host}:{self.port}/{self.graph_name}")
+			self.ensure_indexes()
 			return True
 		except Exception as e:
 			self.logger.error(f"FalkorDB connection failed: {e}")
 			return False
 	
+	def ensure_indexes(self):
+		"""
+		Create the indexes used by MERGE/MATCH lookups on globalId and fileId, by
+		class lookups on the ifcClass property and by the file link on sourceFileId
+		
+		Without them every lookup is a label scan. FalkorDB has no IF NOT EXISTS,
+		so "already indexed" errors on later runs are ignored.
+		"""
+		statements = [
+			"CREATE INDEX FOR (n:Element) ON (n.globalId)",
+			"CREATE INDEX FOR (n:Element) ON (n.ifcClass)",
+			"CREATE INDEX FOR (n:Element) ON (n.sourceFileId)",
+			"CREATE INDEX FOR (f:IFCFile) ON (f.fileId)",
+		]
+		for statement in statements:
+			try:
+				self.graph.query(statement)
+			except Exception as e:
+				self.logger.debug(f"Index not created: {statement}, {e}")
+	
 	def close(self):
 		"""Close database connection"""
 		if self.client:
@@ -69,23 +226,87 @@ class FalkorDBDatabase:
 		"""
 		Clear all data in the graph
 		
+		The graph key is dropped with GRAPH.DELETE instead of deleting node by node,
+		then the indexes are recreated. DETACH DELETE remains the fallback, e.g. when
+		the graph doesn't exist yet.
+		
 		Returns:
 			Success status
 		"""
 		try:
-			self.graph.query("MATCH (n) DETACH DELETE n")
+			try:
+				self.graph.delete()
+				self.graph = self.client.select_graph(self.graph_name)
+				self.ensure_indexes()
+			except Exception as e:
+				self.logger.debug(f"Graph delete failed, deleting nodes instead: {e}")
+				self.graph.query("MATCH (n) DETACH DELETE n")
 			self.logger.info("Database cleared successfully")
 			return True
 		except Exception as e:
 			self.logger.error(f"Database clear failed: {e}")
 			return False
 	
-	def create_file_node(self, file_path: Path) -> Optional[str]:
+	def batch_begin(self):
+		"""
+		Queue bulk write queries until batch_end instead of sending them one by one
+		
+		With file_transactions all queries up to batch_end are held and sent as one
+		MULTI/EXEC transaction, so the file appears in the graph at once; this keeps
+		the whole file's rows in memory instead of PIPELINE_DEPTH queries.
+		"""
+		self._batch = []
+		self._batch_failed = 0
+	
+	def batch_end(self) -> int:
+		"""
+		Send the remaining queued queries and leave batch mode
+		
+		Returns:
+			Number of failed queries since batch_begin
+		"""
+		self._flush_batch()
+		failed, self._batch = self._batch_failed, None
+		return failed
+	
+	def _flush_batch(self):
+		"""
+		Send the queued queries as one Redis pipeline (a MULTI/EXEC transaction with file_transactions)
+		
+		The queries run in queue order on one connection, so relationship queries
+		still see the element nodes queued before them.
+		"""
+		batch, self._batch = self._batch, []
+		if not batch:
+			return
+		
+		pipeline = self.client.connection.pipeline(transaction=self.file_transactions)
+		for query, params in batch:
+			# Same command as Graph.query: parameters go in a CYPHER header before the query
+			pipeline.execute_command('GRAPH.QUERY', self.graph_name, self.graph._build_params_header(params) + query, '--compact')
+		
+		for response in pipeline.execute(raise_on_error=False):
+			if isinstance(response, Exception):
+				self._batch_failed += 1
+				self.logger.error(f"Pipelined query failed: {response}")
+	
+	def _send(self, query: str, params: Dict[str, Any]):
+		"""Run a write query, or queue it while batch mode is on"""
+		if self._batch is not None:
+			self._batch.append((query, params))
+			# Streamed rows are only held for PIPELINE_DEPTH queries (all of them in a file transaction)
+			if len(self._batch) >= PIPELINE_DEPTH and not self.file_transactions:
+				self._flush_batch()
+		else:
+			self.graph.query(query, params)
+	
+	def create_file_node(self, file_path: Path, import_date: str = None) -> Optional[str]:
 		"""
 		Create IFC file metadata node
 		
 		Args:
 			file_path: Path to the IFC file
+			import_date: ISO import timestamp shared by all files of a run (default: now)
 			
 		Returns:
 			File ID if successful, None otherwise
@@ -99,33 +320,13 @@ class FalkorDBDatabase:
 				'fileName': file_path.name,
 				'filePath': str(file_path.absolute()),
 				'fileSize': stat.st_size,
-				'createdDate': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-				'modifiedDate': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-				'importDate': datetime.now().isoformat()
-			}
-			
-			query = """
-			MERGE (f:IFCFile {fileId: $fileId})
-			SET f.fileName = $fileName,
-				f.filePath = $filePath,
-				f.fileSize = $fileSize,
-				f.createdDate = $createdDate,
-				f.modifiedDate = $modifiedDate,
-				f.importDate = $importDate
-			RETURN f.fileId
-			"""
-			
-			params = {
-				'fileId': file_id,
-				'fileName': file_data['fileName'],
-				'filePath': file_data['filePath'],
-				'fileSize': file_data['fileSize'],
-				'createdDate': file_data['createdDate'],
-				'modifiedDate': file_data['modifiedDate'],
-				'importDate': file_data['importDate']
+				'createdDate': _iso_timestamp(stat.st_ctime),
+				'modifiedDate': _iso_timestamp(stat.st_mtime),
+				'importDate': import_date or datetime.now().isoformat(timespec='seconds')
 			}
 			
-			result = self.graph.query(query, params)
+			# file_data keys are the query parameters
+			result = self.graph.query(_Q_MERGE_FILE, file_data)
 			
 			if result.result_set:
 				self.logger.debug(f"File node created/updated: {file_id}")
@@ -149,269 +350,202 @@ class FalkorDBDatabase:
 		Returns:
 			Creation success status
 		"""
-		try:
-			global_id = element_data['globalId']
-			ifc_class = element_data['ifcClass']
-			
-			# Prepare properties
-			properties = {
-				'globalId': global_id,
-				'name': element_data.get('name', ''),
-				'ifcClass': ifc_class,
-				'description': element_data.get('description', ''),
-				'objectType': element_data.get('objectType', ''),
-				'tag': element_data.get('tag', '')
-			}
-			
-			if file_id:
-				properties['sourceFileId'] = file_id
-			
-			# Store properties as JSON string
-			if element_data.get('properties'):
-				properties['properties'] = json.dumps(element_data['properties'])
-			
-			# Build query with multiple labels
-			query = f"""
-			MERGE (e:Element:{ifc_class} {{globalId: $globalId}})
-			SET e.name = $name,
-				e.ifcClass = $ifcClass,
-				e.description = $description,
-				e.objectType = $objectType,
-				e.tag = $tag
-			"""
+		return self.create_element_nodes([element_data], file_id) == 1
+	
+	def create_element_nodes(self, elements: List[Dict[str, Any]], file_id: str = None) -> int:
+		"""
+		Create IFC elements (IFCParser.extract_elements dictionaries) as nodes linked to their file
+		
+		Args:
+			elements: Element data dictionaries
+			file_id: Associated file ID
 			
-			params = {
-				'globalId': properties['globalId'],
-				'name': properties['name'],
-				'ifcClass': properties['ifcClass'],
-				'description': properties['description'],
-				'objectType': properties['objectType'],
-				'tag': properties['tag']
+		Returns:
+			Number of elements written (queued in batch mode)
+		"""
+		success_count = self.create_element_rows([
+			{
+				'globalId': element_data['globalId'],
+				'props': {
+					'name': element_data.get('name', ''),
+					'ifcClass': element_data['ifcClass'],
+					'description': element_data.get('description', ''),
+					'objectType': element_data.get('objectType', ''),
+					'tag': element_data.get('tag', ''),
+					'properties': element_data.get('properties')
+				}
 			}
+			for element_data in elements
+		], file_id)
+		if file_id and success_count:
+			self.link_file_elements(file_id)
+		return success_count
+	
+	def create_element_rows(self, rows: Iterable[Dict[str, Any]], file_id: str = None, written_ids: Set[str] = None) -> int:
+		"""
+		Create IFC elements as nodes, BATCH_SIZE rows at a time with one UNWIND query per IFC class
+		
+		Rows are sent as they are; only their props are completed in place
+		(file reference, flattened PropertySets). Only one chunk of rows is held
+		in memory, so rows can be streamed from IFCParser.iter_element_rows.
+		The BELONGS_TO_FILE links are created afterwards with link_file_elements.
+		
+		Args:
+			rows: {'globalId', 'props'} rows from IFCParser.extract_element_rows / iter_element_rows
+			file_id: Associated file ID
+			written_ids: Set collecting the globalIds of the written elements (optional)
 			
-			if file_id:
-				query += ", e.sourceFileId = $sourceFileId"
-				params['sourceFileId'] = file_id
-			
-			if 'properties' in properties:
-				query += ", e.properties = $properties"
-				params['properties'] = properties['properties']
-			
-			# Create relationship to file if file_id is provided
-			if file_id:
-				query += """
-				WITH e
-				MATCH (f:IFCFile {fileId: $fileId})
-				MERGE (e)-[:BELONGS_TO_FILE]->(f)
-				"""
-				params['fileId'] = file_id
-			
-			query += " RETURN e.globalId"
-			
-			result = self.graph.query(query, params)
-			
-			if result.result_set:
-				self.logger.debug(f"Node created/updated: {global_id}")
-				return True
-			else:
-				self.logger.warning(f"Node creation returned no result: {global_id}")
-				return False
-				
-		except Exception as e:
-			self.logger.error(f"Node creation failed: {element_data.get('globalId', 'Unknown')}, error: {e}")
-			return False
+		Returns:
+			Number of elements written (queued in batch mode)
+		"""
+		success_count = 0
+		for chunk in _chunked(rows, BATCH_SIZE):
+			for ifc_class, class_rows in self._prepare_rows(chunk, file_id).items():
+				try:
+					self._send(_element_query(ifc_class), {'rows': class_rows})
+					success_count += len(class_rows)
+					if written_ids is not None:
+						written_ids.update(row['globalId'] for row in class_rows)
+				except Exception as e:
+					self.logger.error(f"Node batch creation failed: {ifc_class} ({len(class_rows)} elements), error: {e}")
+		
+		return success_count
 	
-	def create_relationship(self, rel_data: Dict[str, Any]) -> bool:
+	def link_file_elements(self, file_id: str) -> bool:
 		"""
-		Create IFC relationship
+		Link all elements with sourceFileId file_id to their IFCFile node in one query
 		
 		Args:
-			rel_data: Relationship data dictionary
+			file_id: File ID
 			
 		Returns:
-			Creation success status
+			Success status (queued in batch mode)
 		"""
 		try:
-			rel_type = rel_data['type']
-			
-			# Different processing by relationship type
-			if rel_type == 'AGGREGATES':
-				return self._create_aggregates_relationship(rel_data)
-			elif rel_type == 'CONNECTS_TO':
-				return self._create_connects_relationship(rel_data)
-			elif rel_type == 'HAS_PROPERTY':
-				return self._create_property_relationship(rel_data)
-			elif rel_type == 'CONTAINED_IN':
-				return self._create_spatial_relationship(rel_data)
-			elif rel_type == 'ASSIGNED_TO':
-				return self._create_group_relationship(rel_data)
-			
-			return False
-			
+			self._send(_Q_LINK_FILE, {'fileId': file_id})
+			return True
 		except Exception as e:
-			self.logger.error(f"Relationship creation failed: {rel_data.get('type', 'Unknown')}, error: {e}")
+			self.logger.error(f"File relationship creation failed: {file_id}, error: {e}")
 			return False
 	
-	def _create_aggregates_relationship(self, rel_data: Dict[str, Any]) -> bool:
-		"""Create aggregation relationship"""
-		from_id = rel_data['from_element']
-		to_ids = rel_data['to_elements']
+	def _prepare_rows(self, chunk: List[Dict[str, Any]], file_id: str = None) -> Dict[str, List[Dict[str, Any]]]:
+		"""
+		Complete the props of one chunk of rows in place and group the rows by IFC class
 		
-		if not from_id or not to_ids:
-			return False
+		Empty attributes (e.g. no Name or Tag) are dropped from props, so SET e += r.props
+		doesn't store them; they read as null instead of ''. Values stored by an earlier
+		import of the same element are kept.
 		
-		success_count = 0
-		for to_id in to_ids:
-			try:
-				query = """
-				MATCH (from:Element {globalId: $from_id})
-				MATCH (to:Element {globalId: $to_id})
-				MERGE (from)-[r:AGGREGATES]->(to)
-				SET r.globalId = $rel_id
-				RETURN r
-				"""
-				
-				params = {
-					'from_id': from_id,
-					'to_id': to_id,
-					'rel_id': rel_data['globalId']
-				}
-				
-				result = self.graph.query(query, params)
-				if result.result_set:
-					success_count += 1
-			except Exception as e:
-				self.logger.warning(f"Aggregation relationship creation failed: {from_id} -> {to_id}, error: {e}")
+		Args:
+			chunk: {'globalId', 'props'} rows
+			file_id: Associated file ID
+			
+		Returns:
+			Rows by IFC class (the second node label); classes that are no valid label are left out
+		"""
+		buckets = {}
+		for row in chunk:
+			row['props'] = props = {key: value for key, value in row['props'].items() if value not in _EMPTY_VALUES}
+			if file_id:
+				props['sourceFileId'] = file_id
+			psets = props.pop('properties', None)
+			if psets:
+				# PropertySet values as native scalar properties; the JSON copy is optional
+				props.update(_flat_properties(psets))
+				if self.properties_json:
+					props['properties'] = orjson.dumps(psets, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+			buckets.setdefault(props['ifcClass'], []).append(row)
 		
-		return success_count > 0
+		for ifc_class in [ifc_class for ifc_class in buckets if not _LABEL_PATTERN.match(ifc_class)]:
+			self.logger.warning(f"Invalid IFC class label skipped: {ifc_class!r} ({len(buckets.pop(ifc_class))} elements)")
+		return buckets
 	
-	def _create_connects_relationship(self, rel_data: Dict[str, Any]) -> bool:
-		"""Create connection relationship"""
-		from_id = rel_data['from_element']
-		to_id = rel_data['to_element']
+	def create_relationships(self, relationships: Iterable[Dict[str, Any]], known_ids: Set[str] = None) -> int:
+		"""
+		Create IFC relationships with one UNWIND query per relationship type and BATCH_SIZE pairs
 		
-		if not from_id or not to_id:
-			return False
+		Pairs are sent whenever a type has collected BATCH_SIZE of them, so
+		relationships can be streamed from IFCParser.iter_relationships.
 		
-		try:
-			query = """
-			MATCH (from:Element {globalId: $from_id})
-			MATCH (to:Element {globalId: $to_id})
-			MERGE (from)-[r:CONNECTS_TO]->(to)
-			SET r.globalId = $rel_id
-			RETURN r
-			"""
-			
-			params = {
-				'from_id': from_id,
-				'to_id': to_id,
-				'rel_id': rel_data['globalId']
-			}
+		Args:
+			relationships: Relationship data dictionaries
+			known_ids: globalIds of the element nodes in the graph (e.g. written_ids of
+				create_element_rows); pairs with another endpoint are dropped before sending
+				instead of failing their MATCH on the server
 			
-			result = self.graph.query(query, params)
-			return result.result_set is not None
-		except Exception as e:
-			self.logger.error(f"Connection relationship creation failed: {e}")
-			return False
+		Returns:
+			Number of (from, to) pairs written (queued in batch mode)
+		"""
+		return sum(self._send_pairs(rel_type, pairs) for rel_type, pairs in self._pair_batches(relationships, known_ids))
 	
-	def _create_property_relationship(self, rel_data: Dict[str, Any]) -> bool:
-		"""Create property definition relationship"""
-		from_ids = rel_data['from_elements']
-		to_id = rel_data['to_property']
+	def _pair_batches(self, relationships: Iterable[Dict[str, Any]], known_ids: Set[str] = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+		"""
+		Flatten 1-to-N relationships into {f, t, rid} pairs and yield them by type, up to BATCH_SIZE at a time
 		
-		if not from_ids or not to_id:
-			return False
+		Args:
+			relationships: Relationship data dictionaries
+			known_ids: globalIds of the element nodes in the graph; pairs with another endpoint are dropped
+			
+		Yields:
+			(relationship type, pairs) batches
+		"""
+		buckets = {}
+		dropped_count = 0
+		for rel_data in relationships:
+			rel_type = rel_data.get('type')
+			if rel_type not in _PAIR_KEYS:
+				continue
+			from_key, to_key = _PAIR_KEYS[rel_type]
+			from_ids = rel_data[from_key]
+			to_ids = rel_data[to_key]
+			if not from_ids or not to_ids:
+				continue
+			if not from_key.endswith('s'):
+				from_ids = [from_ids]
+			if not to_key.endswith('s'):
+				to_ids = [to_ids]
+			if known_ids is not None:
+				pair_total = len(from_ids) * len(to_ids)
+				from_ids = [from_id for from_id in from_ids if from_id in known_ids]
+				to_ids = [to_id for to_id in to_ids if to_id in known_ids]
+				dropped_count += pair_total - len(from_ids) * len(to_ids)
+			pairs = buckets.setdefault(rel_type, [])
+			for from_id in from_ids:
+				for to_id in to_ids:
+					pairs.append({'f': from_id, 't': to_id, 'rid': rel_data['globalId']})
+			if len(pairs) >= BATCH_SIZE:
+				yield rel_type, pairs
+				buckets[rel_type] = []
 		
-		success_count = 0
-		for from_id in from_ids:
-			try:
-				query = """
-				MATCH (from:Element {globalId: $from_id})
-				MATCH (to:Element {globalId: $to_id})
-				MERGE (from)-[r:HAS_PROPERTY]->(to)
-				SET r.globalId = $rel_id
-				RETURN r
-				"""
-				
-				params = {
-					'from_id': from_id,
-					'to_id': to_id,
-					'rel_id': rel_data['globalId']
-				}
-				
-				result = self.graph.query(query, params)
-				if result.result_set:
-					success_count += 1
-			except Exception as e:
-				self.logger.warning(f"Property relationship creation failed: {from_id} -> {to_id}, error: {e}")
+		for rel_type, pairs in buckets.items():
+			if pairs:
+				yield rel_type, pairs
 		
-		return success_count > 0
+		if dropped_count:
+			self.logger.info(f"Relationship pairs with unknown endpoints skipped: {dropped_count}")
 	
-	def _create_spatial_relationship(self, rel_data: Dict[str, Any]) -> bool:
-		"""Create spatial containment relationship"""
-		from_ids = rel_data['from_elements']
-		to_id = rel_data['to_structure']
-		
-		if not from_ids or not to_id:
-			return False
-		
-		success_count = 0
-		for from_id in from_ids:
-			try:
-				query = """
-				MATCH (from:Element {globalId: $from_id})
-				MATCH (to:Element {globalId: $to_id})
-				MERGE (from)-[r:CONTAINED_IN]->(to)
-				SET r.globalId = $rel_id
-				RETURN r
-				"""
-				
-				params = {
-					'from_id': from_id,
-					'to_id': to_id,
-					'rel_id': rel_data['globalId']
-				}
-				
-				result = self.graph.query(query, params)
-				if result.result_set:
-					success_count += 1
-			except Exception as e:
-				self.logger.warning(f"Spatial relationship creation failed: {from_id} -> {to_id}, error: {e}")
-		
-		return success_count > 0
+	def _send_pairs(self, rel_type: str, pairs: List[Dict[str, Any]]) -> int:
+		"""Write one batch of relationship pairs, returns the number of pairs sent"""
+		try:
+			self._send(_relationship_query(rel_type), {'pairs': pairs})
+			return len(pairs)
+		except Exception as e:
+			self.logger.error(f"Relationship batch creation failed: {rel_type} ({len(pairs)} pairs), error: {e}")
+			return 0
 	
-	def _create_group_relationship(self, rel_data: Dict[str, Any]) -> bool:
-		"""Create group assignment relationship"""
-		from_ids = rel_data['from_elements']
-		to_id = rel_data['to_group']
-		
-		if not from_ids or not to_id:
-			return False
+	def create_relationship(self, rel_data: Dict[str, Any]) -> bool:
+		"""
+		Create IFC relationship
 		
-		success_count = 0
-		for from_id in from_ids:
-			try:
-				query = """
-				MATCH (from:Element {globalId: $from_id})
-				MATCH (to:Element {globalId: $to_id})
-				MERGE (from)-[r:ASSIGNED_TO]->(to)
-				SET r.globalId = $rel_id
-				RETURN r
-				"""
-				
-				params = {
-					'from_id': from_id,
-					'to_id': to_id,
-					'rel_id': rel_data['globalId']
-				}
-				
-				result = self.graph.query(query, params)
-				if result.result_set:
-					success_count += 1
-			except Exception as e:
-				self.logger.warning(f"Group relationship creation failed: {from_id} -> {to_id}, error: {e}")
+		All relationship types go through create_relationships, driven by _PAIR_KEYS.
 		
-		return success_count > 0
+		Args:
+			rel_data: Relationship data dictionary
+			
+		Returns:
+			Creation success status
+		"""
+		return self.create_relationships([rel_data]) > 0
 	
 	def get_statistics(self) -> Dict[str, Any]:
 		"""
@@ -423,37 +557,16 @@ class FalkorDBDatabase:
 		try:
 			stats = {}
 			
-			# Total node count
-			result = self.graph.query("MATCH (n) RETURN count(n) as count")
-			stats['total_nodes'] = result.result_set[0][0] if result.result_set else 0
-			
-			# Total relationship count
-			result = self.graph.query("MATCH ()-[r]->() RETURN count(r) as count")
-			stats['total_relationships'] = result.result_set[0][0] if result.result_set else 0
-			
-			# Element type distribution
-			result = self.graph.query("""
-				MATCH (n:Element)
-				RETURN n.ifcClass as type, count(n) as count
-				ORDER BY count DESC
-			""")
-			
-			element_types = {}
-			if result.result_set:
-				for row in result.result_set:
-					element_types[row[0]] = row[1]
+			# Node counts by IFC class; the rows are (type, count) pairs
+			element_types = dict(self.graph.query(_Q_CLASS_COUNTS).result_set or [])
+			stats['total_nodes'] = sum(element_types.values())
+			# Non-element nodes (IFCFile) have no ifcClass
+			element_types.pop(None, None)
 			stats['element_types'] = element_types
 			
 			# Relationship type distribution
-			result = self.graph.query("""
-				MATCH ()-[r]->()
-				RETURN type(r) as type, count(r) as count
-			""")
-			
-			relationship_types = {}
-			if result.result_set:
-				for row in result.result_set:
-					relationship_types[row[0]] = row[1]
+			relationship_types = dict(self.graph.query(_Q_REL_TYPE_COUNTS).result_set or [])
+			stats['total_relationships'] = sum(relationship_types.values())
 			stats['relationship_types'] = relationship_types
 			
 			return stats
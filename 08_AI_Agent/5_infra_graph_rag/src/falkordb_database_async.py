@@ -0,0 +1,141 @@
+"""
+Asynchronous FalkorDB bulk write module
+
+Contact: Taewook Kang (laputa99999@gmail.com)
+"""
+import asyncio
+import os
+from typing import Dict, Any, Iterable, Set
+from falkordb.asyncio import FalkorDB as AsyncFalkorDB
+from .falkordb_database import FalkorDBDatabase, BATCH_SIZE, _Q_LINK_FILE, _chunked, _element_query, _relationship_query
+
+# Write queries in flight at once
+WRITE_CONCURRENCY = 8
+
+
+class AsyncFalkorDBDatabase(FalkorDBDatabase):
+	"""
+	FalkorDBDatabase whose bulk writes are sent concurrently over an asyncio connection pool
+	
+	FalkorDB runs the write queries of a graph one at a time, so this adds no server
+	parallelism; it overlaps client serialization and round-trips with query execution,
+	which pays off for files with many small per-class batches. The other methods
+	(file node, statistics, ...) are the synchronous ones of FalkorDBDatabase.
+	"""
+	
+	def __init__(self, *args, write_concurrency: int = None, **kwargs):
+		"""
+		Initialize FalkorDB database connection
+		
+		Args:
+			write_concurrency: Write queries in flight at once (default: FALKORDB_WRITE_CONCURRENCY or WRITE_CONCURRENCY)
+			Other arguments as FalkorDBDatabase
+		"""
+		super().__init__(*args, **kwargs)
+		self.write_concurrency = write_concurrency or int(os.getenv('FALKORDB_WRITE_CONCURRENCY', WRITE_CONCURRENCY))
+		self.async_client = None
+		self.async_graph = None
+		self._semaphore = None
+	
+	async def connect_async(self) -> bool:
+		"""
+		Open the async connection pool (bound to the running event loop)
+		
+		Returns:
+			Connection success status
+		"""
+		try:
+			self.async_client = AsyncFalkorDB(
+				host=self.host,
+				port=self.port,
+				username=self.username,
+				password=self.password,
+				max_connections=self.write_concurrency
+			)
+			self.async_graph = self.async_client.select_graph(self.graph_name)
+			# The pool raises instead of waiting when all connections are busy
+			self._semaphore = asyncio.Semaphore(self.write_concurrency)
+			await self.async_graph.query("RETURN 1")
+			self.logger.info(f"FalkorDB async connection successful: {self.write_concurrency} concurrent writes")
+			return True
+		except Exception as e:
+			self.logger.error(f"FalkorDB async connection failed: {e}")
+			return False
+	
+	async def close_async(self):
+		"""Close the async connection pool"""
+		if self.async_client:
+			await self.async_client.aclose()
+			self.async_client = None
+			self.async_graph = None
+	
+	async def _query(self, query: str, params: Dict[str, Any], description: str) -> bool:
+		"""Run one write query once a connection is free, returns the success status"""
+		async with self._semaphore:
+			try:
+				await self.async_graph.query(query, params)
+				return True
+			except Exception as e:
+				self.logger.error(f"Batch creation failed: {description}, error: {e}")
+				return False
+	
+	async def create_element_rows_async(self, rows: Iterable[Dict[str, Any]], file_id: str = None, written_ids: Set[str] = None) -> int:
+		"""
+		Create IFC elements as nodes like create_element_rows, sending the per-class queries of each chunk concurrently
+		
+		Args:
+			rows: {'globalId', 'props'} rows from IFCParser.extract_element_rows / iter_element_rows
+			file_id: Associated file ID
+			written_ids: Set collecting the globalIds of the written elements (optional)
+			
+		Returns:
+			Number of elements written
+		"""
+		success_count = 0
+		for chunk in _chunked(rows, BATCH_SIZE):
+			buckets = self._prepare_rows(chunk, file_id)
+			sent = await asyncio.gather(*[
+				self._query(_element_query(ifc_class), {'rows': class_rows}, f"{ifc_class} ({len(class_rows)} elements)")
+				for ifc_class, class_rows in buckets.items()
+			])
+			for class_rows, success in zip(buckets.values(), sent):
+				if success:
+					success_count += len(class_rows)
+					if written_ids is not None:
+						written_ids.update(row['globalId'] for row in class_rows)
+		
+		return success_count
+	
+	async def link_file_elements_async(self, file_id: str) -> bool:
+		"""Async link_file_elements, run once all elements of the file are written"""
+		return await self._query(_Q_LINK_FILE, {'fileId': file_id}, f"BELONGS_TO_FILE ({file_id})")
+	
+	async def create_relationships_async(self, relationships: Iterable[Dict[str, Any]], known_ids: Set[str] = None) -> int:
+		"""
+		Create IFC relationships like create_relationships, with up to write_concurrency batches in flight
+		
+		Must run after the element nodes were written, as the queries MATCH them.
+		
+		Args:
+			relationships: Relationship data dictionaries
+			known_ids: globalIds of the element nodes in the graph; pairs with another endpoint are dropped
+			
+		Returns:
+			Number of (from, to) pairs written
+		"""
+		async def send_pairs(rel_type, pairs):
+			success = await self._query(_relationship_query(rel_type), {'pairs': pairs}, f"{rel_type} ({len(pairs)} pairs)")
+			return len(pairs) if success else 0
+		
+		success_count = 0
+		pending = set()
+		for rel_type, pairs in self._pair_batches(relationships, known_ids):
+			# Only hold write_concurrency batches while relationships are streamed
+			if len(pending) >= self.write_concurrency:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				success_count += sum(task.result() for task in done)
+			pending.add(asyncio.ensure_future(send_pairs(rel_type, pairs)))
+		
+		if pending:
+			success_count += sum(await asyncio.gather(*pending))
+		return success_count
@@ -3,13 +3,53 @@ IFC to FalkorDB graph conversion logic implementation
 
 Contact: Taewook Kang (laputa99999@gmail.com)
 """
+import asyncio
 import logging
-from typing import Dict, List, Any
+import os
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from .ifc_parser import IFCParser
 from .falkordb_database import FalkorDBDatabase
 
 
+def parse_file_to_payload(ifc_file_path: Path, stream: bool = False) -> Dict[str, Any]:
+	"""
+	Parse one IFC file into picklable element rows and relationship lists (runs in worker processes)
+	
+	Args:
+		ifc_file_path: IFC file path
+		stream: Return generators instead of lists, so rows are extracted while they are
+			written (not picklable, for conversion in the same process)
+		
+	Errors are logged here, so the future's result() doesn't raise for a bad file.
+	
+	Returns:
+		{'file_path', 'elements', 'relationships'}; elements is None if parsing failed
+	"""
+	parser = IFCParser()
+	try:
+		ifc_file = parser.parse_file(ifc_file_path)
+		if not ifc_file:
+			return {'file_path': ifc_file_path, 'elements': None, 'relationships': []}
+		if stream:
+			return {
+				'file_path': ifc_file_path,
+				'elements': parser.iter_element_rows(ifc_file),
+				'relationships': parser.iter_relationships(ifc_file)
+			}
+		return {
+			'file_path': ifc_file_path,
+			'elements': parser.extract_element_rows(ifc_file),
+			'relationships': parser.extract_relationships(ifc_file)
+		}
+	except Exception as e:
+		parser.logger.error(f"Error processing file: {ifc_file_path.name}, error: {e}")
+		return {'file_path': ifc_file_path, 'elements': None, 'relationships': []}
+
+
 class IFCToFalkorDBConverter:
 	"""Main class for converting IFC data to FalkorDB graph"""
 	
@@ -23,6 +63,8 @@ class IFCToFalkorDBConverter:
 		self.logger = logging.getLogger(__name__)
 		self.parser = IFCParser()
 		self.db = db
+		# One import timestamp for all files converted by this converter
+		self._import_date = datetime.now().isoformat(timespec='seconds')
 		
 	def convert_file(self, ifc_file_path: Path) -> bool:
 		"""
@@ -34,61 +76,122 @@ class IFCToFalkorDBConverter:
 		Returns:
 			Conversion success status
 		"""
-		try:
-			self.logger.info(f"Starting IFC file conversion: {ifc_file_path}")
+		self.logger.info(f"Starting IFC file conversion: {ifc_file_path}")
+		return self.write_payload(parse_file_to_payload(ifc_file_path, stream=True))
+	
+	def write_payload(self, payload: Dict[str, Any]) -> bool:
+		"""
+		Write the parsed elements and relationships of one IFC file to FalkorDB
+		
+		Args:
+			payload: Result of parse_file_to_payload (lists or streamed generators)
 			
-			# 1. Create file metadata node first
-			file_id = self.db.create_file_node(ifc_file_path)
-			if not file_id:
-				self.logger.error(f"File metadata creation failed: {ifc_file_path}")
+		Returns:
+			Conversion success status
+		"""
+		ifc_file_path = payload['file_path']
+		try:
+			started = self._start_payload(payload)
+			if not started:
 				return False
+			file_id, elements, relationships = started
 			
-			# 2. Parse IFC file
-			ifc_file = self.parser.parse_file(ifc_file_path)
-			if not ifc_file:
-				self.logger.error(f"IFC file parsing failed: {ifc_file_path}")
-				return False
+			# 2-3. Element nodes and relationships are queued and sent in pipelines, chunk by chunk
+			self.db.batch_begin()
+			try:
+				# One UNWIND query per IFC class and chunk
+				element_ids = set()
+				element_success_count = self.db.create_element_rows(elements, file_id, element_ids)
+				# One query linking all elements of the file to its node
+				self.db.link_file_elements(file_id)
+				# One UNWIND query per relationship type and chunk, only between elements of this file
+				pair_count = self.db.create_relationships(relationships, element_ids)
+			finally:
+				failed_count = self.db.batch_end()
 			
-			# 3. Extract and convert elements
-			elements = self.parser.extract_elements(ifc_file)
-			if not elements:
-				self.logger.warning(f"No elements extracted: {ifc_file_path}")
+			self._log_written(ifc_file_path, element_success_count, pair_count, failed_count)
+			return True
+			
+		except Exception as e:
+			self.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
+			return False
+	
+	async def write_payload_async(self, payload: Dict[str, Any]) -> bool:
+		"""
+		Write one parsed IFC file like write_payload, with concurrent batches (needs AsyncFalkorDBDatabase)
+		
+		Args:
+			payload: Result of parse_file_to_payload (lists or streamed generators)
+			
+		Returns:
+			Conversion success status
+		"""
+		ifc_file_path = payload['file_path']
+		try:
+			started = self._start_payload(payload)
+			if not started:
 				return False
+			file_id, elements, relationships = started
 			
-			# 4. Convert elements to nodes with file reference
-			element_success_count = 0
-			for element in elements:
-				if self.db.create_element_node(element, file_id):
-					element_success_count += 1
-					
-			self.logger.info(f"Element nodes creation completed: {element_success_count}/{len(elements)}")
-			
-			# 5. Extract and convert relationships
-			relationships = self.parser.extract_relationships(ifc_file)
-			if relationships:
-				relationship_success_count = 0
-				for relationship in relationships:
-					if self.db.create_relationship(relationship):
-						relationship_success_count += 1
-						
-				self.logger.info(f"Relationships creation completed: {relationship_success_count}/{len(relationships)}")
-			else:
-				self.logger.info("No relationships extracted.")
+			# Relationships MATCH the element nodes, so they are sent once all elements are written
+			element_ids = set()
+			element_success_count = await self.db.create_element_rows_async(elements, file_id, element_ids)
+			await self.db.link_file_elements_async(file_id)
+			pair_count = await self.db.create_relationships_async(relationships, element_ids)
 			
-			self.logger.info(f"IFC file conversion completed: {ifc_file_path}")
+			# Failed batches were logged one by one
+			self._log_written(ifc_file_path, element_success_count, pair_count, 0)
 			return True
 			
 		except Exception as e:
 			self.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
 			return False
 	
-	def convert_directory(self, input_directory: Path, file_pattern: str = "*.ifc") -> Dict[str, bool]:
+	def _start_payload(self, payload: Dict[str, Any]) -> Optional[Tuple[str, Any, Any]]:
+		"""
+		Check a parsed payload and create its file metadata node
+		
+		Returns:
+			(file ID, elements, relationships), or None if there is nothing to write
+		"""
+		ifc_file_path = payload['file_path']
+		elements = payload['elements']
+		if elements is None:
+			self.logger.error(f"IFC file parsing failed: {ifc_file_path}")
+			return None
+		elements = iter(elements)
+		first_element = next(elements, None)
+		if first_element is None:
+			self.logger.warning(f"No elements extracted: {ifc_file_path}")
+			return None
+		
+		# 1. Create file metadata node
+		file_id = self.db.create_file_node(ifc_file_path, self._import_date)
+		if not file_id:
+			self.logger.error(f"File metadata creation failed: {ifc_file_path}")
+			return None
+		return file_id, chain((first_element,), elements), payload['relationships']
+	
+	def _log_written(self, ifc_file_path: Path, element_count: int, pair_count: int, failed_count: int):
+		"""Log the write result of one IFC file as one summary line"""
+		if failed_count:
+			self.logger.error(f"{failed_count} batch queries failed: {ifc_file_path}")
+		self.logger.info(f"IFC file conversion completed: {ifc_file_path} "
+						 f"({element_count} elements, {pair_count} relationship links)")
+	
+	def convert_directory(self, input_directory: Path, file_pattern: str = "*.ifc", workers: int = None,
+						  files: List[Path] = None) -> Dict[str, bool]:
 		"""
 		Convert all IFC files in directory
 		
+		Files are parsed in parallel worker processes; the parsed payloads are written
+		to FalkorDB one at a time from this process.
+		
 		Args:
 			input_directory: Input directory path
 			file_pattern: File pattern (default: "*.ifc")
+			workers: Number of parser processes (default: CPU count, 1 parses in this process)
+			files: Already collected IFC files (default: glob input_directory with file_pattern)
 			
 		Returns:
 			Dictionary of conversion results by file
@@ -96,25 +199,87 @@ class IFCToFalkorDBConverter:
 		results = {}
 		
 		try:
-			# Search for IFC files
-			ifc_files = list(input_directory.glob(file_pattern))
-			
+			ifc_files = self._collect_files(input_directory, file_pattern, files)
 			if not ifc_files:
-				self.logger.warning(f"No IFC files found: {input_directory}")
 				return results
 			
-			self.logger.info(f"Found {len(ifc_files)} IFC files")
+			workers = min(workers or os.cpu_count() or 1, len(ifc_files))
+			if workers > 1:
+				with ProcessPoolExecutor(max_workers=workers) as executor:
+					futures = {executor.submit(parse_file_to_payload, ifc_file): ifc_file for ifc_file in ifc_files}
+					for future in as_completed(futures):
+						ifc_file = futures[future]
+						try:
+							payload = future.result()
+						except Exception as e:
+							# Worker died (e.g. BrokenProcessPool after an out-of-memory kill): only this file fails
+							self.logger.error(f"IFC file parsing failed: {ifc_file}, error: {e}")
+							self._record_result(results, False, ifc_file)
+							continue
+						self.logger.info(f"Processing file: {ifc_file.name}")
+						self._record_result(results, self.write_payload(payload), ifc_file)
+			else:
+				for ifc_file in ifc_files:
+					self.logger.info(f"Processing file: {ifc_file.name}")
+					self._record_result(results, self.convert_file(ifc_file), ifc_file)
+			
+			return results
+			
+		except Exception as e:
+			self.logger.error(f"Error during directory conversion: {e}")
+			return results
+	
+	async def convert_directory_async(self, input_directory: Path, file_pattern: str = "*.ifc", workers: int = None,
+									  files: List[Path] = None) -> Dict[str, bool]:
+		"""
+		Convert all IFC files in directory like convert_directory, writing with concurrent batches
+		
+		Needs an AsyncFalkorDBDatabase; run with asyncio.run(converter.convert_directory_async(...)).
+		With worker processes the next files are parsed while a file is written.
+		
+		Args:
+			input_directory: Input directory path
+			file_pattern: File pattern (default: "*.ifc")
+			workers: Number of parser processes (default: CPU count, 1 parses in this process)
+			files: Already collected IFC files (default: glob input_directory with file_pattern)
 			
-			# Convert each file
-			for ifc_file in ifc_files:
-				self.logger.info(f"Processing file: {ifc_file.name}")
-				success = self.convert_file(ifc_file)
-				results[str(ifc_file)] = success
-				
-				if success:
-					self.logger.info(f"File conversion successful: {ifc_file.name}")
+		Returns:
+			Dictionary of conversion results by file
+		"""
+		results = {}
+		
+		try:
+			ifc_files = self._collect_files(input_directory, file_pattern, files)
+			if not ifc_files or not await self.db.connect_async():
+				return results
+			
+			try:
+				workers = min(workers or os.cpu_count() or 1, len(ifc_files))
+				if workers > 1:
+					loop = asyncio.get_running_loop()
+					with ProcessPoolExecutor(max_workers=workers) as executor:
+						async def parse(ifc_file):
+							try:
+								return ifc_file, await loop.run_in_executor(executor, parse_file_to_payload, ifc_file)
+							except Exception as e:
+								# Worker died (e.g. BrokenProcessPool): only this file fails
+								self.logger.error(f"IFC file parsing failed: {ifc_file}, error: {e}")
+								return ifc_file, None
+						
+						for parsed in asyncio.as_completed([parse(ifc_file) for ifc_file in ifc_files]):
+							ifc_file, payload = await parsed
+							if payload is None:
+								self._record_result(results, False, ifc_file)
+								continue
+							self.logger.info(f"Processing file: {ifc_file.name}")
+							self._record_result(results, await self.write_payload_async(payload), ifc_file)
 				else:
-					self.logger.error(f"File conversion failed: {ifc_file.name}")
+					for ifc_file in ifc_files:
+						self.logger.info(f"Processing file: {ifc_file.name}")
+						payload = parse_file_to_payload(ifc_file, stream=True)
+						self._record_result(results, await self.write_payload_async(payload), ifc_file)
+			finally:
+				await self.db.close_async()
 			
 			return results
 			
@@ -122,6 +287,23 @@ class IFCToFalkorDBConverter:
 			self.logger.error(f"Error during directory conversion: {e}")
 			return results
 	
+	def _collect_files(self, input_directory: Path, file_pattern: str, files: List[Path] = None) -> List[Path]:
+		"""Search for IFC files (unless the caller already did)"""
+		ifc_files = list(input_directory.glob(file_pattern)) if files is None else list(files)
+		if ifc_files:
+			self.logger.info(f"Found {len(ifc_files)} IFC files")
+		else:
+			self.logger.warning(f"No IFC files found: {input_directory}")
+		return ifc_files
+	
+	def _record_result(self, results: Dict[str, bool], success: bool, ifc_file: Path):
+		"""Store and log the conversion result of one file"""
+		results[str(ifc_file)] = success
+		if success:
+			self.logger.info(f"File conversion successful: {ifc_file.name}")
+		else:
+			self.logger.error(f"File conversion failed: {ifc_file.name}")
+	
 	def get_conversion_statistics(self) -> Dict[str, Any]:
 		"""
 		Get conversion statistics
@@ -3,15 +3,100 @@ IFC to Neo4j graph conversion logic implementation
 
 Contact: Taewook Kang (laputa99999@gmail.com)
 """
+import fnmatch
 import logging
-from typing import Dict, List, Any, Optional
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import cached_property
+from itertools import chain, islice
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator
 from pathlib import Path
-from .ifc_parser import IFCParser
-from .neo4j_database import Neo4jDatabase
+from .neo4j_database import Neo4jDatabase, APOC_MIN_ELEMENTS, INGEST_TX_TIMEOUT, INGEST_TX_METADATA
+
+
+def _parse_file(ifc_file_path: Path) -> Tuple[Path, Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+	"""
+	Parse one IFC file into element and relationship lists (runs in worker processes)
+	
+	Errors are logged here, so the future's result() only raises if the worker process died.
+	
+	Returns:
+		(file path, elements or None if parsing failed, relationships)
+	"""
+	from .ifc_parser import IFCParser
+	parser = IFCParser()
+	try:
+		ifc_file = parser.parse_file(ifc_file_path)
+		if not ifc_file:
+			return ifc_file_path, None, []
+		return ifc_file_path, parser.extract_elements(ifc_file), parser.extract_relationships(ifc_file)
+	except Exception as e:
+		parser.logger.error(f"Error processing file: {ifc_file_path.name}, error: {e}")
+		return ifc_file_path, None, []
+
+
+def _find_files(directory: Path, file_pattern: str) -> Iterator[Path]:
+	"""
+	Files in directory whose names match file_pattern (not recursive, like Path.glob)
+	
+	Uses os.scandir, whose entries carry the name and file type, so no entry is stat'ed.
+	Patterns with path parts (e.g. "**/*.ifc") fall back to Path.glob.
+	"""
+	if '/' in file_pattern or os.sep in file_pattern:
+		yield from directory.glob(file_pattern)
+		return
+	with os.scandir(directory) as entries:
+		for entry in entries:
+			if fnmatch.fnmatch(entry.name, file_pattern) and entry.is_file():
+				yield Path(entry.path)
+
+
+# Extraction counts of this many recently converted files are kept for validate_conversion
+PARSE_CACHE_SIZE = 8
+
+_Q_ELEMENT_TYPES = """
+MATCH (n:Element)
+RETURN n.ifcClass as elementType, count(n) as count
+ORDER BY count DESC
+"""
+
+_Q_RELATIONSHIP_TYPES = """
+MATCH ()-[r]->()
+RETURN type(r) as relationshipType, count(r) as count
+ORDER BY count DESC
+"""
+
+
+def _is_written_relationship(rel_data: Dict[str, Any]) -> bool:
+	"""Whether a relationship becomes graph relationships (HAS_PROPERTY is stored as node attributes)"""
+	return rel_data.get('type') != 'HAS_PROPERTY'
+
+
+class _Counted:
+	"""Iterable wrapper counting the items consumed from it (for streamed extraction)"""
+	
+	def __init__(self, iterable: Iterable[Any], predicate=None):
+		self._iterable = iterable
+		self._predicate = predicate
+		self.count = 0
+		# Items for which predicate is true
+		self.matched = 0
+	
+	def __iter__(self) -> Iterator[Any]:
+		for item in self._iterable:
+			self.count += 1
+			if self._predicate and self._predicate(item):
+				self.matched += 1
+			yield item
+
 
 class IFCToGraphConverter:
 	"""Main class for converting IFC data to Neo4j graph"""
 	
+	# (uri, database) pairs whose indexes were already ensured in this process
+	_indexed_databases = set()
+	
 	def __init__(self, neo4j_db: Neo4jDatabase):
 		"""
 		Initialize converter
@@ -20,8 +105,34 @@ class IFCToGraphConverter:
 			neo4j_db: Neo4j database instance
 		"""
 		self.logger = logging.getLogger(__name__)
-		self.parser = IFCParser()
 		self.db = neo4j_db
+		# (element type, relationship type) distributions by (total nodes, total relationships); cleared after each write
+		self._dist_cache = {}
+		# (elements, relationships, written relationships) by file path and version, see _parse_key
+		self._parse_cache = OrderedDict()
+		self._ensure_indexes()
+	
+	@cached_property
+	def parser(self):
+		"""
+		IFC parser, created on first use
+		
+		ifcopenshell takes seconds to import, so it is only loaded when a file is
+		parsed; statistics-only use of the converter never imports it.
+		"""
+		from .ifc_parser import IFCParser
+		return IFCParser()
+	
+	def _ensure_indexes(self):
+		"""Create the import indexes once per database and process, before the first write"""
+		key = (self.db.uri, self.db.database)
+		if key in IFCToGraphConverter._indexed_databases:
+			return
+		try:
+			self.db.ensure_indexes()
+			IFCToGraphConverter._indexed_databases.add(key)
+		except Exception as e:
+			self.logger.warning(f"Index creation failed: {e}")
 		
 	def convert_file(self, ifc_file_path: Path) -> bool:
 		"""
@@ -36,58 +147,137 @@ class IFCToGraphConverter:
 		try:
 			self.logger.info(f"Starting IFC file conversion: {ifc_file_path}")
 			
-			# 1. Create file metadata node first
-			file_id = self.db.create_file_node(ifc_file_path)
-			if not file_id:
-				self.logger.error(f"File metadata creation failed: {ifc_file_path}")
-				return False
-			
-			# 2. Parse IFC file
+			# 1. Parse IFC file
 			ifc_file = self.parser.parse_file(ifc_file_path)
 			if not ifc_file:
 				self.logger.error(f"IFC file parsing failed: {ifc_file_path}")
 				return False
 			
-			# 3. Extract and convert elements
-			elements = self.parser.extract_elements(ifc_file)
-			if not elements:
+			# 2. Elements and relationships are extracted while they are written, so only one
+			# batch of them is held in memory
+			return self._write_to_neo4j(ifc_file_path, self.parser.iter_elements(ifc_file), self.parser.iter_relationships(ifc_file))
+			
+		except Exception as e:
+			self.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
+			return False
+	
+	def _write_to_neo4j(self, ifc_file_path: Path, elements: Iterable[Dict[str, Any]], relationships: Iterable[Dict[str, Any]]) -> bool:
+		"""
+		Write the extracted elements and relationships of one IFC file (lists or generators)
+		
+		Args:
+			ifc_file_path: IFC file path
+			elements: Element data dictionaries
+			relationships: Relationship data dictionaries
+			
+		Returns:
+			Conversion success status
+		"""
+		try:
+			# Very large parsed files: server-side batches instead of UNWIND batches from here
+			if isinstance(elements, list) and len(elements) >= APOC_MIN_ELEMENTS and self.db.apoc_available():
+				return self._write_with_apoc(ifc_file_path, elements, relationships)
+			
+			elements = iter(elements)
+			first_element = next(elements, None)
+			if first_element is None:
 				self.logger.warning(f"No elements extracted: {ifc_file_path}")
 				return False
+			elements = _Counted(chain((first_element,), elements))
+			relationships = _Counted(relationships, _is_written_relationship)
 			
-			# 4. Convert elements to Neo4j nodes with file reference
-			element_success_count = 0
-			for element in elements:
-				if self.db.create_element_node(element, file_id):
-					element_success_count += 1
-					
-			self.logger.info(f"Element nodes creation completed: {element_success_count}/{len(elements)}")
-			
-			# 5. Extract and convert relationships
-			relationships = self.parser.extract_relationships(ifc_file)
-			if relationships:
-				relationship_success_count = 0
-				for relationship in relationships:
-					if self.db.create_relationship(relationship):
-						relationship_success_count += 1
-						
-				self.logger.info(f"Relationships creation completed: {relationship_success_count}/{len(relationships)}")
-			else:
-				self.logger.info("No relationships extracted.")
+			# File node, element nodes and relationships are written in one transaction (one commit per file).
+			# Not execute_write: a retry would replay the already consumed generators
+			with self.db.session_scope() as session:
+				with session.begin_transaction(metadata=INGEST_TX_METADATA, timeout=INGEST_TX_TIMEOUT) as tx:
+					file_id, element_success_count, pair_count = self._ingest_file_tx(tx, ifc_file_path, elements, relationships)
+					if file_id:
+						tx.commit()
+			if not file_id:
+				self.logger.error(f"File metadata creation failed: {ifc_file_path}")
+				return False
+			self._dist_cache.clear()
+			self._remember_counts(ifc_file_path, elements.count, relationships.count, relationships.matched)
 			
-			self.logger.info(f"IFC file conversion completed: {ifc_file_path}")
+			self._log_written(ifc_file_path, element_success_count, elements.count, pair_count, relationships.count)
 			return True
 			
 		except Exception as e:
 			self.logger.error(f"Error during IFC file conversion: {ifc_file_path}, error: {e}")
 			return False
 	
-	def convert_directory(self, input_directory: Path, file_pattern: str = "*.ifc") -> Dict[str, bool]:
+	def _write_with_apoc(self, ifc_file_path: Path, elements: List[Dict[str, Any]], relationships: List[Dict[str, Any]]) -> bool:
+		"""
+		Write one large IFC file with apoc.periodic.iterate for the element nodes
+		
+		The file node, the element batches and the relationship batches commit separately.
+		
+		Returns:
+			Conversion success status
+		"""
+		file_id = self.db.create_file_node(ifc_file_path)
+		if not file_id:
+			self.logger.error(f"File metadata creation failed: {ifc_file_path}")
+			return False
+		element_success_count = self.db.create_element_nodes_apoc(elements, file_id)
+		pair_count = self.db.create_relationships(relationships)
+		self._dist_cache.clear()
+		self._remember_counts(ifc_file_path, len(elements), len(relationships),
+							  sum(1 for rel_data in relationships if _is_written_relationship(rel_data)))
+		
+		self._log_written(ifc_file_path, element_success_count, len(elements), pair_count, len(relationships))
+		return True
+	
+	@staticmethod
+	def _parse_key(ifc_file_path: Path) -> Tuple[str, int, int]:
+		"""Cache key of one version of a file (path, modification time, size)"""
+		stat = ifc_file_path.stat()
+		return str(ifc_file_path.resolve()), stat.st_mtime_ns, stat.st_size
+	
+	def _remember_counts(self, ifc_file_path: Path, element_count: int, relationship_count: int, written_relationship_count: int):
+		"""Keep the extraction counts of a converted file, so validate_conversion needn't parse it again"""
+		self._parse_cache[self._parse_key(ifc_file_path)] = (element_count, relationship_count, written_relationship_count)
+		while len(self._parse_cache) > PARSE_CACHE_SIZE:
+			self._parse_cache.popitem(last=False)
+	
+	def _log_written(self, ifc_file_path: Path, element_success_count: int, element_count: int, pair_count: int, relationship_count: int):
+		"""Log the write result of one IFC file"""
+		self.logger.info(f"Element nodes creation completed: {element_success_count}/{element_count}")
+		if relationship_count:
+			self.logger.info(f"Relationships creation completed: {pair_count} links from {relationship_count} relationships")
+		else:
+			self.logger.info("No relationships extracted.")
+		
+		self.logger.info(f"IFC file conversion completed: {ifc_file_path}")
+	
+	def _ingest_file_tx(self, tx, ifc_file_path: Path, elements: Iterable[Dict[str, Any]],
+						relationships: Iterable[Dict[str, Any]]) -> Tuple[Optional[str], int, int]:
+		"""
+		Write transaction for one IFC file: file node, then element nodes (one UNWIND query per
+		IFC class and batch), then relationships (one UNWIND query per type and batch)
+		
+		Returns:
+			(file ID or None, number of elements written, number of relationship links written)
+		"""
+		file_id = self.db.create_file_node(ifc_file_path, tx=tx)
+		if not file_id:
+			return None, 0, 0
+		element_success_count = self.db.create_element_nodes(elements, file_id, tx=tx)
+		pair_count = self.db.create_relationships(relationships, tx=tx)
+		return file_id, element_success_count, pair_count
+	
+	def convert_directory(self, input_directory: Path, file_pattern: str = "*.ifc", workers: int = None) -> Dict[str, bool]:
 		"""
 		Convert all IFC files in directory
 		
+		Files are parsed in parallel worker processes (parsing is CPU-bound Python, so threads
+		wouldn't scale); the parsed files are written to Neo4j one at a time from this thread.
+		
 		Args:
 			input_directory: Input directory path
 			file_pattern: File pattern (default: "*.ifc")
+			workers: Number of parser processes (default: NEO4J_IMPORT_WORKERS or min(8, CPU count),
+				1 converts the files one by one in this process)
 			
 		Returns:
 			Dictionary of conversion results by file
@@ -96,7 +286,7 @@ class IFCToGraphConverter:
 		
 		try:
 			# Search for IFC files
-			ifc_files = list(input_directory.glob(file_pattern))
+			ifc_files = list(_find_files(input_directory, file_pattern))
 			
 			if not ifc_files:
 				self.logger.warning(f"No IFC files found: {input_directory}")
@@ -104,21 +294,23 @@ class IFCToGraphConverter:
 			
 			self.logger.info(f"Found {len(ifc_files)} IFC files in total.")
 			
-			# Process each file sequentially
-			for ifc_file in ifc_files:
-				try:
-					result = self.convert_file(ifc_file)
+			workers = workers or int(os.getenv('NEO4J_IMPORT_WORKERS', '0')) or min(8, os.cpu_count() or 1)
+			workers = min(workers, len(ifc_files))
+			
+			if workers > 1:
+				converted = self._convert_parallel(ifc_files, workers)
+			else:
+				converted = ((ifc_file, self.convert_file(ifc_file)) for ifc_file in ifc_files)
+			
+			# All files are written through one session
+			with self.db.session_scope():
+				for ifc_file, result in converted:
 					results[str(ifc_file)] = result
 					
 					if result:
 						self.logger.info(f"Conversion successful: {ifc_file.name}")
 					else:
 						self.logger.error(f"Conversion failed: {ifc_file.name}")
-						
-				except Exception as e:
-					self.logger.error(f"Error processing file: {ifc_file.name}, error: {e}")
-					results[str(ifc_file)] = False
-					continue
 			
 			# Conversion result summary
 			success_count = sum(1 for success in results.values() if success)
@@ -132,6 +324,46 @@ class IFCToGraphConverter:
 			self.logger.error(f"Error during directory conversion: {input_directory}, error: {e}")
 			return results
 	
+	def _convert_parallel(self, ifc_files: List[Path], workers: int) -> Iterator[Tuple[Path, bool]]:
+		"""
+		Parse files in worker processes and write each parsed file as soon as it is ready
+		
+		At most 2 * workers files are parsed or waiting ahead of the writer, so parsing
+		pauses when writes fall behind instead of piling parsed files up in memory.
+		
+		Yields:
+			(file path, conversion success status)
+		"""
+		remaining = iter(ifc_files)
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			pending = {executor.submit(_parse_file, ifc_file): ifc_file for ifc_file in islice(remaining, 2 * workers)}
+			while pending:
+				done, _ = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					ifc_file = pending.pop(future)
+					next_file = next(remaining, None)
+					if next_file is not None:
+						try:
+							pending[executor.submit(_parse_file, next_file)] = next_file
+						except Exception as e:
+							# The pool is broken, the files not submitted yet can't be parsed
+							for failed_file in chain((next_file,), remaining):
+								self.logger.error(f"IFC file parsing failed: {failed_file}, error: {e}")
+								yield failed_file, False
+					try:
+						_, elements, relationships = future.result()
+					except Exception as e:
+						# Worker died (e.g. BrokenProcessPool after an out-of-memory kill): only this file fails
+						self.logger.error(f"IFC file parsing failed: {ifc_file}, error: {e}")
+						yield ifc_file, False
+						continue
+					if elements is None:
+						self.logger.error(f"IFC file parsing failed: {ifc_file}")
+						yield ifc_file, False
+						continue
+					self.logger.info(f"Starting IFC file conversion: {ifc_file}")
+					yield ifc_file, self._write_to_neo4j(ifc_file, elements, relationships)
+	
 	def get_conversion_statistics(self) -> Dict[str, Any]:
 		"""
 		Return conversion result statistics
@@ -141,12 +373,13 @@ class IFCToGraphConverter:
 		"""
 		try:
 			stats = self.db.get_stats()
+			element_types, relationship_types = self._get_all_distributions(stats)
 			
 			# Calculate additional statistics
 			detailed_stats = {
 				'database_stats': stats,
-				'element_types': self._get_element_type_distribution(),
-				'relationship_types': self._get_relationship_type_distribution()
+				'element_types': element_types,
+				'relationship_types': relationship_types
 			}
 			
 			return detailed_stats
@@ -155,55 +388,68 @@ class IFCToGraphConverter:
 			self.logger.error(f"Statistics collection failed: {e}")
 			return {}
 	
-	def _get_element_type_distribution(self) -> Dict[str, int]:
+	def _get_all_distributions(self, stats: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, int], Dict[str, int]]:
 		"""
-		Query element type distribution
+		Query element and relationship type distributions in one round trip
 		
+		The result is cached while the graph's node and relationship totals are unchanged.
+		
+		Args:
+			stats: Result of get_stats, if the caller already has it
+			
 		Returns:
-			Dictionary of element count by type
+			(element count by type, relationship count by type)
 		"""
+		stats = stats or self.db.get_stats()
+		key = (stats['total_nodes'], stats['total_relationships'])
+		if key not in self._dist_cache:
+			distributions = self._query_all_distributions()
+			if not any(distributions):
+				# Failed or empty, not cached
+				return distributions
+			self._dist_cache[key] = distributions
+		return self._dist_cache[key]
+	
+	def _query_all_distributions(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+		"""Query both type distributions from Neo4j in one read transaction"""
 		try:
-			with self.db.driver.session(database=self.db.database) as session:
-				result = session.run("""
-				MATCH (n:Element)
-				RETURN n.ifcClass as elementType, count(n) as count
-				ORDER BY count DESC
-				""")
-				
-				distribution = {}
-				for record in result:
-					distribution[record['elementType']] = record['count']
-				
-				return distribution
-				
+			with self.db.session_scope() as session:
+				return session.execute_read(self._distributions_tx)
 		except Exception as e:
-			self.logger.error(f"Element type distribution query failed: {e}")
-			return {}
+			self.logger.error(f"Type distribution query failed: {e}")
+			return {}, {}
+	
+	@staticmethod
+	def _distributions_tx(tx) -> Tuple[Dict[str, int], Dict[str, int]]:
+		"""Run both distribution queries back to back on one transaction"""
+		# data() fetches all rows at once instead of pulling records one by one
+		element_types = {row['elementType']: row['count'] for row in tx.run(_Q_ELEMENT_TYPES).data()}
+		relationship_types = {row['relationshipType']: row['count'] for row in tx.run(_Q_RELATIONSHIP_TYPES).data()}
+		return element_types, relationship_types
 	
-	def _get_relationship_type_distribution(self) -> Dict[str, int]:
+	def _get_element_type_distribution(self, stats: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
 		"""
-		Query relationship type distribution
+		Query element type distribution (cached per graph revision)
 		
+		Args:
+			stats: Result of get_stats, if the caller already has it
+			
+		Returns:
+			Dictionary of element count by type
+		"""
+		return self._get_all_distributions(stats)[0]
+	
+	def _get_relationship_type_distribution(self, stats: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+		"""
+		Query relationship type distribution (cached per graph revision)
+		
+		Args:
+			stats: Result of get_stats, if the caller already has it
+			
 		Returns:
 			Dictionary of relationship count by type
 		"""
-		try:
-			with self.db.driver.session(database=self.db.database) as session:
-				result = session.run("""
-				MATCH ()-[r]->()
-				RETURN type(r) as relationshipType, count(r) as count
-				ORDER BY count DESC
-				""")
-				
-				distribution = {}
-				for record in result:
-					distribution[record['relationshipType']] = record['count']
-				
-				return distribution
-				
-		except Exception as e:
-			self.logger.error(f"Relationship type distribution query failed: {e}")
-			return {}
+		return self._get_all_distributions(stats)[1]
 	
 	def validate_conversion(self, ifc_file_path: Path) -> Dict[str, Any]:
 		"""
@@ -218,30 +464,35 @@ class IFCToGraphConverter:
 		try:
 			self.logger.info(f"Starting conversion validation: {ifc_file_path}")
 			
-			# Check element and relationship count from original IFC file
-			ifc_file = self.parser.parse_file(ifc_file_path)
-			if not ifc_file:
-				return {'error': 'IFC file parsing failed'}
-			
-			original_elements = self.parser.extract_elements(ifc_file)
-			original_relationships = self.parser.extract_relationships(ifc_file)
+			# Check element and relationship count from original IFC file (from the conversion, if it just ran)
+			counts = self._parse_cache.get(self._parse_key(ifc_file_path))
+			if counts is None:
+				ifc_file = self.parser.parse_file(ifc_file_path)
+				if not ifc_file:
+					return {'error': 'IFC file parsing failed'}
+				
+				relationships = _Counted(self.parser.iter_relationships(ifc_file), _is_written_relationship)
+				counts = (sum(1 for _ in self.parser.iter_elements(ifc_file)), sum(1 for _ in relationships), relationships.matched)
+			original_elements_count, original_relationships_count, written_relationships_count = counts
 			
-			# Check data from the same file in Neo4j
-			# (Using overall statistics as file-specific distinction is difficult)
-			db_stats = self.db.get_stats()
+			# Check data from the same file in Neo4j (elements linked to its file node)
+			file_id = self.db.file_id_for(ifc_file_path)
+			file_stats = self.db.get_file_stats(file_id)
+			element_types, relationship_types = self._get_all_distributions()
 			
 			validation_result = {
-				'original_elements_count': len(original_elements),
-				'original_relationships_count': len(original_relationships),
-				'db_nodes_count': db_stats['total_nodes'],
-				'db_relationships_count': db_stats['total_relationships'],
-				'element_types': self._get_element_type_distribution(),
-				'relationship_types': self._get_relationship_type_distribution()
+				'file_id': file_id,
+				'original_elements_count': original_elements_count,
+				'original_relationships_count': original_relationships_count,
+				'db_nodes_count': file_stats['file_nodes'],
+				'db_relationships_count': file_stats['file_relationships'],
+				'element_types': element_types,
+				'relationship_types': relationship_types
 			}
 			
-			# Basic consistency check
+			# Basic consistency check (HAS_PROPERTY is stored as node attributes, not as relationships)
 			validation_result['elements_match'] = validation_result['original_elements_count'] <= validation_result['db_nodes_count']
-			validation_result['relationships_match'] = validation_result['original_relationships_count'] <= validation_result['db_relationships_count']
+			validation_result['relationships_match'] = written_relationships_count <= validation_result['db_relationships_count']
 			
 			self.logger.info(f"Conversion validation completed: {ifc_file_path}")
 			return validation_result
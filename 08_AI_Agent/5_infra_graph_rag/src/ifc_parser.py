@@ -5,9 +5,12 @@ Contact: Taewook Kang (laputa99999@gmail.com)
 """
 import ifcopenshell
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterator
 from pathlib import Path
 
+# Files at least this large are opened memory-mapped when the ifcopenshell build supports it
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
 
 class IFCParser:
 	"""Class for parsing IFC files and extracting elements and relationships"""
@@ -27,13 +30,29 @@ class IFCParser:
 		"""
 		try:
 			self.logger.info(f"Starting IFC file parsing: {file_path}")
-			ifc_file = ifcopenshell.open(str(file_path))
+			ifc_file = self._open_mmap(file_path) if file_path.stat().st_size >= MMAP_THRESHOLD else None
+			if ifc_file is None:
+				ifc_file = ifcopenshell.open(str(file_path))
 			self.logger.info(f"IFC file parsing completed: {file_path}")
 			return ifc_file
 		except Exception as e:
 			self.logger.error(f"IFC file parsing failed: {file_path}, error: {e}")
 			return None
 	
+	def _open_mmap(self, file_path: Path) -> Optional[ifcopenshell.file]:
+		"""
+		Open a large IFC file memory-mapped by the native parser (no read() copies)
+		
+		Returns:
+			ifcopenshell.file object, or None if this ifcopenshell build has no mmap support
+		"""
+		try:
+			return ifcopenshell.open(str(file_path), mmap=True)
+		except TypeError:
+			# Older ifcopenshell (no mmap argument) or a build without USE_MMAP
+			self.logger.debug(f"Memory-mapped open not supported, using regular open: {file_path}")
+			return None
+	
 	def extract_elements(self, ifc_file: ifcopenshell.file) -> List[Dict[str, Any]]:
 		"""
 		Extract all elements from IFC file
@@ -44,20 +63,77 @@ class IFCParser:
 		Returns:
 			List of dictionaries containing element information
 		"""
-		elements = []
+		return list(self.iter_elements(ifc_file))
+	
+	def iter_elements(self, ifc_file: ifcopenshell.file) -> Iterator[Dict[str, Any]]:
+		"""
+		Generator version of extract_elements, one element at a time
+		
+		Args:
+			ifc_file: ifcopenshell file object (must stay open while iterating)
+			
+		Yields:
+			Element data dictionaries
+		"""
+		count = 0
 		
 		# Get all IFC element types
 		for element in ifc_file.by_type('IfcProduct'):
 			try:
 				element_data = self._extract_element_data(element)
-				if element_data:
-					elements.append(element_data)
 			except Exception as e:
 				self.logger.warning(f"Element extraction failed: {element}, error: {e}")
 				continue
+			if element_data:
+				count += 1
+				yield element_data
+				
+		self.logger.info(f"Extracted {count} elements in total.")
+	
+	def extract_element_rows(self, ifc_file: ifcopenshell.file) -> List[Dict[str, Any]]:
+		"""
+		Extract all elements as rows in the shape bulk writers consume
+		
+		Args:
+			ifc_file: ifcopenshell file object
+			
+		Returns:
+			List of {'globalId', 'props'} rows; props holds the node properties
+			and the nested PropertySet dictionary under 'properties'
+		"""
+		return list(self.iter_element_rows(ifc_file))
+	
+	def iter_element_rows(self, ifc_file: ifcopenshell.file) -> Iterator[Dict[str, Any]]:
+		"""
+		Generator version of extract_element_rows, one row at a time
+		
+		Args:
+			ifc_file: ifcopenshell file object (must stay open while iterating)
+			
+		Yields:
+			{'globalId', 'props'} element rows
+		"""
+		count = 0
+		for element in ifc_file.by_type('IfcProduct'):
+			try:
+				row = {
+					'globalId': element.GlobalId,
+					'props': {
+						'name': getattr(element, 'Name', None) or '',
+						'ifcClass': element.is_a(),
+						'description': getattr(element, 'Description', None) or '',
+						'objectType': getattr(element, 'ObjectType', None) or '',
+						'tag': getattr(element, 'Tag', None) or '',
+						'properties': self._extract_properties(element)
+					}
+				}
+			except Exception as e:
+				self.logger.warning(f"Element extraction failed: {element}, error: {e}")
+				continue
+			count += 1
+			yield row
 				
-		self.logger.info(f"Extracted {len(elements)} elements in total.")
-		return elements
+		self.logger.info(f"Extracted {count} elements in total.")
 	
 	def _extract_element_data(self, element) -> Dict[str, Any]:
 		"""
@@ -123,7 +199,19 @@ class IFCParser:
 		Returns:
 			List of dictionaries containing relationship information
 		"""
-		relationships = []
+		return list(self.iter_relationships(ifc_file))
+	
+	def iter_relationships(self, ifc_file: ifcopenshell.file) -> Iterator[Dict[str, Any]]:
+		"""
+		Generator version of extract_relationships, one relationship at a time
+		
+		Args:
+			ifc_file: ifcopenshell file object (must stay open while iterating)
+			
+		Yields:
+			Relationship data dictionaries
+		"""
+		count = 0
 		
 		# Extract all relationship types
 		rel_types = [
@@ -138,14 +226,14 @@ class IFCParser:
 			for rel in ifc_file.by_type(rel_type):
 				try:
 					rel_data = self._extract_relationship_data(rel)
-					if rel_data:
-						relationships.append(rel_data)
 				except Exception as e:
 					self.logger.warning(f"Relationship extraction failed: {rel}, error: {e}")
 					continue
+				if rel_data:
+					count += 1
+					yield rel_data
 					
-		self.logger.info(f"Extracted {len(relationships)} relationships in total.")
-		return relationships
+		self.logger.info(f"Extracted {count} relationships in total.")
 	
 	def _extract_relationship_data(self, rel) -> Optional[Dict[str, Any]]:
 		"""
@@ -3,16 +3,129 @@ Neo4j database connection and data processing module
 
 Contact: Taewook Kang (laputa99999@gmail.com)
 """
-import logging, json, os
+import logging, json, os, threading
+from contextlib import contextmanager
+from itertools import islice
 from neo4j import GraphDatabase
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Iterator
 from pathlib import Path
 from datetime import datetime
 
+# Rows per UNWIND query (and write transaction) in bulk writes
+BATCH_SIZE = 1000
+
+# Files with at least this many elements are written with apoc.periodic.iterate when enabled
+APOC_MIN_ELEMENTS = 100000
+
+# Rows per server-side transaction of apoc.periodic.iterate
+APOC_BATCH_SIZE = 10000
+
+# Records fetched per round trip by sessions (driver default: 1000)
+FETCH_SIZE = 10000
+
+# Timeout (seconds) and metadata of the one-transaction-per-file import writes
+INGEST_TX_TIMEOUT = 300.0
+INGEST_TX_METADATA = {'app': 'ifc_bulk'}
+
+# (from key, to key) of each relationship type written as graph relationships; keys ending
+# in 's' hold lists of globalIds. HAS_PROPERTY is left out: PropertySets are node attributes
+_PAIR_KEYS = {
+	'AGGREGATES': ('from_element', 'to_elements'),
+	'CONNECTS_TO': ('from_element', 'to_element'),
+	'CONTAINED_IN': ('from_elements', 'to_structure'),
+	'ASSIGNED_TO': ('from_elements', 'to_group'),
+}
+
+# Elements are sent as parallel $ids and $props columns instead of one row map per element
+_ELEM_UPSERT_TMPL = """
+UNWIND range(0, size($ids) - 1) AS i
+MERGE (e:Element:{cls} {{globalId: $ids[i]}})
+SET e += $props[i]
+RETURN count(e)
+"""
+
+# The file node is matched once per batch, before the UNWIND
+_ELEM_UPSERT_FILE_TMPL = """
+MATCH (f:IFCFile {{fileId: $fileId}})
+UNWIND range(0, size($ids) - 1) AS i
+MERGE (e:Element:{cls} {{globalId: $ids[i]}})
+SET e += $props[i]
+MERGE (e)-[:BELONGS_TO_FILE]->(f)
+RETURN count(e)
+"""
+
+_REL_UPSERT_TMPL = """
+UNWIND $pairs AS p
+MATCH (a:Element {{globalId: p.f}})
+MATCH (b:Element {{globalId: p.t}})
+MERGE (a)-[r:{rtype}]->(b)
+SET r.globalId = p.rid
+RETURN count(r)
+"""
+
+
+# Server-side batched element writes. Elements are distinct nodes, so the MERGEs run in
+# parallel (the globalId index keeps them from locking each other); the file links all
+# touch the file node and run sequentially
+_Q_APOC_ELEMENTS = """
+CALL apoc.periodic.iterate(
+	'UNWIND $rows AS r RETURN r',
+	'MERGE (e:Element {globalId: r.globalId}) SET e += r.props WITH e, r CALL apoc.create.addLabels(e, [r.props.ifcClass]) YIELD node RETURN count(*)',
+	{batchSize: $batchSize, parallel: true, params: {rows: $rows}})
+YIELD total, failedOperations, errorMessages
+RETURN total - failedOperations AS written, errorMessages
+"""
+
+_Q_APOC_FILE_LINK = """
+CALL apoc.periodic.iterate(
+	'MATCH (f:IFCFile {fileId: $fileId}) MATCH (e:Element {sourceFileId: $fileId}) RETURN e, f',
+	'MERGE (e)-[:BELONGS_TO_FILE]->(f)',
+	{batchSize: $batchSize, parallel: false, params: {fileId: $fileId}})
+YIELD failedOperations, errorMessages
+RETURN failedOperations, errorMessages
+"""
+
+
+# Element and relationship counts of one file, reached through its BELONGS_TO_FILE links
+_Q_FILE_STATS = """
+MATCH (f:IFCFile {fileId: $fileId})
+CALL {
+	WITH f
+	MATCH (e:Element)-[:BELONGS_TO_FILE]->(f)
+	RETURN count(e) AS elements
+}
+CALL {
+	WITH f
+	MATCH (e:Element)-[:BELONGS_TO_FILE]->(f)
+	MATCH (e)-[r]->(:Element)
+	RETURN count(r) AS relationships
+}
+RETURN elements, relationships
+"""
+
+
+def _chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+	"""Yield lists of up to size items from iterable"""
+	iterator = iter(iterable)
+	while True:
+		chunk = list(islice(iterator, size))
+		if not chunk:
+			return
+		yield chunk
+
+
+def _element_query(ifc_class: str, with_file: bool) -> str:
+	"""UNWIND query merging element nodes of one IFC class, optionally linked to $fileId"""
+	# Backtick-quoted, as the label is written into the query text
+	label = '`' + ifc_class.replace('`', '``') + '`'
+	template = _ELEM_UPSERT_FILE_TMPL if with_file else _ELEM_UPSERT_TMPL
+	return template.format(cls=label)
+
+
 class Neo4jDatabase:
 	"""Neo4j database connection and data management class"""
 	
-	def __init__(self, uri: str, user: str, password: str, database: str = "elements"):
+	def __init__(self, uri: str, user: str, password: str, database: str = "elements", use_apoc: bool = None):
 		"""
 		Initialize Neo4j database connection
 		
@@ -21,12 +134,21 @@ class Neo4jDatabase:
 			user: Username
 			password: Password
 			database: Database name
+			use_apoc: Write files with at least APOC_MIN_ELEMENTS elements with apoc.periodic.iterate
+				when APOC is installed (default: NEO4J_USE_APOC, off unless set to 1)
 		"""
 		self.logger = logging.getLogger(__name__)
 		self.uri = uri
 		self.user = user
 		self.password = password
 		self.database = database
+		if use_apoc is None:
+			use_apoc = os.getenv('NEO4J_USE_APOC', '0') == '1'
+		self.use_apoc = use_apoc
+		# Result of the APOC availability check (None: not checked yet)
+		self._apoc_available = None
+		# Session of the current session_scope, per thread (sessions aren't thread-safe)
+		self._local = threading.local()
 		self.driver = None
 		
 	def connect(self) -> bool:
@@ -37,7 +159,9 @@ class Neo4jDatabase:
 			Connection success status
 		"""
 		try:
-			self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+			# Retries of managed write transactions (execute_write) get up to 2 minutes instead of 30 s
+			self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password),
+											   user_agent="ifc-converter/bulk", max_transaction_retry_time=120.0)
 			# Connection test
 			with self.driver.session(database=self.database) as session:
 				session.run("RETURN 1")
@@ -47,36 +171,84 @@ class Neo4jDatabase:
 			self.logger.error(f"Neo4j database connection failed: {e}")
 			return False
 	
+	@contextmanager
+	def session_scope(self):
+		"""
+		Session of the calling thread, opened by the outermost scope and reused by nested ones
+		
+		Wrapping a whole import in one scope lets every read and write of that thread
+		share one session instead of opening a new one per call.
+		
+		Yields:
+			Neo4j session
+		"""
+		session = getattr(self._local, 'session', None)
+		if session is not None:
+			yield session
+			return
+		with self.driver.session(database=self.database, fetch_size=FETCH_SIZE) as session:
+			self._local.session = session
+			try:
+				yield session
+			finally:
+				self._local.session = None
+	
+	def ensure_indexes(self):
+		"""
+		Create the indexes used by the MERGE/MATCH lookups of the import (if missing)
+		
+		Without the globalId index every batched MERGE scans all Element nodes, so
+		import time grows quadratically with the graph size.
+		"""
+		statements = [
+			"CREATE INDEX element_global_id IF NOT EXISTS FOR (n:Element) ON (n.globalId)",
+			"CREATE INDEX element_ifc_class IF NOT EXISTS FOR (n:Element) ON (n.ifcClass)",
+			"CREATE INDEX ifcfile_file_id IF NOT EXISTS FOR (f:IFCFile) ON (f.fileId)",
+		]
+		with self.session_scope() as session:
+			for statement in statements:
+				session.run(statement).consume()
+		self.logger.info("Neo4j indexes ensured")
+	
 	def close(self):
 		"""Close database connection"""
 		if self.driver:
 			self.driver.close()
 			self.logger.info("Neo4j database connection closed")
 	
-	def create_file_node(self, file_path: Path) -> Optional[str]:
+	def create_file_node(self, file_path: Path, tx=None) -> Optional[str]:
 		"""
 		Create IFC file metadata node in Neo4j
 		
 		Args:
 			file_path: Path to the IFC file
+			tx: Transaction to write in (default: a new session and transaction)
 			
 		Returns:
 			File ID if successful, None otherwise
 		"""
+		if tx is not None:
+			return self._create_file_tx(tx, file_path)
 		try:
-			with self.driver.session(database=self.database) as session:
+			with self.session_scope() as session:
 				result = session.execute_write(self._create_file_tx, file_path)
 				return result
 		except Exception as e:
 			self.logger.error(f"File node creation failed: {file_path}, error: {e}")
 			return None
 	
+	@staticmethod
+	def file_id_for(file_path: Path, stat: os.stat_result = None) -> str:
+		"""File ID of the IFCFile node of file_path (file name and modification time)"""
+		stat = stat or file_path.stat()
+		return f"FILE_{file_path.stem}_{int(stat.st_mtime)}"
+	
 	def _create_file_tx(self, tx, file_path: Path) -> Optional[str]:
 		"""File node creation transaction"""
 		try:
 			# Get file information
 			stat = file_path.stat()
-			file_id = f"FILE_{file_path.stem}_{int(stat.st_mtime)}"
+			file_id = self.file_id_for(file_path, stat)
 			
 			file_data = {
 				'fileId': file_id,
@@ -120,7 +292,7 @@ class Neo4jDatabase:
 			Creation success status
 		"""
 		try:
-			with self.driver.session(database=self.database) as session:
+			with self.session_scope() as session:
 				result = session.execute_write(self._create_element_tx, element_data, file_id)
 				return result
 		except Exception as e:
@@ -183,6 +355,182 @@ class Neo4jDatabase:
 			self.logger.error(f"Node creation transaction failed: {e}")
 			return False
 	
+	def create_element_nodes(self, elements: Iterable[Dict[str, Any]], file_id: str = None, tx=None) -> int:
+		"""
+		Create IFC elements as Neo4j nodes, BATCH_SIZE at a time with one UNWIND query per IFC class
+		
+		Args:
+			elements: Element data dictionaries (IFCParser.extract_elements)
+			file_id: Associated file ID
+			tx: Transaction to write in (default: one transaction per batch)
+			
+		Returns:
+			Number of elements written
+		"""
+		success_count = 0
+		pool = self._props_pool()
+		for chunk in _chunked(elements, BATCH_SIZE):
+			# (globalIds, properties) columns by IFC class, which becomes the second node label
+			columns = {}
+			for element_data, props in zip(chunk, pool):
+				self._element_props(element_data, file_id, props)
+				ids, props_column = columns.setdefault(props['ifcClass'], ([], []))
+				ids.append(element_data['globalId'])
+				props_column.append(props)
+			
+			for ifc_class, (ids, props_column) in columns.items():
+				success_count += self._run_batch(_element_query(ifc_class, bool(file_id)), f"{ifc_class} ({len(ids)} elements)",
+												 tx, ids=ids, props=props_column, fileId=file_id)
+		
+		return success_count
+	
+	def _props_pool(self) -> List[Dict[str, Any]]:
+		"""
+		BATCH_SIZE element property dicts of the calling thread, refilled by every batch
+		
+		A batch's parameters are serialized when its query runs, so the next batch can
+		overwrite the same dicts instead of allocating new ones.
+		"""
+		pool = getattr(self._local, 'props_pool', None)
+		if pool is None:
+			pool = self._local.props_pool = [{} for _ in range(BATCH_SIZE)]
+		return pool
+	
+	def _element_row(self, element_data: Dict[str, Any], file_id: str = None) -> Dict[str, Any]:
+		"""{'globalId', 'props'} row of one element for the APOC query"""
+		return {'globalId': element_data['globalId'], 'props': self._element_props(element_data, file_id)}
+	
+	def _element_props(self, element_data: Dict[str, Any], file_id: str = None, props: Dict[str, Any] = None) -> Dict[str, Any]:
+		"""
+		Node properties of one element
+		
+		Args:
+			element_data: Element data dictionary
+			file_id: Associated file ID
+			props: Dictionary to refill (default: a new one)
+		"""
+		if props is None:
+			props = {}
+		props.clear()
+		props['name'] = element_data.get('name', '')
+		props['ifcClass'] = element_data['ifcClass']
+		props['description'] = element_data.get('description', '')
+		props['objectType'] = element_data.get('objectType', '')
+		props['tag'] = element_data.get('tag', '')
+		if file_id:
+			props['sourceFileId'] = file_id
+		# Store PropertySet as JSON string
+		if element_data.get('properties'):
+			props['properties'] = json.dumps(element_data['properties'])
+		return props
+	
+	def apoc_available(self) -> bool:
+		"""
+		Whether the APOC element writer is enabled and apoc.periodic.iterate is installed (checked once)
+		
+		Returns:
+			APOC availability
+		"""
+		if not self.use_apoc:
+			return False
+		if self._apoc_available is None:
+			try:
+				with self.session_scope() as session:
+					self._apoc_available = bool(session.run("CALL apoc.help('periodic.iterate')").data())
+			except Exception as e:
+				self.logger.debug(f"APOC check failed: {e}")
+				self._apoc_available = False
+			if not self._apoc_available:
+				self.logger.warning("APOC not available, using UNWIND batches")
+		return self._apoc_available
+	
+	def create_element_nodes_apoc(self, elements: List[Dict[str, Any]], file_id: str) -> int:
+		"""
+		Create IFC elements as Neo4j nodes with apoc.periodic.iterate (batched and parallel on the server)
+		
+		The batches commit on their own, so unlike create_element_nodes with a tx
+		this isn't one transaction per file. Needs the globalId index (ensure_indexes).
+		
+		Args:
+			elements: Element data dictionaries (IFCParser.extract_elements)
+			file_id: Associated file ID (must exist)
+			
+		Returns:
+			Number of elements written
+		"""
+		rows = [self._element_row(element_data, file_id) for element_data in elements]
+		try:
+			with self.session_scope() as session:
+				record = session.run(_Q_APOC_ELEMENTS, rows=rows, batchSize=APOC_BATCH_SIZE).single()
+				if record['errorMessages']:
+					self.logger.error(f"APOC element batches failed: {record['errorMessages']}")
+				link = session.run(_Q_APOC_FILE_LINK, fileId=file_id, batchSize=APOC_BATCH_SIZE).single()
+				if link['failedOperations']:
+					self.logger.error(f"APOC file link batches failed: {link['errorMessages']}")
+				return record['written']
+		except Exception as e:
+			self.logger.error(f"APOC element creation failed: {file_id}, error: {e}")
+			return 0
+	
+	def create_relationships(self, relationships: Iterable[Dict[str, Any]], tx=None) -> int:
+		"""
+		Create IFC relationships with one UNWIND query per relationship type and BATCH_SIZE pairs
+		
+		Args:
+			relationships: Relationship data dictionaries (IFCParser.extract_relationships)
+			tx: Transaction to write in (default: one transaction per batch)
+			
+		Returns:
+			Number of (from, to) pairs written
+		"""
+		# Flatten 1-to-N relationships into {f, t, rid} pairs grouped by type
+		buckets = {}
+		success_count = 0
+		for rel_data in relationships:
+			rel_type = rel_data.get('type')
+			if rel_type not in _PAIR_KEYS:
+				continue
+			from_key, to_key = _PAIR_KEYS[rel_type]
+			from_ids = rel_data[from_key]
+			to_ids = rel_data[to_key]
+			if not from_ids or not to_ids:
+				continue
+			if not from_key.endswith('s'):
+				from_ids = [from_ids]
+			if not to_key.endswith('s'):
+				to_ids = [to_ids]
+			pairs = buckets.setdefault(rel_type, [])
+			for from_id in from_ids:
+				for to_id in to_ids:
+					pairs.append({'f': from_id, 't': to_id, 'rid': rel_data['globalId']})
+			if len(pairs) >= BATCH_SIZE:
+				success_count += self._run_batch(_REL_UPSERT_TMPL.format(rtype=rel_type), f"{rel_type} ({len(pairs)} pairs)", tx, pairs=pairs)
+				buckets[rel_type] = []
+		
+		for rel_type, pairs in buckets.items():
+			if pairs:
+				success_count += self._run_batch(_REL_UPSERT_TMPL.format(rtype=rel_type), f"{rel_type} ({len(pairs)} pairs)", tx, pairs=pairs)
+		
+		return success_count
+	
+	def _run_batch(self, query: str, description: str, tx=None, **params) -> int:
+		"""
+		Run one bulk write query in tx, or in its own write transaction
+		
+		Errors in tx are raised, as the transaction can't continue after a failed query.
+		
+		Returns:
+			Count returned by the query (written rows), 0 on failure
+		"""
+		if tx is not None:
+			return tx.run(query, **params).single()[0]
+		try:
+			with self.session_scope() as session:
+				return session.execute_write(lambda tx: tx.run(query, **params).single()[0])
+		except Exception as e:
+			self.logger.error(f"Batch creation failed: {description}, error: {e}")
+			return 0
+	
 	def create_relationship(self, rel_data: Dict[str, Any]) -> bool:
 		"""
 		Create IFC relationship as Neo4j relationship
@@ -194,7 +542,7 @@ class Neo4jDatabase:
 			Creation success status
 		"""
 		try:
-			with self.driver.session(database=self.database) as session:
+			with self.session_scope() as session:
 				result = session.execute_write(self._create_relationship_tx, rel_data)
 				return result
 		except Exception as e:
@@ -344,7 +692,7 @@ class Neo4jDatabase:
 			Deletion success status
 		"""
 		try:
-			with self.driver.session(database=self.database) as session:
+			with self.session_scope() as session:
 				session.run("MATCH (n) DETACH DELETE n")
 			self.logger.info("Database initialization completed")
 			return True
@@ -352,6 +700,25 @@ class Neo4jDatabase:
 			self.logger.error(f"Database initialization failed: {e}")
 			return False
 	
+	def get_file_stats(self, file_id: str) -> Dict[str, int]:
+		"""
+		Query the element and relationship counts of one imported file
+		
+		Args:
+			file_id: File ID (see file_id_for)
+			
+		Returns:
+			{'file_nodes', 'file_relationships'}; zeros if the file wasn't imported
+		"""
+		try:
+			with self.session_scope() as session:
+				record = session.run(_Q_FILE_STATS, fileId=file_id).single()
+			if record:
+				return {'file_nodes': record['elements'], 'file_relationships': record['relationships']}
+		except Exception as e:
+			self.logger.error(f"File statistics query failed: {file_id}, error: {e}")
+		return {'file_nodes': 0, 'file_relationships': 0}
+	
 	def get_stats(self) -> Dict[str, int]:
 		"""
 		Query database statistics
@@ -360,7 +727,7 @@ class Neo4jDatabase:
 			Node and relationship count information
 		"""
 		try:
-			with self.driver.session(database=self.database) as session:
+			with self.session_scope() as session:
 				# Node count
 				node_result = session.run("MATCH (n) RETURN count(n) as count")
 				node_count = node_result.single()['count']